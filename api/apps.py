@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        from api import signals  # noqa: F401
+        # job handlers register themselves on import
+        from api.roles import jobs  # noqa: F401
@@ -0,0 +1,198 @@
+"""
+Audit module keeps the log of the role changes: attributes granted or revoked, users linked or unlinked.
+
+The log is kept for the customers whose database has the RoleAuditLog table, created by the enable_audit_log
+command (see db.schema). The changes of the other customers are not logged.
+
+The records are not written in the transaction of the change. attributes_log() and user_history_log()
+hand them to the audit_log buffer once the transaction commits, the records of a rolled back change
+are dropped. The buffer is a bounded in-process queue drained by a daemon thread with bulk inserts.
+The users of a queryset, e.g. all the users linked at once, are the exception: they are copied into the log
+by a single INSERT ... SELECT in the transaction of the change, they are never loaded nor queued.
+
+    backpressure - when the queue stays full for AUDIT_LOG_PUT_TIMEOUT_SECONDS the committing thread
+                   writes its records itself
+    fallback     - the records that can not be inserted are appended to AUDIT_LOG_FALLBACK_PATH,
+                   the replay_audit_log command inserts them again
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import BooleanField, CharField, DateTimeField, IntegerField, QuerySet, Value
+
+from api.utils import get_utc_now
+from db.customer.models import RoleAuditLog
+from db.schema import has_tables
+from db.tenants import tenant_connections
+from tools.query import insert_from_select
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogBuffer:
+    """
+    Queue of (database alias, records) batches, a record is the dict of the RoleAuditLog field values.
+    The worker merges the batches queued within flush_seconds into inserts of up to batch_size rows.
+    """
+
+    def __init__(self, max_batches=None, batch_size=None, flush_seconds=None, put_timeout=None, fallback_path=None):
+        self.batch_size = batch_size or settings.AUDIT_LOG_BATCH_SIZE
+        self.flush_seconds = flush_seconds or settings.AUDIT_LOG_FLUSH_SECONDS
+        self.put_timeout = put_timeout or settings.AUDIT_LOG_PUT_TIMEOUT_SECONDS
+        self.fallback_path = fallback_path or settings.AUDIT_LOG_FALLBACK_PATH
+        self.queue = queue.Queue(maxsize=max_batches or settings.AUDIT_LOG_MAX_BATCHES)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def add(self, using: str, records: List[Dict]) -> None:
+        """
+        Queues the records once the current transaction of the database commits, at once outside of a transaction.
+        """
+        if records:
+            transaction.on_commit(lambda: self.put(using, records), using=using)
+
+    def put(self, using: str, records: List[Dict]) -> None:
+        self._ensure_worker()
+        for offset in range(0, len(records), self.batch_size):
+            batch = records[offset:offset + self.batch_size]
+            try:
+                self.queue.put((using, batch), timeout=self.put_timeout)
+            except queue.Full:
+                # The worker is behind, slow the producer down instead of growing the queue
+                self.write(using, batch)
+
+    def flush(self) -> None:
+        """
+        Writes the queued records in the calling thread.
+        """
+        while True:
+            try:
+                using, records = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self.write(using, records)
+
+    def write(self, using: str, records: List[Dict]) -> None:
+        try:
+            RoleAuditLog.objects.using(tenant_connections.ensure(using)).bulk_create(
+                [RoleAuditLog(**record) for record in records])
+        except Exception:
+            logger.exception('%s audit records of %s could not be inserted', len(records), using)
+            self.write_fallback(using, records)
+
+    def write_fallback(self, using: str, records: List[Dict]) -> None:
+        try:
+            with self._lock, open(self.fallback_path, 'a', encoding='utf-8') as fallback:
+                fallback.write(json.dumps({'using': using, 'records': records}, cls=DjangoJSONEncoder) + '\n')
+        except OSError:
+            logger.exception('%s audit records of %s are lost', len(records), using)
+
+    def replay_fallback(self) -> int:
+        """
+        Inserts the records of the fallback file again, the records that fail again go to a new fallback file.
+        Returns the number of replayed records.
+        """
+        replaying_path = '%s.replaying' % self.fallback_path
+        with self._lock:
+            if not os.path.exists(self.fallback_path):
+                return 0
+            os.replace(self.fallback_path, replaying_path)
+
+        count = 0
+        with open(replaying_path, encoding='utf-8') as replaying:
+            for line in replaying:
+                batch = json.loads(line)
+                self.write(batch['using'], batch['records'])
+                count += len(batch['records'])
+
+        os.remove(replaying_path)
+        return count
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        with self._lock:
+            if self._worker is None:
+                atexit.register(self.flush)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='audit-log', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            pending = defaultdict(list)
+            using, records = self.queue.get()
+            pending[using].extend(records)
+            size = len(records)
+
+            deadline = time.monotonic() + self.flush_seconds
+            while size < self.batch_size:
+                try:
+                    using, records = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                pending[using].extend(records)
+                size += len(records)
+
+            for using, records in pending.items():
+                self.write(using, records)
+            close_old_connections()
+
+
+audit_log = AuditLogBuffer()
+
+
+def is_enabled(customer_domain: str) -> bool:
+    return has_tables(tenant_connections.ensure(customer_domain), RoleAuditLog)
+
+
+def attributes_log(user, customer_domain: str, role, attribute_names: Iterable[str], value: bool) -> None:
+    if not is_enabled(customer_domain):
+        return
+
+    changed_date = get_utc_now()
+    audit_log.add(customer_domain, [
+        {'kind': RoleAuditLog.KIND_ATTRIBUTE, 'role_id': role.pk, 'attribute_name': name, 'value': value,
+         'changed_by_id': getattr(user, 'pk', None), 'changed_date': changed_date}
+        for name in attribute_names
+    ])
+
+
+def user_history_log(user, customer_domain: str, role, users, linked: bool) -> None:
+    """
+    users is a queryset or an iterable of users or user pks. A queryset is copied into the log at once,
+    in the transaction of the change, so call it before the links are changed.
+    """
+    if not is_enabled(customer_domain):
+        return
+
+    changed_date = get_utc_now()
+    if isinstance(users, QuerySet):
+        insert_from_select(RoleAuditLog, users, {
+            'kind': Value(RoleAuditLog.KIND_USER, output_field=CharField()),
+            'role_id': Value(role.pk, output_field=IntegerField()),
+            'attribute_name': Value('', output_field=CharField()),
+            'user_id': 'pk',
+            'value': Value(linked, output_field=BooleanField()),
+            'changed_by_id': Value(getattr(user, 'pk', None), output_field=IntegerField()),
+            'changed_date': Value(changed_date, output_field=DateTimeField()),
+        })
+        return
+
+    audit_log.add(customer_domain, [
+        {'kind': RoleAuditLog.KIND_USER, 'role_id': role.pk, 'user_id': getattr(linked_user, 'pk', linked_user),
+         'value': linked, 'changed_by_id': getattr(user, 'pk', None), 'changed_date': changed_date}
+        for linked_user in users
+    ])
@@ -6,6 +6,7 @@ from rest_framework import authentication
 from rest_framework.exceptions import AuthenticationFailed
 
 from db import request_cfg, get_customer_domain_from_user
+from db.auth.cache import token_cache
 
 
 def set_request_cfg(request, auth):
@@ -49,19 +50,32 @@ class ExpiringTokenAuthentication(authentication.TokenAuthentication):
     def authenticate_credentials(self, key):
         model = self.get_model()
         try:
-            token = model.objects.select_related('user').get(key=key)
+            user, created = token_cache.get(key)
         except model.DoesNotExist:
             raise AuthenticationFailed('Invalid token')
 
-        if not token.user.is_active:
+        if not user.is_active:
             raise AuthenticationFailed('User inactive or deleted')
 
         utc_now = datetime.utcnow()
         utc_now = utc_now.replace(tzinfo=pytz.utc)
 
-        if token.created < utc_now - timedelta(seconds=settings.AUTH_TOKEN_TTL_SECONDS):
-            token.delete()
-            raise AuthenticationFailed('Expired token')
+        expired_before = utc_now - timedelta(seconds=settings.AUTH_TOKEN_TTL_SECONDS)
+        if created < expired_before:
+            # The cached creation date may be older than the row, another worker may have renewed the token
+            token_cache.invalidate(key)
+            try:
+                user, created = token_cache.get(key)
+            except model.DoesNotExist:
+                raise AuthenticationFailed('Invalid token')
 
-        return token.user, token
+            if created < expired_before:
+                token_cache.invalidate(key)
+                model.objects.filter(key=key, created=created).delete()
+                raise AuthenticationFailed('Expired token')
+
+            if not user.is_active:
+                raise AuthenticationFailed('User inactive or deleted')
+
+        return user, model(key=key, user=user, created=created)
 
@@ -0,0 +1,134 @@
+"""
+Changes module serves the change feeds of the resources: the rows created, updated or deleted after a cursor.
+
+    GET <resource>/changes/                           every retained change
+    GET <resource>/changes/?updated_since=<datetime>  the changes made since the date, after a full download
+    GET <resource>/changes/?cursor=<cursor>           the changes after the previous page
+
+Every change of a row is a ChangeFeedEntry (see db.change_feed) and its change_id is the cursor. A page holds
+the last change of each row in it: the current row for a created or updated row, a tombstone for a row that was
+deleted or that the caller can not see anymore. The next page starts at the cursor of the page, also when empty.
+
+The entries are inserted once the transaction of their change has committed and the change_ids of a table are
+committed in increasing order (see db.change_feed), so a page never skips an entry committed after it was read.
+Entries older than CHANGE_FEED_RETENTION_DAYS are deleted by the prune_change_feed command, which keeps the last
+deleted change_id and date of every table (ChangeFeedWatermark). A cursor below the watermark or an updated_since
+not after its date gets 410 Gone and the caller downloads the full list again.
+
+The change feeds of a customer answer 404 until the enable_change_feed command has created the change feed tables
+in its database, see db.change_feed.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import exceptions, status
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+from api.mixins import CustomerMixin, RequestArgMixin
+from db.change_feed import is_enabled
+from db.customer.models import ChangeFeedEntry, ChangeFeedWatermark
+from tools import IsAuthenticatedOrOptions
+
+
+class ChangeFeedGone(exceptions.APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The changes after this cursor are not retained anymore, download the full list again.'
+    default_code = 'gone'
+
+
+class ChangeFeedAPIView(GenericAPIView, CustomerMixin, RequestArgMixin):
+    """
+    Subclasses set serializer_class and get_queryset(), the rows the caller may see, as the list view of the resource.
+    """
+    permission_classes = (IsAuthenticatedOrOptions,)
+
+    CURSOR_PARAM = 'cursor'
+    UPDATED_SINCE_PARAM = 'updated_since'
+    LIMIT_PARAM = 'limit'
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if not is_enabled(queryset.db):
+            raise exceptions.NotFound('The change feed is not enabled for this customer.')
+
+        table_name = queryset.model._meta.db_table
+        entries = self.qs(ChangeFeedEntry).filter(table_name=table_name)
+        watermark = self.qs(ChangeFeedWatermark).filter(table_name=table_name).first()
+        cursor = self.get_cursor(entries, watermark)
+        limit = self.get_limit()
+
+        page = list(entries.filter(change_id__gt=cursor).order_by('change_id').values_list(
+            'change_id', 'object_id', 'action', 'changed_date')[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        # The last change of every row, in the order of the changes
+        changes = OrderedDict()
+        for change_id, object_id, action, changed_date in page:
+            changes.pop(object_id, None)
+            changes[object_id] = (change_id, action, changed_date)
+
+        upserted_pks = [pk for pk, (_, action, _) in changes.items() if action == ChangeFeedEntry.ACTION_UPSERT]
+        objects = list(queryset.filter(pk__in=upserted_pks)) if upserted_pks else []
+        data = dict(zip((obj.pk for obj in objects), self.get_serializer(objects, many=True).data))
+
+        return Response(OrderedDict([
+            ('cursor', str(page[-1][0] if page else cursor)),
+            ('has_more', has_more),
+            ('count', len(changes)),
+            ('results', [self.get_change(pk, change_id, changed_date, data.get(pk))
+                         for pk, (change_id, _, changed_date) in changes.items()]),
+        ]))
+
+    @staticmethod
+    def get_change(pk, change_id, changed_date, data):
+        return OrderedDict([
+            ('id', pk),
+            ('action', ChangeFeedEntry.ACTION_DELETE if data is None else ChangeFeedEntry.ACTION_UPSERT),
+            ('change_id', str(change_id)),
+            ('changed_date', changed_date),
+            ('data', data),
+        ])
+
+    def get_cursor(self, entries, watermark: Optional[ChangeFeedWatermark]) -> int:
+        pruned_change_id = watermark.change_id if watermark is not None else 0
+
+        cursor = self.get_argument(self.CURSOR_PARAM, int, required=False)
+        if cursor is not None:
+            # The entries up to the watermark are deleted, the caller may have missed some of them
+            if cursor < pruned_change_id or cursor < 0:
+                raise ChangeFeedGone()
+            return cursor
+
+        updated_since = self.get_argument(self.UPDATED_SINCE_PARAM, str, required=False)
+        if updated_since is None:
+            return pruned_change_id
+
+        try:
+            updated_since = parse_datetime(updated_since)
+        except ValueError:
+            updated_since = None
+        if updated_since is None:
+            raise exceptions.ValidationError({self.UPDATED_SINCE_PARAM: 'Expected an ISO 8601 date and time.'})
+        if timezone.is_naive(updated_since):
+            updated_since = timezone.make_aware(updated_since, timezone.utc)
+        if watermark is not None and watermark.changed_date is not None and updated_since <= watermark.changed_date:
+            raise ChangeFeedGone()
+
+        # The cursor is the last entry before the first change since the date
+        first = entries.filter(changed_date__gte=updated_since).aggregate(first=Min('change_id'))['first']
+        if first is None:
+            last = entries.aggregate(last=Max('change_id'))['last']
+        else:
+            last = entries.filter(change_id__lt=first).aggregate(last=Max('change_id'))['last']
+        return max(last or 0, pruned_change_id)
+
+    def get_limit(self) -> int:
+        limit = self.get_argument(self.LIMIT_PARAM, int, required=False) or settings.CHANGE_FEED_PAGE_SIZE
+        return max(1, min(limit, settings.CHANGE_FEED_MAX_PAGE_SIZE))
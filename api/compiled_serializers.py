@@ -0,0 +1,305 @@
+"""
+Compiled serializers module serializes the long read-only lists straight from the .values() rows of their queryset.
+
+DRF walks the source of every field and dispatches its to_representation() for every row. CompiledListSerializer,
+the list_serializer_class of the list serializers, compiles the readable fields of its child once per serializer
+class and set of fields (see api.serializers.SparseFieldsMixin) into one flat function of a row:
+
+    def represent(row):
+        ret = OrderedDict()
+        v = row['pk']
+        ret['url'] = None if v is None else c[0](v)
+        if row['user__pk'] is not None:
+            v = row['user__first_name']
+            ret['first_name'] = v if v is None or v.__class__ is t[1] else c[1](v)
+        return ret
+
+    plain fields        - the column of the source, to_representation() only when the value is not of its output type
+    primary key fields  - the column of the foreign key
+    hyperlinked fields  - the URL is reversed once and the lookup value of every row is put in its place
+    missing attributes  - skipped, as DRF skips the read-only fields whose source the model does not have
+    nullable relations  - the fields read through a relation that is None are skipped, as DRF does
+
+A child whose to_representation() changes the value of a field returns the converter of the column value
+from get_compiled_converters(), see api.users.serializers.BaseUsersSerializer. Converters are not called with None.
+
+Only the lists serialized from their whole queryset are compiled: the CSV exports and the page_size=∞ lists of
+api.mixins.LongListModelMixin. A page is a list of instances, so the paginated lists are serialized by DRF as before,
+as are the querysets with prefetch_related(), distinct() or aggregates and the serializers with any other field
+(SerializerMethodField, nested serializers, properties).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Manager, QuerySet
+from django.db.models.query import ModelIterable
+from rest_framework import fields, relations, serializers
+
+# Stands for the lookup value while a URL is reversed, it must appear once in the URL
+URL_LOOKUP_SENTINEL = 918273645
+
+# field class -> the type of the values its to_representation() returns unchanged
+IDENTITY_TYPES = (
+    (fields.BooleanField, bool),
+    (fields.IntegerField, int),
+    (fields.CharField, str),
+)
+
+KIND_VALUE = 'value'
+KIND_TYPED = 'typed'
+KIND_CONVERT = 'convert'
+KIND_OVERRIDE = 'override'
+KIND_URL = 'url'
+
+_MISSING_ATTRIBUTE = object()
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+class CompiledFields:
+    """
+    The readable fields of a serializer class: (field name, values() lookup, kind, guard lookup or None) each.
+    """
+
+    def __init__(self, name: str, plan: List[Tuple[str, str, str, Optional[str]]]):
+        self.plan = plan
+        self.columns = tuple(OrderedDict.fromkeys(
+            column for _, lookup, _, guard in plan for column in (guard, lookup) if column is not None))
+        self._factory = self._compile(name)
+
+    def _compile(self, name: str) -> Callable:
+        lines = ['def factory(c, t):', '    def represent(row):', '        ret = OrderedDict()']
+        for i, (field_name, lookup, kind, guard) in enumerate(self.plan):
+            indent = ' ' * 8
+            if guard is not None:
+                lines.append('%sif row[%r] is not None:' % (indent, guard))
+                indent += ' ' * 4
+
+            if kind == KIND_VALUE:
+                lines.append('%sret[%r] = row[%r]' % (indent, field_name, lookup))
+                continue
+
+            lines.append('%sv = row[%r]' % (indent, lookup))
+            if kind == KIND_TYPED:
+                lines.append('%sret[%r] = v if v is None or v.__class__ is t[%d] else c[%d](v)' % (
+                    indent, field_name, i, i))
+            else:
+                lines.append('%sret[%r] = None if v is None else c[%d](v)' % (indent, field_name, i))
+        lines.append('        return ret')
+        lines.append('    return represent')
+
+        namespace = {'OrderedDict': OrderedDict}
+        exec(compile('\n'.join(lines), '<compiled %s>' % name, 'exec'), namespace)
+        return namespace['factory']
+
+    def bind(self, serializer: serializers.Serializer) -> Callable[[Dict], OrderedDict]:
+        """
+        Returns the function of a row for the fields of the serializer, its request and format included.
+        """
+        overrides = serializer.get_compiled_converters() if hasattr(serializer, 'get_compiled_converters') else {}
+        converters, types = [], []
+        for field_name, _, kind, _ in self.plan:
+            field = serializer.fields[field_name]
+            converter, output_type = None, None
+            if kind == KIND_OVERRIDE:
+                converter = overrides[field_name]
+            elif kind == KIND_URL:
+                converter = get_url_converter(field)
+            elif kind == KIND_TYPED:
+                converter, output_type = field.to_representation, get_identity_type(field)
+            elif kind == KIND_CONVERT:
+                pk_field = getattr(field, 'pk_field', None)
+                converter = pk_field.to_representation if pk_field is not None else field.to_representation
+            converters.append(converter)
+            types.append(output_type)
+
+        return self._factory(tuple(converters), tuple(types))
+
+
+def get_identity_type(field: fields.Field) -> Optional[type]:
+    for field_class, output_type in IDENTITY_TYPES:
+        if isinstance(field, field_class) and type(field).to_representation is field_class.to_representation:
+            return output_type
+    return None
+
+
+def get_lookup(model, source_attrs: List[str]):
+    """
+    Returns the values() lookup of the source, its model field (None for a foreign key attname) and the lookup
+    of the related pk when the source goes through a nullable relation. The lookup is _MISSING_ATTRIBUTE when
+    the model has no such attribute. Raises UnsupportedField for any other attribute.
+    """
+    guard = None
+    for i, attr in enumerate(source_attrs):
+        if i == len(source_attrs) - 1:
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if any(f.attname == attr for f in model._meta.concrete_fields):
+                    return '__'.join(source_attrs), None, guard
+                model_field = None
+            if model_field is None or not model_field.concrete or model_field.many_to_many:
+                if hasattr(model, attr):
+                    raise UnsupportedField(attr)
+                return _MISSING_ATTRIBUTE, None, None
+            return '__'.join(source_attrs), model_field, guard
+
+        try:
+            model_field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            model_field = None
+        if model_field is None or not (model_field.concrete and model_field.many_to_one):
+            if model_field is None and not hasattr(model, attr):
+                return _MISSING_ATTRIBUTE, None, None
+            raise UnsupportedField(attr)
+
+        # DRF skips the fields read through a relation that is None, the LEFT JOIN of values() gives a None pk
+        if model_field.null:
+            guard = '__'.join(source_attrs[:i + 1] + ['pk'])
+        model = model_field.related_model
+
+
+def get_field_plan(field: fields.Field, model, overrides) -> Optional[Tuple[str, str, Optional[str]]]:
+    """
+    Returns the (values() lookup, kind, guard lookup) of a readable field, None for a field DRF skips.
+    """
+    if isinstance(field, relations.HyperlinkedIdentityField):
+        if field.lookup_field not in ('pk', model._meta.pk.name):
+            raise UnsupportedField(field.field_name)
+        return 'pk', KIND_URL, None
+
+    if field.source == '*' or isinstance(field, (serializers.BaseSerializer, fields.SerializerMethodField,
+                                                  relations.ManyRelatedField)):
+        raise UnsupportedField(field.field_name)
+
+    lookup, model_field, guard = get_lookup(model, field.source_attrs)
+    if lookup is _MISSING_ATTRIBUTE:
+        if field.required or field.allow_null or field.default is not fields.empty:
+            raise UnsupportedField(field.field_name)
+        return None
+
+    if field.field_name in overrides:
+        return lookup, KIND_OVERRIDE, guard
+
+    if isinstance(field, relations.HyperlinkedRelatedField):
+        if not field.use_pk_only_optimization() or (model_field is not None and not model_field.many_to_one):
+            raise UnsupportedField(field.field_name)
+        return lookup, KIND_URL, guard
+
+    if isinstance(field, relations.PrimaryKeyRelatedField):
+        if model_field is not None and not model_field.many_to_one:
+            raise UnsupportedField(field.field_name)
+        return lookup, KIND_CONVERT if field.pk_field is not None else KIND_VALUE, guard
+
+    if isinstance(field, relations.RelatedField) or (model_field is not None and model_field.is_relation):
+        raise UnsupportedField(field.field_name)
+
+    return lookup, KIND_TYPED if get_identity_type(field) is not None else KIND_CONVERT, guard
+
+
+def get_url_converter(field: relations.HyperlinkedRelatedField) -> Callable:
+    def make_object(value):
+        # get_url() reads the lookup_field of the instance, the pk or its alias (see get_field_plan)
+        obj = relations.PKOnlyObject(pk=value)
+        setattr(obj, field.lookup_field, value)
+        return obj
+
+    def convert(value):
+        url = field.to_representation(make_object(value))
+        return None if url is None else str(url)
+
+    # The reverse() of every row is replaced by the URL of the sentinel with the lookup value put in
+    is_plain_url = type(field).get_url is relations.HyperlinkedRelatedField.get_url
+    url = convert(URL_LOOKUP_SENTINEL) if is_plain_url else None
+    if url is None or url.count(str(URL_LOOKUP_SENTINEL)) != 1:
+        return convert
+
+    prefix, _, suffix = url.partition(str(URL_LOOKUP_SENTINEL))
+
+    def convert_int(value):
+        if value.__class__ is int and value >= 0:
+            return prefix + str(value) + suffix
+        return convert(value)
+
+    return convert_int
+
+
+_compiled_fields = {}
+_compiled_fields_lock = threading.Lock()
+
+
+def get_compiled_fields(serializer: serializers.Serializer, model) -> Optional[CompiledFields]:
+    """
+    Compiles the readable fields of the serializer once per class and set of fields, None when DRF has to serialize.
+    """
+    readable_fields = [field for field in serializer.fields.values() if not field.write_only]
+    key = (type(serializer), model, tuple(field.field_name for field in readable_fields))
+
+    try:
+        return _compiled_fields[key]
+    except KeyError:
+        pass
+
+    overrides = serializer.get_compiled_converters() if hasattr(serializer, 'get_compiled_converters') else {}
+    try:
+        plan = []
+        for field in readable_fields:
+            field_plan = get_field_plan(field, model, overrides)
+            if field_plan is not None:
+                plan.append((field.field_name,) + field_plan)
+        compiled = CompiledFields(type(serializer).__name__, plan)
+    except UnsupportedField:
+        compiled = None
+
+    with _compiled_fields_lock:
+        return _compiled_fields.setdefault(key, compiled)
+
+
+class CompiledListSerializer(serializers.ListSerializer):
+
+    def get_compiled_fields(self, data) -> Optional[CompiledFields]:
+        if not isinstance(data, QuerySet):
+            return None
+
+        query = data.query
+        if (data._iterable_class is not ModelIterable or data._prefetch_related_lookups or query.distinct
+                or query.combinator or query.group_by is not None
+                or any(getattr(annotation, 'contains_aggregate', False) for annotation in query.annotations.values())):
+            return None
+
+        if data.model is not getattr(getattr(self.child, 'Meta', None), 'model', None):
+            return None
+
+        return get_compiled_fields(self.child, data.model)
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, Manager) else data
+        compiled = self.get_compiled_fields(iterable)
+        if compiled is None:
+            return super().to_representation(data)
+
+        return list(self._represent(compiled, iterable.values(*compiled.columns)))
+
+    def iter_representation(self, chunk_size: int) -> Optional[Iterator[OrderedDict]]:
+        """
+        Returns the serialized rows of the instance, read from a server-side cursor, None when DRF has to serialize.
+        """
+        iterable = self.instance.all() if isinstance(self.instance, Manager) else self.instance
+        compiled = self.get_compiled_fields(iterable)
+        if compiled is None:
+            return None
+
+        return self._represent(compiled, iterable.values(*compiled.columns).iterator(chunk_size=chunk_size))
+
+    def _represent(self, compiled: CompiledFields, rows) -> Iterator[OrderedDict]:
+        # The fields are bound once there is a row, as DRF reverses no URL for an empty list
+        represent = None
+        for row in rows:
+            if represent is None:
+                represent = compiled.bind(self.child)
+            yield represent(row)
@@ -0,0 +1,99 @@
+"""
+Conditional module answers the conditional GET requests (If-None-Match, If-Modified-Since) of the
+detail and list views with 304 Not Modified before the objects are serialized.
+
+    detail - ETag and Last-Modified from the pk and the last_modified_field of the object
+    list   - ETag from MAX(last_modified_field) and COUNT(*) of the filtered queryset, one aggregate query.
+             The count catches the deleted rows, which a Last-Modified date can not, so lists send no Last-Modified.
+             The query runs before the list only for a conditional request, otherwise once the list is built.
+
+Only the rows of the queryset are looked at, a change of a related row serialized along with them
+(e.g. the name of created_by) is not detected. The views that serialize such rows, and the models
+whose rows are changed without updating last_modified_field, set last_modified_field = None.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+from typing import Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max, QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from api.counts import get_count_sql
+
+Validators = namedtuple('Validators', ('etag', 'last_modified'))
+
+
+class ConditionalGetMixin:
+    last_modified_field = 'updated_date'
+
+    def has_last_modified_field(self, model) -> bool:
+        if not self.last_modified_field:
+            return False
+        try:
+            model._meta.get_field(self.last_modified_field)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def get_object_validators(self, instance) -> Optional[Validators]:
+        if not self.has_last_modified_field(type(instance)):
+            return None
+
+        last_modified = getattr(instance, self.last_modified_field)
+        if last_modified is None:
+            return None
+
+        return Validators(self._get_etag(instance.pk, last_modified), int(last_modified.timestamp()))
+
+    def get_list_validators(self, queryset) -> Optional[Validators]:
+        if not isinstance(queryset, QuerySet) or not self.has_last_modified_field(queryset.model):
+            return None
+
+        count_sql = get_count_sql(queryset)
+        if count_sql is None:
+            return None
+
+        aggregate = queryset.order_by().aggregate(last_modified=Max(self.last_modified_field), count=Count('pk'))
+        return Validators(self._get_etag(count_sql, aggregate['count'], aggregate['last_modified']), None)
+
+    def is_conditional_request(self) -> bool:
+        return 'HTTP_IF_NONE_MATCH' in self.request.META or 'HTTP_IF_MODIFIED_SINCE' in self.request.META
+
+    def get_not_modified_response(self, validators: Optional[Validators]):
+        if validators is None or self.request.method not in ('GET', 'HEAD'):
+            return None
+
+        response = get_conditional_response(self.request, etag=validators.etag,
+                                            last_modified=validators.last_modified)
+        if response is not None:
+            self.set_validator_headers(response, validators)
+        return response
+
+    @staticmethod
+    def set_validator_headers(response, validators: Optional[Validators]):
+        if validators is not None and response.status_code in (200, 304):
+            response['ETag'] = validators.etag
+            if validators.last_modified is not None:
+                response['Last-Modified'] = http_date(validators.last_modified)
+        return response
+
+    def _get_etag(self, *state) -> str:
+        # The full path holds the page, the page size, the ordering and the sparse fields of the response
+        request = self.request
+        renderer = getattr(request, 'accepted_renderer', None)
+        key = [request.get_full_path(), getattr(renderer, 'format', None), getattr(request.user, 'pk', None), state]
+        return 'W/"%s"' % hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        validators = self.get_object_validators(instance)
+
+        response = self.get_not_modified_response(validators)
+        if response is None:
+            response = self.set_validator_headers(Response(self.get_serializer(instance).data), validators)
+        return response
@@ -0,0 +1,159 @@
+"""
+Counts module contains the strategies used by the paginators to count the rows of a list.
+
+    exact     - COUNT(*) on every request
+    cached    - COUNT(*) cached per (customer database, view, normalized query) until one of its tables is written
+    estimated - row estimate of the query planner, an exact count is made when the estimate is small
+
+The view picks the strategy with the count_strategy attribute and the caller may override it
+with the count_mode query parameter.
+"""
+
+import hashlib
+import json
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import QuerySet
+
+from db.cache import TTLCache
+from db.query_cache import query_cache
+
+COUNT_MODE_QUERY_PARAM = 'count_mode'
+
+CountResult = namedtuple('CountResult', ('value', 'approximate'))
+
+
+def get_count_sql(object_list):
+    """
+    Returns (database alias, sql, params) of the list without ordering or None when the query is empty.
+    Supports both Django querysets and querybuilder queries.
+    """
+    if isinstance(object_list, QuerySet):
+        queryset = object_list.order_by()
+        try:
+            sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+        except EmptyResultSet:
+            return None
+        return queryset.db, sql, tuple(params)
+
+    sorters, object_list.sorters = object_list.sorters, []
+    try:
+        sql = object_list.get_sql()
+    finally:
+        object_list.sorters = sorters
+
+    return object_list.connection.alias, sql, object_list.get_args()
+
+
+class CountStrategy:
+    approximate = False
+
+    def count(self, object_list, key=None) -> CountResult:
+        raise NotImplementedError
+
+    @staticmethod
+    def exact_count(object_list) -> int:
+        return object_list.count()
+
+
+class ExactCount(CountStrategy):
+
+    def count(self, object_list, key=None) -> CountResult:
+        return CountResult(self.exact_count(object_list), False)
+
+
+class CachedCount(CountStrategy):
+    """
+    The entries are keyed with the versions of the tables the count reads, the writes bump them in every
+    worker (see db.query_cache), so they are invalidated on the same paths as the cached queries.
+    Rows written outside of those paths are only counted once the entry expires after COUNT_CACHE_TTL_SECONDS,
+    so the count is reported as approximate.
+    """
+    approximate = True
+
+    def __init__(self, max_size=None, ttl=None):
+        self.cache = TTLCache(
+            max_size=max_size or settings.COUNT_CACHE_MAX_SIZE,
+            ttl=ttl or settings.COUNT_CACHE_TTL_SECONDS,
+        )
+
+    def count(self, object_list, key=None) -> CountResult:
+        count_sql = get_count_sql(object_list)
+        if count_sql is None:
+            return CountResult(0, False)
+
+        using, sql, params = count_sql
+        versions = query_cache.get_versions(using, sql)
+        if versions is None:
+            return CountResult(self.exact_count(object_list), False)
+
+        query_hash = hashlib.sha1(json.dumps([sql, params], default=str, sort_keys=True).encode()).hexdigest()
+        return CountResult(self.cache.get_or_set((using, key, query_hash, versions),
+                                                 lambda: self.exact_count(object_list)), True)
+
+
+class EstimatedCount(CountStrategy):
+    """
+    Uses the planner statistics of PostgreSQL (EXPLAIN) and SQL Server (SHOWPLAN_XML).
+    Falls back to the exact count on the other backends and when the estimate is below exact_threshold.
+    """
+    approximate = True
+
+    showplan_rows_regex = re.compile(r'StatementEstRows="([0-9.Ee+-]+)"')
+
+    def __init__(self, exact_threshold=None):
+        self.exact_threshold = exact_threshold or settings.ESTIMATED_COUNT_EXACT_THRESHOLD
+
+    def count(self, object_list, key=None) -> CountResult:
+        count_sql = get_count_sql(object_list)
+        if count_sql is None:
+            return CountResult(0, False)
+
+        estimate = self.estimate(*count_sql)
+        if estimate is None or estimate < self.exact_threshold:
+            return CountResult(self.exact_count(object_list), False)
+
+        return CountResult(estimate, True)
+
+    def estimate(self, using, sql, params):
+        connection = connections[using]
+        estimate = getattr(self, '_estimate_%s' % connection.vendor, None)
+        return estimate(connection, sql, params) if estimate else None
+
+    def _estimate_postgresql(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def _estimate_microsoft(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('SET SHOWPLAN_XML ON')
+            try:
+                cursor.execute(sql, params)
+                plan = cursor.fetchone()[0]
+            finally:
+                cursor.execute('SET SHOWPLAN_XML OFF')
+
+        match = self.showplan_rows_regex.search(plan or '')
+        return int(float(match.group(1))) if match else None
+
+
+COUNT_STRATEGIES = {
+    'exact': ExactCount(),
+    'cached': CachedCount(),
+    'estimated': EstimatedCount(),
+}
+
+
+def get_count_strategy(request, view=None) -> CountStrategy:
+    name = request.query_params.get(COUNT_MODE_QUERY_PARAM) or getattr(view, 'count_strategy', None)
+    return COUNT_STRATEGIES.get(name, COUNT_STRATEGIES['exact'])
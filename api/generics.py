@@ -2,9 +2,10 @@ from rest_framework import generics
 from rest_framework.viewsets import ModelViewSet
 
 from api import mixins
+from api.conditional import ConditionalGetMixin
 
 
-class NoCacheModelViewSet(ModelViewSet):
+class NoCacheModelViewSet(ConditionalGetMixin, ModelViewSet):
     def list(self, request, *args, **kwargs):
         resp = super(NoCacheModelViewSet, self).list(request, *args, **kwargs)
         resp['Cache-Control'] = 'no-cache'
@@ -30,35 +31,35 @@ class NoCacheListAPIView(mixins.LongListModelMixin, generics.ListAPIView):
         return resp
 
 
-class NoCacheRetrieveUpdateDeleteAPIView(generics.RetrieveUpdateDestroyAPIView):
+class NoCacheRetrieveUpdateDeleteAPIView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     def retrieve(self, request, *args, **kwargs):
         resp = super(NoCacheRetrieveUpdateDeleteAPIView, self).retrieve(request, *args, **kwargs)
         resp['Cache-Control'] = 'no-cache'
         return resp
 
 
-class NoCacheRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
+class NoCacheRetrieveUpdateAPIView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     def retrieve(self, request, *args, **kwargs):
         resp = super(NoCacheRetrieveUpdateAPIView, self).retrieve(request, *args, **kwargs)
         resp['Cache-Control'] = 'no-cache'
         return resp
 
 
-class NoCacheRetrieveCreateAPIView(generics.RetrieveAPIView, generics.CreateAPIView):
+class NoCacheRetrieveCreateAPIView(ConditionalGetMixin, generics.RetrieveAPIView, generics.CreateAPIView):
     def retrieve(self, request, *args, **kwargs):
         resp = super(NoCacheRetrieveCreateAPIView, self).retrieve(request, *args, **kwargs)
         resp['Cache-Control'] = 'no-cache'
         return resp
 
 
-class NoCacheRetrieveAPIView(generics.RetrieveAPIView):
+class NoCacheRetrieveAPIView(ConditionalGetMixin, generics.RetrieveAPIView):
     def retrieve(self, request, *args, **kwargs):
         resp = super(NoCacheRetrieveAPIView, self).retrieve(request, *args, **kwargs)
         resp['Cache-Control'] = 'no-cache'
         return resp
 
 
-class NoCacheRetrieveDeleteAPIView(generics.RetrieveDestroyAPIView):
+class NoCacheRetrieveDeleteAPIView(ConditionalGetMixin, generics.RetrieveDestroyAPIView):
     def retrieve(self, request, *args, **kwargs):
         resp = super(NoCacheRetrieveDeleteAPIView, self).retrieve(request, *args, **kwargs)
         resp['Cache-Control'] = 'no-cache'
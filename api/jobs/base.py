@@ -0,0 +1,76 @@
+"""
+Jobs module keeps the local, database backed queue of the long customer operations.
+
+A view enqueues a job and answers 202 with the job resource (api.jobs.views.JobDetail), the run_jobs
+command claims the queued jobs and runs their handler. Handlers work in chunks, every chunk is committed
+in the customer database and followed by JobProgress.advance(), which saves the progress and the resume
+state of the job. A job whose worker stopped sending heartbeats is queued again and its handler resumes
+from the saved state, so a chunk may run twice and handlers must be idempotent per chunk.
+"""
+
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from api.utils import get_utc_now
+from db.jobs.models import Job
+
+
+class JobLost(Exception):
+    """
+    The job was claimed by another worker after its heartbeat went stale.
+    """
+
+
+class JobProgress:
+
+    def __init__(self, job: Job):
+        self.job = job
+
+    def set_total(self, total: int) -> None:
+        self.job.total = total
+        self._save('total')
+
+    def advance(self, count: int, state: dict) -> None:
+        """
+        Saves the resume state once the chunk of count rows is committed.
+        """
+        self.job.progress += count
+        self.job.state = state
+        self._save('progress', 'state')
+
+    def _save(self, *fields):
+        self.job.heartbeat_date = get_utc_now()
+        updated = jobs().filter(pk=self.job.pk, worker=self.job.worker, status=Job.STATUS_RUNNING).update(
+            heartbeat_date=self.job.heartbeat_date, **{field: getattr(self.job, field) for field in fields})
+        if not updated:
+            raise JobLost(self.job.pk)
+
+
+class JobHandler:
+    kind: str = NotImplemented
+
+    def run(self, job: Job, progress: JobProgress) -> Optional[dict]:
+        """
+        Runs the job from job.state and returns the JSON result of the job.
+        """
+        raise NotImplementedError
+
+
+job_handlers: Dict[str, JobHandler] = {}
+
+
+def register_job_handler(handler_class):
+    job_handlers[handler_class.kind] = handler_class()
+    return handler_class
+
+
+def jobs():
+    return Job.objects.using(settings.JOB_DATABASE)
+
+
+def enqueue_job(kind: str, customer_domain: str, payload: dict, created_by_id: Optional[int] = None) -> Job:
+    if kind not in job_handlers:
+        raise ValueError("Unknown job kind '%s'" % kind)
+
+    return jobs().create(kind=kind, customer_domain=customer_domain, payload=payload, created_by_id=created_by_id)
@@ -0,0 +1,94 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, F
+
+from api.jobs.base import JobLost, JobProgress, job_handlers, jobs
+from api.utils import get_utc_now
+from db.jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """
+    Claims and runs the queued jobs, at most max_running_per_customer jobs of a customer run at the same time
+    across all the workers. A claim is an UPDATE conditioned on the queued status, so two workers never run
+    the same job, and a claim that exceeds the customer limit is released.
+    """
+
+    def __init__(self, worker=None, max_running_per_customer=None, stale_seconds=None, max_attempts=None):
+        self.worker = worker or '%s:%s' % (socket.gethostname(), os.getpid())
+        self.max_running_per_customer = max_running_per_customer or settings.JOB_MAX_RUNNING_PER_CUSTOMER
+        self.stale_seconds = stale_seconds or settings.JOB_STALE_SECONDS
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+
+    def run_next(self) -> bool:
+        """
+        Runs one job, returns False when no job could be claimed.
+        """
+        close_old_connections()
+        job = self.claim()
+        if job is None:
+            return False
+
+        self.run(job)
+        return True
+
+    def claim(self) -> Optional[Job]:
+        self.requeue_stale()
+
+        running = jobs().filter(status=Job.STATUS_RUNNING).order_by().values('customer_domain').annotate(
+            running=Count('pk')).filter(running__gte=self.max_running_per_customer).values_list('customer_domain',
+                                                                                                  flat=True)
+        candidates = jobs().filter(status=Job.STATUS_QUEUED).exclude(customer_domain__in=list(running))
+
+        for job in candidates.order_by('pk')[:settings.JOB_CLAIM_CANDIDATES]:
+            now = get_utc_now()
+            claimed = jobs().filter(pk=job.pk, status=Job.STATUS_QUEUED).update(
+                status=Job.STATUS_RUNNING, worker=self.worker, started_date=now, heartbeat_date=now,
+                attempts=F('attempts') + 1)
+            if not claimed:
+                continue
+
+            customer_running = jobs().filter(status=Job.STATUS_RUNNING, customer_domain=job.customer_domain).count()
+            if customer_running > self.max_running_per_customer:
+                jobs().filter(pk=job.pk, worker=self.worker).update(
+                    status=Job.STATUS_QUEUED, worker='', attempts=F('attempts') - 1)
+                continue
+
+            job.refresh_from_db()
+            return job
+
+        return None
+
+    def requeue_stale(self) -> None:
+        stale = jobs().filter(status=Job.STATUS_RUNNING,
+                              heartbeat_date__lt=get_utc_now() - timedelta(seconds=self.stale_seconds))
+        stale.filter(attempts__gte=self.max_attempts).update(
+            status=Job.STATUS_FAILED, error='The worker running the job stopped', finished_date=get_utc_now())
+        stale.filter(attempts__lt=self.max_attempts).update(status=Job.STATUS_QUEUED, worker='')
+
+    def run(self, job: Job) -> None:
+        handler = job_handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError("Unknown job kind '%s'" % job.kind)
+            result = handler.run(job, JobProgress(job))
+        except JobLost:
+            logger.warning('Job %s was claimed by another worker', job.pk)
+            return
+        except Exception as e:
+            logger.exception('Job %s failed', job.pk)
+            self._finish(job, Job.STATUS_FAILED, error=str(e) or e.__class__.__name__)
+        else:
+            self._finish(job, Job.STATUS_SUCCEEDED, result=result)
+
+    def _finish(self, job, status, result=None, error=''):
+        jobs().filter(pk=job.pk, worker=self.worker, status=Job.STATUS_RUNNING).update(
+            status=status, result=result, error=error, finished_date=get_utc_now())
@@ -0,0 +1,24 @@
+from rest_framework import serializers
+
+from db.jobs.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='jobs:detail', lookup_field='pk')
+
+    class Meta:
+        fields = (
+            'job_id',
+            'url',
+            'kind',
+            'status',
+            'progress',
+            'total',
+            'result',
+            'error',
+            'created_date',
+            'started_date',
+            'finished_date',
+        )
+        model = Job
+        read_only_fields = fields
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from api.jobs import views
+
+urlpatterns = [
+    path('<int:pk>/', views.JobDetail.as_view(), name='detail'),
+]
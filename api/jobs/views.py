@@ -0,0 +1,35 @@
+from rest_framework import status
+from rest_framework.response import Response
+
+from api.generics import NoCacheRetrieveAPIView
+from api.jobs.base import enqueue_job, jobs
+from api.jobs.serializers import JobSerializer
+from api.mixins import CustomerMixin
+from tools import IsAuthenticatedOrOptions
+
+
+class JobDetail(NoCacheRetrieveAPIView, CustomerMixin):
+    permission_classes = (IsAuthenticatedOrOptions,)
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        return jobs().filter(customer_domain=self.customer_domain)
+
+
+class JobMixin:
+    """
+    Runs the operation of a view in the background when the caller asks for it with ?async=true, the operation
+    is made synchronously otherwise. The queued jobs are only run by the run_jobs command, a deployment that
+    lets its clients ask for ?async=true has to run at least one `manage.py run_jobs` worker next to the web
+    processes, the jobs stay queued otherwise.
+    """
+    ASYNC_QUERY_PARAM = 'async'
+
+    def run_as_job(self) -> bool:
+        return self.request.query_params.get(self.ASYNC_QUERY_PARAM, '').lower() in ('1', 'true', 'yes')
+
+    def enqueue_job_response(self, kind, payload) -> Response:
+        user = self.user
+        job = enqueue_job(kind, self.customer_domain, payload, created_by_id=user.pk if user else None)
+        data = JobSerializer(job, context={'request': self.request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from db.customer.models import RoleAuditLog
+from db.schema import create_tables
+from db.tenants import tenant_connections
+
+
+class Command(BaseCommand):
+    help = 'Creates the role audit log table of the given customer databases, their role changes are logged from then on'
+
+    def add_arguments(self, parser):
+        parser.add_argument('domains', nargs='+', help='Customer domain names')
+
+    def handle(self, *args, **options):
+        for domain in options['domains']:
+            create_tables(tenant_connections.ensure(domain), RoleAuditLog)
+            self.stdout.write(f'{domain}: audit log enabled')
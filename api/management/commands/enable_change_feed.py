@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from db.customer.models import ChangeFeedEntry, ChangeFeedWatermark
+from db.schema import create_tables
+from db.tenants import tenant_connections
+
+
+class Command(BaseCommand):
+    help = 'Creates the change feed tables of the given customer databases, their changes are recorded from then on'
+
+    def add_arguments(self, parser):
+        parser.add_argument('domains', nargs='+', help='Customer domain names')
+
+    def handle(self, *args, **options):
+        for domain in options['domains']:
+            create_tables(tenant_connections.ensure(domain), ChangeFeedEntry, ChangeFeedWatermark)
+            self.stdout.write(f'{domain}: change feed enabled')
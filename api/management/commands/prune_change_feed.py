@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from db.change_feed import prune_change_feed
+from db.tenants import tenant_connections
+
+
+class Command(BaseCommand):
+    help = 'Deletes the change feed entries older than CHANGE_FEED_RETENTION_DAYS of the given customer databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('domains', nargs='+', help='Customer domain names')
+        parser.add_argument('--days', type=int, default=None, help='Days of changes to keep')
+
+    def handle(self, *args, **options):
+        days = options['days'] or settings.CHANGE_FEED_RETENTION_DAYS
+        for domain in options['domains']:
+            count = prune_change_feed(tenant_connections.ensure(domain), days)
+            self.stdout.write(f'{domain}: deleted {count} change feed entries')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.search import search_indexes
+from db.tenants import tenant_connections
+
+
+class Command(BaseCommand):
+    help = 'Builds the trigram search index of the given customer databases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('domains', nargs='+', help='Customer domain names')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows read per query')
+
+    def handle(self, *args, **options):
+        for domain in options['domains']:
+            using = tenant_connections.ensure(domain)
+            for search_index in search_indexes.values():
+                count = search_index.rebuild(using, options['chunk_size'])
+                self.stdout.write(f'{domain}: indexed {count} rows of {search_index.table_name}')
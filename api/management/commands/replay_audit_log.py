@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.audit import audit_log
+
+
+class Command(BaseCommand):
+    help = 'Inserts the audit records saved to AUDIT_LOG_FALLBACK_PATH when the database was not available'
+
+    def handle(self, *args, **options):
+        count = audit_log.replay_fallback()
+        self.stdout.write(f'{count} audit records replayed')
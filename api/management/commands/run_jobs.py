@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs.runner import JobRunner
+
+
+class Command(BaseCommand):
+    help = 'Runs the queued background jobs, run one process per worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no job is queued')
+        parser.add_argument('--poll-seconds', type=float, default=None, help='Wait between two empty polls')
+
+    def handle(self, *args, **options):
+        runner = JobRunner()
+        poll_seconds = options['poll_seconds'] or settings.JOB_POLL_SECONDS
+        self.stdout.write(f'Worker {runner.worker} started')
+
+        while True:
+            if runner.run_next():
+                continue
+            if options['once']:
+                return
+            time.sleep(poll_seconds)
@@ -4,5 +4,6 @@ from api.messages import views
 
 urlpatterns = [
     path('', views.MessageList.as_view(), name='list'),
+    path('changes/', views.MessageChanges.as_view(), name='changes'),
     path('<int:pk>/', views.MessageDetail.as_view(), name='detail'),
 ]
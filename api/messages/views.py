@@ -1,5 +1,6 @@
 from django.db.models import Q
 
+from api.changes import ChangeFeedAPIView
 from api.generics import NoCacheListCreateAPIView, NoCacheRetrieveUpdateDeleteAPIView
 from api.messages.filters import MessageFilterSet
 from api.messages.serializers import MessageListSerializer
@@ -24,3 +25,10 @@ class MessageDetail(NoCacheRetrieveUpdateDeleteAPIView, CustomerMixin):
 
     def get_queryset(self):
         return self.qs(Message).filter(created_by_id=self.user.pk)
+
+
+class MessageChanges(ChangeFeedAPIView):
+    serializer_class = MessageListSerializer
+
+    def get_queryset(self):
+        return self.qs(Message).filter(Q(created_by_id=self.user.pk) | Q(recipient_id=self.user.pk))
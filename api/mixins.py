@@ -3,21 +3,25 @@ import operator
 import re
 from collections import OrderedDict
 from functools import reduce
-from http.client import responses
-from math import ceil
+from itertools import islice
 
 from django.conf import settings
-from django.db.models import Q, QuerySet
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q, QuerySet, prefetch_related_objects
 from querybuilder import query
 from rest_framework import serializers
 from rest_framework.response import Response
 
-from api import queryables, exceptions
+from api import queryables, exceptions, responses
+from api.compiled_serializers import CompiledListSerializer
+from api.conditional import ConditionalGetMixin
 from api.decorators import stored_property, stored_method
 from api.utils import is_csv_request
 from db import get_customer_domain_from_request, get_user_info_from_request
-from db.controller.models import Customer
+from db.controller.cache import customer_cache
 from db.customer import models
+from tools.query import iterate_queryset_chunks
+from tools.security.authorization import AdminUsersProvider
 
 
 class RequestArgMixin:
@@ -86,6 +90,10 @@ class ManageUISimpleSearchMixin:
     # separator regex for split simple search
     separators_regex = '[ \-=~!@#$%^&*()_+\[\]{};:"|<,./<>?]'
     additional_search_fields = ()
+    # optional api.search.TrigramSearchIndex used to narrow the substring predicates
+    search_index = None
+    # optional api.search.SearchResultCache of the simple_search query param results
+    search_result_cache = None
     search_fields = (
         'created_by__user_id',
         'created_by__name',
@@ -124,19 +132,7 @@ class ManageUISimpleSearchMixin:
     def _simple_search(self, queryset, substring_search_fields, id_fields):
         search_term = self.request.query_params.get('simple_search')
         if search_term:
-            predicates = [(field_name, search_term) for field_name in substring_search_fields]
-
-            try:
-                search_term = int(search_term)
-                for field in id_fields:
-                    predicates.append((field, search_term))
-            except ValueError:
-                pass
-
-            q_list = [Q(x) for x in predicates]
-            filter_clause = reduce(operator.or_, q_list)
-
-            queryset = queryset.filter(filter_clause)
+            queryset = self._search(queryset, substring_search_fields, id_fields, [search_term])
 
         return queryset
 
@@ -150,21 +146,24 @@ class ManageUISimpleSearchMixin:
     def _simple_body_search(self, queryset, substring_search_fields, id_fields):
         search_term = self.request.data.get('simple_search')
         if search_term:
-            predicates = [(field_name, search_term) for field_name in substring_search_fields]
+            queryset = queryset.filter(self._get_search_clause(queryset, substring_search_fields, id_fields, search_term))
 
-            try:
-                search_term = int(search_term)
-                for field in id_fields:
-                    predicates.append((field, search_term))
-            except ValueError:
-                pass
+        return queryset
 
-            q_list = [Q(x) for x in predicates]
-            filter_clause = reduce(operator.or_, q_list)
+    def _get_search_clause(self, queryset, substring_search_fields, id_fields, search_term):
+        q_list = [Q((field_name, search_term)) for field_name in substring_search_fields]
+        if self.search_index is not None and q_list:
+            q_list = [self.search_index.get_search_clause(queryset, substring_search_fields, search_term,
+                                                          reduce(operator.or_, q_list))]
 
-            queryset = queryset.filter(filter_clause)
+        try:
+            search_term = int(search_term)
+            for field in id_fields:
+                q_list.append(Q((field, search_term)))
+        except ValueError:
+            pass
 
-        return queryset
+        return reduce(operator.or_, q_list)
 
     def _search_terms_to_list(self, search_terms):
         return [search_term for search_term in re.split(self.separators_regex, search_terms.strip()) if search_term]
@@ -176,20 +175,26 @@ class ManageUISimpleSearchMixin:
             search_terms = self.request.query_params.get('simple_search')
         if search_terms:
             search_term_list = self._search_terms_to_list(search_terms)
-            for search_term in search_term_list:
-                predicates = [(field_name, search_term) for field_name in substring_search_fields]
+            if use_body_params:
+                queryset = self.apply_search_terms(queryset, substring_search_fields, id_fields, search_term_list)
+            elif search_term_list:
+                queryset = self._search(queryset, substring_search_fields, id_fields, search_term_list)
+
+        return queryset
 
-                try:
-                    search_term = int(search_term)
-                    for field in id_fields:
-                        predicates.append((field, search_term))
-                except ValueError:
-                    pass
+    def _search(self, queryset, substring_search_fields, id_fields, search_terms):
+        if self.search_result_cache is None:
+            return self.apply_search_terms(queryset, substring_search_fields, id_fields, search_terms)
 
-                q_list = [Q(x) for x in predicates]
-                filter_clause = reduce(operator.or_, q_list)
+        return self.search_result_cache.search(
+            queryset, substring_search_fields, id_fields, search_terms,
+            lambda qs, terms: self.apply_search_terms(qs, substring_search_fields, id_fields, terms),
+            key=type(self).__name__)
 
-                queryset = queryset.filter(filter_clause)
+    def apply_search_terms(self, queryset, substring_search_fields, id_fields, search_terms):
+        for search_term in search_terms:
+            queryset = queryset.filter(
+                self._get_search_clause(queryset, substring_search_fields, id_fields, search_term))
 
         return queryset
 
@@ -203,12 +208,8 @@ class CustomerMixin(queryables.Queryable):
 
     @stored_property
     def customer(self):
-        try:
-            # get_customer_domain_from_request can return the customer pk or domain
-            int(self.customer_domain)
-            return Customer.objects.using('controller').get(pk=self.customer_domain)
-        except ValueError:
-            return Customer.objects.using('controller').get(domain_name=self.customer_domain)
+        # get_customer_domain_from_request can return the customer pk or domain
+        return customer_cache.get(self.customer_domain)
 
     @stored_property
     def username(self):
@@ -229,45 +230,145 @@ class PermissionMixin(CustomerMixin):
 
     @stored_method
     def admin_role_check(self):
-        # query that checks if a user has an admin role.
-        return self.qs(models.UserRole).filter(
-            role__name__in=(models.Roles.ADMIN_ROLE,),
-            role__data_access=True,
-            user_id=self.user.pk,
-        ).exists()
+        # checks if a user has an admin role, the admin users of the customer are cached between requests
+        return AdminUsersProvider(self.customer_domain).is_admin(self.user)
 
 
-class LongListModelMixin:
+class SparseFieldsQuerysetMixin:
+    """
+    Loads only the model columns rendered by the serializer of GET requests, so the columns
+    trimmed with api.serializers.SparseFieldsMixin or never rendered (write only) are not fetched.
+    The queryset is left untouched when a rendered field can't be mapped to model columns.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in ('GET', 'HEAD') or not isinstance(queryset, QuerySet):
+            return queryset
+
+        columns = self.get_serializer_columns(queryset)
+        return queryset.only(*columns) if columns else queryset
+
+    def get_serializer_columns(self, queryset):
+        model = queryset.model
+        columns = {model._meta.pk.name}
+
+        for field in self.get_serializer().fields.values():
+            if field.write_only or isinstance(field, serializers.SerializerMethodField):
+                continue
+
+            if field.source == '*':
+                lookup_field = getattr(field, 'lookup_field', None)
+                if lookup_field is None:
+                    return None
+                source_parts = [lookup_field]
+            else:
+                source_parts = field.source.split('.')
+
+            if source_parts[0] == 'pk':
+                continue
+
+            try:
+                model_field = model._meta.get_field(source_parts[0])
+            except FieldDoesNotExist:
+                return None
+
+            if not model_field.concrete:
+                return None
+
+            if model_field.is_relation and len(source_parts) > 1 and \
+                    source_parts[0] in (queryset.query.select_related or {}):
+                columns.add('__'.join(source_parts))
+            else:
+                columns.add(model_field.name)
+
+        return columns
+
+
+class LongListModelMixin(ConditionalGetMixin):
     """
     This mixin is intended to overwrite "list" from rest_framework.mixins.ListModelMixin.
     For use in conjunction with sfapi.pagination.SalesfusionPaginationWithSinglePage
     to return the same structure response object with or without pagination.
+    Unchanged lists are answered with 304 Not Modified, see api.conditional.
     """
     def get_queryset_slices(self, queryset, limit, get_serializer=None):
         """
         Creates a generator for slicing a queryset up into chunks
         Pass in get_serializer method to return serialized data
+        Querysets in primary key order, the default ordering of the SchemaModels, are walked by primary key,
+        see tools.query.iterate_queryset_chunks. The other orderings are kept, the rows are read with iterator()
+        and prefetched per chunk.
         """
-        for offset in range(ceil(queryset.count() / limit)):
-            queryset_slice = queryset[offset * limit: offset * limit + limit]
+        if self._is_ordered_by_pk(queryset):
+            slices = iterate_queryset_chunks(queryset, limit)
+        else:
+            slices = self._iterate_ordered_slices(queryset, limit)
+
+        for queryset_slice in slices:
             if get_serializer:
                 queryset_slice = get_serializer(queryset_slice, many=True).data
             for qs_slice in queryset_slice:
                 yield qs_slice
 
+    @staticmethod
+    def _is_ordered_by_pk(queryset) -> bool:
+        query = queryset.query
+        ordering = query.order_by or (queryset.model._meta.ordering if query.default_ordering else ())
+        pk = queryset.model._meta.pk
+        return tuple(ordering) in ((), ('pk',), (pk.name,), (pk.attname,))
+
+    @staticmethod
+    def _iterate_ordered_slices(queryset, limit):
+        instances = queryset.iterator(chunk_size=limit)
+        while True:
+            queryset_slice = list(islice(instances, limit))
+            if not queryset_slice:
+                return
+            # iterator() ignores prefetch_related
+            prefetch_related_objects(queryset_slice, *queryset._prefetch_related_lookups)
+            yield queryset_slice
+
+    def get_csv_rows(self, queryset, limit):
+        """
+        Creates a generator of serialized rows, serializing limit instances at a time.
+        Querysets are read from a server-side cursor, so the whole result is never loaded in memory.
+        The rows of a CompiledListSerializer are serialized from .values(), see api.compiled_serializers.
+        """
+        serializer = self.get_serializer(queryset, many=True)
+        rows = serializer.iter_representation(limit) if isinstance(serializer, CompiledListSerializer) else None
+        if rows is not None:
+            yield from rows
+            return
+
+        if isinstance(queryset, QuerySet) and queryset._prefetch_related_lookups:
+            # iterator() ignores prefetch_related, so the prefetch is made per slice
+            yield from self.get_queryset_slices(queryset, limit, self.get_serializer)
+            return
+
+        if isinstance(queryset, QuerySet):
+            instances = queryset.iterator(chunk_size=limit)
+        elif isinstance(queryset, query.Query):
+            instances = iter(queryset.select())
+        else:
+            instances = iter(queryset)
+
+        while True:
+            batch = list(islice(instances, limit))
+            if not batch:
+                return
+            yield from self.get_serializer(batch, many=True).data
+
     def get_csv_response(self, queryset):
         """
         CSVs are generated with no page_size and may take longer than 2 minutes
         before we can return the response. This will cause nginx to kill the
-        connection. Therefore, slice the queryset and use a StreamingHttpResponse.
+        connection. Therefore, the header is sent right away and the rows are streamed
+        in bounded chunks with a StreamingHttpResponse.
         """
-        queryset = self.get_queryset_slices(
-            queryset,
-            settings.SQL_SERVER_PARAMETER_LIMIT,
-            self.get_serializer
-        )
+        rows = self.get_csv_rows(queryset, settings.SQL_SERVER_PARAMETER_LIMIT)
         response = responses.CSVStreamingHttpResponse(
-            [field for field, value in self.get_serializer().fields.items() if not value.write_only], queryset
+            [field for field, value in self.get_serializer().fields.items() if not value.write_only], rows
         )
         response['Content-Disposition'] = 'attachment; filename="SugarMarket.csv"'
 
@@ -286,6 +387,18 @@ class LongListModelMixin:
         if is_csv_request(request):
             return self.get_csv_response(queryset)
 
+        # The validators cost an aggregate query, they are read first only when they may answer 304
+        conditional = self.is_conditional_request()
+        validators = self.get_list_validators(queryset) if conditional else None
+        response = self.get_not_modified_response(validators)
+        if response is None:
+            response = self.get_list_response(request, queryset)
+            if not conditional and response.status_code == 200:
+                validators = self.get_list_validators(queryset)
+            response = self.set_validator_headers(response, validators)
+        return response
+
+    def get_list_response(self, request, queryset):
         # SQL Server limits the amount of parameters sent per query. If we are using
         # prefetch_related and the number of rows returned could exceed this limit, batch
         # the queryset in slices.
@@ -309,6 +422,7 @@ class LongListModelMixin:
         return Response(OrderedDict([
             ('count', count),
             ('total_count', permissionless_count),
+            ('count_approximate', False),
             ('page_size', count),
             ('page_number', self.get_page_number()),
             ('next', self.get_next_link()),
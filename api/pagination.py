@@ -1,25 +1,91 @@
-from collections import OrderedDict
+import base64
+import json
+from collections import OrderedDict, namedtuple
 
-from django.core.paginator import Paginator
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet
 from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination, _positive_int
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
+from api.counts import COUNT_MODE_QUERY_PARAM, get_count_strategy
 from api.utils import is_csv_request
 
 
+class CountStrategyPaginatorMixin:
+    """
+    Counts the rows with the strategy chosen by the pagination (see api.counts).
+    count_approximate tells whether the count is exact or not.
+    """
+    count_strategy = None
+    count_key = None
+    count_approximate = False
+
+    def get_count(self):
+        if self.count_strategy is None:
+            return self.object_list.count()
+
+        result = self.count_strategy.count(self.object_list, self.count_key)
+        self.count_approximate = result.approximate
+        return result.value
+
+
+class CountStrategyPaginator(CountStrategyPaginatorMixin, Paginator):
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return self.get_count()
+
+        return super().count
+
+
 class CustomPageNumberPagination(PageNumberPagination):
 
     page_size = 100
     max_page_size = 1000
     page_size_query_param = 'page_size'
 
+    django_paginator_class = CountStrategyPaginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        The only difference from the original paginate_queryset is passing the count strategy
+        of the view/request to the django paginator.
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count_strategy = get_count_strategy(request, view)
+        paginator.count_key = view.__class__.__name__ if view is not None else None
+
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.request = request
+        return list(self.page)
+
     def get_paginated_response(self, data):
         count = self.page.paginator.count
         permissionless_count = getattr(self, 'permissionless_count', count)
         return Response(OrderedDict([
             ('count', count),
             ('total_count', permissionless_count),
+            ('count_approximate', getattr(self.page.paginator, 'count_approximate', False)),
             ('page_size', self.get_page_size(self.request)),
             ('page_number', int(self.request.query_params.get(self.page_query_param, 1))),
             ('next', self.get_next_link()),
@@ -28,7 +94,8 @@ class CustomPageNumberPagination(PageNumberPagination):
         ]))
 
 
-class QueryPaginator(Paginator):
+class QueryPaginator(CountStrategyPaginatorMixin, Paginator):
+    _count = None
 
     def page(self, number):
         number = self.validate_number(number)
@@ -44,7 +111,7 @@ class QueryPaginator(Paginator):
 
     def _get_count(self):
         if self._count is None:
-            self._count = self.object_list.count()
+            self._count = self.get_count()
 
         return self._count
 
@@ -91,3 +158,217 @@ class PaginatorWithNoCount(Paginator):
 
 class PaginationWithNoCount(CustomPageNumberPagination):
     django_paginator_class = PaginatorWithNoCount
+
+
+KeysetColumn = namedtuple('KeysetColumn', ('name', 'path', 'descending', 'fields'))
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset (seek) pagination mode for the page number pagination classes.
+
+    The mode is used when the request has the cursor query parameter or paging=keyset,
+    otherwise the pagination falls back to the page number one. Instead of OFFSET the next page
+    is selected with a WHERE clause on the ordering values of the last row of the current page,
+    so deep pages cost the same as the first one and no COUNT(*) query is made.
+
+    The ordering comes from the ordering query parameter restricted to view.ordering_fields.
+    Serializer field sources are followed, so 'first_name' of UsersAttachedToRoleList orders by user__first_name.
+    The primary key is always the last ordering column, which makes the keys unique.
+    Only forward continuation is supported: 'next' holds an opaque cursor and 'previous' is always null.
+    count and total_count are the totals of the rows as in the page number mode, they are null unless
+    a count strategy is requested (see api.counts).
+    """
+    cursor_query_param = 'cursor'
+    paging_query_param = 'paging'
+    keyset_paging = 'keyset'
+    ordering_query_param = api_settings.ORDERING_PARAM
+
+    keyset_ordering = None
+
+    def is_keyset_request(self, request, queryset):
+        return isinstance(queryset, QuerySet) and (
+            self.cursor_query_param in request.query_params or
+            request.query_params.get(self.paging_query_param) == self.keyset_paging
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_keyset_request(request, queryset):
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.keyset_ordering = self.get_keyset_ordering(queryset, request, view)
+        self.keyset_count = self.get_keyset_count(queryset, request, view)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_seek_filter(cursor))
+
+        rows = list(queryset.order_by(*self.get_order_by())[:page_size + 1])
+        self.keyset_page = rows[:page_size]
+        self.keyset_has_next = len(rows) > page_size
+        return self.keyset_page
+
+    def get_paginated_response(self, data):
+        if self.keyset_ordering is None:
+            return super().get_paginated_response(data)
+
+        count = self.keyset_count.value if self.keyset_count else None
+        return Response(OrderedDict([
+            ('count', count),
+            ('total_count', getattr(self, 'permissionless_count', count)),
+            ('count_approximate', bool(self.keyset_count and self.keyset_count.approximate)),
+            ('page_size', self.get_page_size(self.request)),
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if self.keyset_ordering is None:
+            return super().get_next_link()
+
+        if not self.keyset_has_next:
+            return None
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.keyset_page[-1]))
+
+    def get_previous_link(self):
+        if self.keyset_ordering is None:
+            return super().get_previous_link()
+
+        return None
+
+    def get_keyset_count(self, queryset, request, view):
+        """
+        The total is only counted when the view or the request asks for a count strategy.
+        """
+        if COUNT_MODE_QUERY_PARAM not in request.query_params and not getattr(view, 'count_strategy', None):
+            return None
+
+        return get_count_strategy(request, view).count(queryset, view.__class__.__name__)
+
+    def get_keyset_ordering(self, queryset, request, view):
+        model = queryset.model
+        ordering_fields = getattr(view, 'ordering_fields', None) or ()
+        serializer_fields = view.get_serializer().fields if view is not None else {}
+
+        ordering = []
+        for term in request.query_params.get(self.ordering_query_param, '').split(','):
+            name = term.strip().lstrip('-')
+            if name not in ordering_fields:
+                continue
+
+            field = serializer_fields.get(name)
+            source = field.source if field is not None and field.source != '*' else name
+            path = source.replace('.', '__')
+            ordering.append(KeysetColumn(name, path, term.strip().startswith('-'), self._get_path_fields(model, path)))
+
+        pk_name = model._meta.pk.name
+        if not any(column.path in (pk_name, 'pk') for column in ordering):
+            ordering.append(KeysetColumn(pk_name, pk_name, False, [model._meta.pk]))
+
+        return ordering
+
+    def get_order_by(self):
+        order_by = []
+        for column in self.keyset_ordering:
+            expression = F(column.path)
+            # NULLs are placed as the smallest values on every backend so the seek filter stays consistent
+            if self._is_nullable(column):
+                order_by.append(expression.desc(nulls_last=True) if column.descending else
+                                expression.asc(nulls_first=True))
+            else:
+                order_by.append(expression.desc() if column.descending else expression.asc())
+
+        return order_by
+
+    def get_seek_filter(self, values):
+        """
+        For the ordering (a, -b, pk) and the last row values (x, y, z) builds:
+        a > x OR (a = x AND b < y) OR (a = x AND b = y AND pk > z)
+        """
+        seek, equal = Q(pk__in=[]), Q()
+        for column, value in zip(self.keyset_ordering, values):
+            after = self._after_filter(column, value)
+            if after is not None:
+                seek |= equal & after
+            equal &= Q(**{column.path + '__isnull': True}) if value is None else Q(**{column.path: value})
+
+        return seek
+
+    def encode_cursor(self, instance):
+        values = [self._get_value(instance, column) for column in self.keyset_ordering]
+        payload = json.dumps({
+            'o': [('-' if column.descending else '') + column.name for column in self.keyset_ordering],
+            'v': values,
+        }, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+            ordering = [('-' if column.descending else '') + column.name for column in self.keyset_ordering]
+            if payload['o'] != ordering or len(payload['v']) != len(ordering):
+                raise ValueError
+
+            return [
+                None if value is None else column.fields[-1].to_python(value)
+                for column, value in zip(self.keyset_ordering, payload['v'])
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def _after_filter(self, column, value):
+        if column.descending:
+            if value is None:
+                return None
+            after = Q(**{column.path + '__lt': value})
+            return after | Q(**{column.path + '__isnull': True}) if self._is_nullable(column) else after
+
+        if value is None:
+            return Q(**{column.path + '__isnull': False})
+        return Q(**{column.path + '__gt': value})
+
+    @staticmethod
+    def _get_path_fields(model, path):
+        fields = []
+        for part in path.split('__'):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                raise NotFound('Invalid ordering "%s"' % path)
+            fields.append(field)
+            model = field.related_model or model
+
+        return fields
+
+    @staticmethod
+    def _is_nullable(column):
+        return any(field.null for field in column.fields)
+
+    @staticmethod
+    def _get_value(instance, column):
+        for field in column.fields[:-1]:
+            instance = getattr(instance, field.name)
+            if instance is None:
+                return None
+
+        return column.fields[-1].value_from_object(instance)
+
+
+class KeysetPageNumberPagination(KeysetPaginationMixin, CustomPageNumberPagination):
+    pass
+
+
+class KeysetPaginationWithSinglePage(KeysetPaginationMixin, CustomPaginationWithSinglePage):
+    pass
@@ -1,6 +1,13 @@
+from db.tenants import tenant_connections
+
+
 class Queryable:
-    def qs(self, model):
-        return model.objects.using(self.customer_domain)
+    def qs(self, model, cached=False):
+        """
+        cached=True reads the rows through the query cache, see db.query_cache
+        """
+        queryset = model.objects.using(tenant_connections.ensure(self.customer_domain))
+        return queryset.cached() if cached else queryset
 
     def create_object(self, model, **kwargs):
         return self.qs(model).create(**kwargs)
@@ -0,0 +1,33 @@
+from collections.abc import Iterable, Mapping
+
+from rest_framework.renderers import BaseRenderer
+
+from api.responses import iter_csv_chunks
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Allows the text/csv content negotiation (?format=csv or the Accept header).
+    The list views stream CSV through api.responses.CSVStreamingHttpResponse, this renderer
+    only handles the regular responses such as a detail object or an error.
+    Rows that are not mappings, e.g. the messages of a list of errors, are written in a single value column.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return ''
+
+        if isinstance(data, Mapping):
+            data = data.get('results', [data])
+        if isinstance(data, (str, bytes)) or not isinstance(data, Iterable):
+            data = [data]
+
+        rows = [row if isinstance(row, Mapping) else {'value': row} for row in data]
+        fields = []
+        for row in rows:
+            fields.extend(field for field in row if field not in fields)
+
+        return ''.join(iter_csv_chunks(fields, rows))
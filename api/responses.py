@@ -0,0 +1,42 @@
+import csv
+import io
+from typing import Iterable, Iterator, List, Mapping
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+
+def iter_csv_chunks(fields: List[str], rows: Iterable[Mapping], chunk_size: int = None) -> Iterator[str]:
+    """
+    Writes the header and the rows as CSV text and yields it in chunks of about chunk_size characters.
+    The header is yielded on its own, before the first row is requested from the rows iterable.
+    """
+    chunk_size = chunk_size or settings.CSV_STREAMING_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for row in rows:
+        writer.writerow([row.get(field) for field in fields])
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class CSVStreamingHttpResponse(StreamingHttpResponse):
+    """
+    Streams the serialized rows as CSV without buffering the whole result.
+    The columns follow the order of fields, values missing in a row are written as empty cells.
+    """
+
+    def __init__(self, fields: List[str], rows: Iterable[Mapping], chunk_size: int = None, **kwargs):
+        kwargs.setdefault('content_type', 'text/csv; charset=utf-8')
+        super().__init__(iter_csv_chunks(fields, rows, chunk_size), **kwargs)
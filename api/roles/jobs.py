@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db import transaction
+
+from api.jobs.base import JobHandler, register_job_handler
+from api.mixins import ManageUISimpleSearchMixin
+from api.roles.services import RoleCopyService, RoleUsersService
+from api.search import user_search_index
+from db.customer.models import Roles, User
+
+
+class RoleUsersSearch(ManageUISimpleSearchMixin):
+    search_index = user_search_index
+
+
+@register_job_handler
+class RoleUsersJob(JobHandler):
+    """
+    Links (link=true) or unlinks the users of a role in chunks of JOB_CHUNK_SIZE users.
+    The job applies to payload user_ids or, without user_ids, to the active users matching search_terms.
+    """
+    kind = 'roles.users'
+
+    def run(self, job, progress):
+        payload = job.payload
+        service = RoleUsersService(job.customer_domain)
+        role = service.qs(Roles).get(pk=payload['role_id'])
+        user = service.qs(User).filter(pk=job.created_by_id).first()
+        link = payload['link']
+        user_ids = payload.get('user_ids')
+
+        users = service.get_updatable_users(role, link)
+        if user_ids is None:
+            users = users.filter(status=User.STATUS_ACTIVE)
+            if payload.get('search_terms'):
+                users = RoleUsersSearch().apply_search_terms(users, payload['search_fields'], ('user_id',),
+                                                             payload['search_terms'])
+
+        if job.total is None:
+            progress.set_total(len(set(user_ids)) if user_ids is not None else users.count())
+
+        state = dict(job.state) or {'last_pk': 0, 'count': 0}
+        for chunk_ids in self._get_chunks(users, user_ids, state['last_pk']):
+            with transaction.atomic(using=users.db):
+                state['count'] += service.change_users(user, role, link, users.filter(pk__in=chunk_ids))
+                service.invalidate_caches()
+            state['last_pk'] = chunk_ids[-1]
+            progress.advance(len(chunk_ids), state)
+
+        return {'count': state['count']}
+
+    @staticmethod
+    def _get_chunks(users, user_ids, last_pk):
+        chunk_size = settings.JOB_CHUNK_SIZE
+        if user_ids is not None:
+            user_ids = sorted(pk for pk in set(user_ids) if pk > last_pk)
+            for start in range(0, len(user_ids), chunk_size):
+                yield user_ids[start:start + chunk_size]
+            return
+
+        while True:
+            chunk_ids = list(users.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not chunk_ids:
+                return
+            yield chunk_ids
+            last_pk = chunk_ids[-1]
+
+
+@register_job_handler
+class RoleCopyJob(JobHandler):
+    kind = 'roles.copy'
+
+    def run(self, job, progress):
+        service = RoleCopyService(job.customer_domain)
+        if job.attempts > 1:
+            # The copy of a previous attempt may have been committed before its worker stopped
+            copied_role = service.qs(Roles).filter(name=job.payload['name']).first()
+            if copied_role:
+                return {'role_id': copied_role.pk}
+
+        role = service.qs(Roles).get(pk=job.payload['role_id'])
+        user = service.qs(User).filter(pk=job.created_by_id).first()
+        copied_role = service.copy_role(user, role, {'name': job.payload['name']})
+        return {'role_id': copied_role.pk}
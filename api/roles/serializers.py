@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.relations import HyperlinkedIdentityField
 from rest_framework.validators import UniqueValidator
 
+from api.compiled_serializers import CompiledListSerializer
 from api.serializer_fields import OptionsMappingField
 from api.serializers import AutoNowMixin, AutoUserMixin
 from db.customer.models import Roles, User, UserRole
@@ -45,6 +46,7 @@ class RolesListSerializer(RolesBaseSerializer):
             'description',
         )
         model = Roles
+        list_serializer_class = CompiledListSerializer
 
 
 class RolesDetailSerializer(RolesBaseSerializer):
@@ -158,10 +160,13 @@ class UsersAttachedToRoleListSerializer(serializers.ModelSerializer):
         )
 
         model = UserRole
+        list_serializer_class = CompiledListSerializer
 
 
 class UsersNotAttachedToRoleList(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(view_name='users:detail')
+    # Not a column of User, skipped as in UsersAttachedToRoleListSerializer
+    is_temp_admin = serializers.BooleanField(read_only=True)
     status = OptionsMappingField(options=User.STATUS_CHOICES, read_only=True)
 
     class Meta:
@@ -178,3 +183,4 @@ class UsersNotAttachedToRoleList(serializers.ModelSerializer):
         )
 
         model = User
+        list_serializer_class = CompiledListSerializer
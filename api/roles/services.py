@@ -1,13 +1,20 @@
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 
+from django.conf import settings
 from django.utils import timezone
 
 from rest_framework import exceptions
 
 from django.db import transaction
+from django.db.models import IntegerField, QuerySet, Value
 
+from api.audit import attributes_log, user_history_log
 from api.queryables import CustomerQueryable
+from api.search import invalidate_search_results
+from db.cache import TTLCache
 from db.customer.models import RoleAttribute, UserRole, Roles, User
+from tools.query import insert_from_select
+from tools.security.authorization import invalidate_admin_users, invalidate_security_settings
 
 
 class RoleCopyService(CustomerQueryable):
@@ -17,8 +24,7 @@ class RoleCopyService(CustomerQueryable):
         attributes
         """
 
-        role_users = self.qs(UserRole).filter(role=role)
-        role_attributes = self.qs(RoleAttribute).filter(role_id=role.role_id)
+        source_role_id = role.role_id
 
         role.role_id = None
         for attr, value in validated_data.items():
@@ -26,25 +32,55 @@ class RoleCopyService(CustomerQueryable):
         role.created_by = role.updated_by = user
         role.created_date = role.updated_date = timezone.now()
 
+        # The users and attributes are copied by the database, one INSERT ... SELECT per table
         with transaction.atomic(using=self.customer_domain):
             role.save()
-            self._copy_related_entities(role_attributes, 'role_attribute_id', 'role_id', role.role_id)
-            self._copy_related_entities(role_users, 'user_roles_id', 'role', role)
-
-            attributes_to_log = list(attr.name for attr in role_attributes if
-                                     attr.name_value == RoleAttribute.NAME_VALUE_TRUE)
+            role_value = Value(role.role_id, output_field=IntegerField())
+            insert_from_select(RoleAttribute, self.qs(RoleAttribute).filter(role_id=source_role_id),
+                               {'role_id': role_value, 'name': 'name', 'name_value': 'name_value'})
+            insert_from_select(UserRole, self.qs(UserRole).filter(role_id=source_role_id),
+                               {'user': 'user_id', 'role': role_value})
+            invalidate_security_settings(self.customer_domain)
+            invalidate_admin_users(self.customer_domain)
+
+            attributes_to_log = list(self.qs(RoleAttribute).filter(
+                role_id=role.role_id, name_value=RoleAttribute.NAME_VALUE_TRUE).values_list('name', flat=True))
             if role.data_access == Roles.HAS_ACCESS_TRUE:
                 attributes_to_log.append("data_access")
             if role.menu_access == Roles.HAS_ACCESS_TRUE:
                 attributes_to_log.append("menu_access")
+            attributes_log(user, self.customer_domain, role, attributes_to_log, True)
         return role
 
-    def _copy_related_entities(self, qs, id_field, role_field, role_value):
-        objs = list(qs)
-        for obj in objs:
-            setattr(obj, id_field, None)
-            setattr(obj, role_field, role_value)
-        qs.bulk_create(objs)
+
+class RoleUsersService(CustomerQueryable):
+    """
+    Links and unlinks the users of a role with set-based statements, the users are never loaded.
+    No signals are sent, call invalidate_caches() in the transaction of the change.
+    """
+
+    def get_updatable_users(self, role: Roles, link: bool) -> QuerySet:
+        users = self.qs(User)
+        return users.exclude(roles=role) if link else users.filter(roles=role)
+
+    def change_users(self, user: User, role: Roles, link: bool, users: QuerySet) -> int:
+        return self.link_users(user, role, users) if link else self.unlink_users(user, role, users)
+
+    def link_users(self, user: User, role: Roles, users: QuerySet) -> int:
+        # INSERT ... SELECT, the users queryset is copied into the audit log before the links are made
+        user_history_log(user, self.customer_domain, role, users, True)
+        return insert_from_select(UserRole, users, {'user': 'pk', 'role': Value(role.pk, output_field=IntegerField())})
+
+    def unlink_users(self, user: User, role: Roles, users: QuerySet) -> int:
+        # DELETE ... WHERE UserID IN (subquery), QuerySet.delete() would load the links to send the signals
+        user_history_log(user, self.customer_domain, role, users, False)
+        links = self.qs(UserRole).filter(role=role, user__in=users)
+        return links._raw_delete(links.db)
+
+    def invalidate_caches(self) -> None:
+        invalidate_security_settings(self.customer_domain)
+        invalidate_admin_users(self.customer_domain)
+        invalidate_search_results(self.customer_domain)
 
 
 def validate_unique(role_name, queryset):
@@ -52,20 +88,64 @@ def validate_unique(role_name, queryset):
         raise exceptions.ValidationError({'detail': 'Name must be unique'})
 
 
+# (customer pk, enabled controller attribute names) -> navigation permission tree
+navigation_tree_cache = TTLCache(
+    max_size=settings.NAVIGATION_TREE_CACHE_MAX_SIZE,
+    ttl=settings.NAVIGATION_TREE_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_navigation_tree(customer_pk=None) -> None:
+    """
+    Drops the cached trees of the customer, or of every customer when the navigation permissions change.
+    """
+    if customer_pk is None:
+        navigation_tree_cache.clear()
+    else:
+        navigation_tree_cache.delete_matching(lambda key: key[0] == customer_pk)
+
+
 class RoleAttributesService(CustomerQueryable):
     def __init__(self, customer):
         self.customer = customer
         super().__init__(customer_domain=self.customer.domain_name)
 
-    def _get_navigation_permissions(self):
-        return NavigationPermission.objects.using('sfcontroller').filter(attribute_name__in=list(
-            ControllerAttribute.objects.using('sfcontroller').filter(
-                customer=self.customer, source_value='True').values_list('source_name', flat=True)))
+    def _get_enabled_attribute_names(self):
+        return ControllerAttribute.objects.using('sfcontroller').filter(
+            customer=self.customer, source_value='True').values_list('source_name', flat=True)
+
+    def _get_navigation_permissions(self, enabled_attribute_names=None):
+        if enabled_attribute_names is None:
+            enabled_attribute_names = self._get_enabled_attribute_names()
+        return NavigationPermission.objects.using('sfcontroller').filter(
+            attribute_name__in=list(enabled_attribute_names))
 
     def get_role_attributes(self):
-        attributes = self._get_navigation_permissions().values('pk', 'parent', 'label', 'attribute_name', 'category')
+        """
+        Returns the navigation permission tree of the customer: every parent sorted by category followed by
+        its children sorted by label. The tree is the same for every role, it is cached per customer and set
+        of enabled controller attributes, so enabling or disabling an attribute builds a new tree.
+        """
+        enabled_attribute_names = frozenset(self._get_enabled_attribute_names())
+        key = (self.customer.pk, enabled_attribute_names)
+        role_attributes = navigation_tree_cache.get_or_set(
+            key, lambda: self._build_role_attributes(enabled_attribute_names))
+        return list(role_attributes)
+
+    def _build_role_attributes(self, enabled_attribute_names):
+        attributes = self._get_navigation_permissions(enabled_attribute_names).values(
+            'pk', 'parent', 'label', 'attribute_name', 'category')
+
+        # One sort and one pass over the attributes, the children keep the label order
+        parents = []
+        children = defaultdict(list)
+        for attr in sorted(attributes, key=lambda tup: tup['label']):
+            if attr['parent'] is None:
+                parents.append(attr)
+            else:
+                children[attr['parent']].append(attr)
+
         role_attributes = []
-        parents = [attr for attr in attributes if attr['parent'] is None]
         for parent_attr in sorted(parents, key=lambda tup: tup['category']):
             role_attributes.append({"label": parent_attr['label'],
                                     "name": parent_attr['attribute_name'],
@@ -73,6 +153,5 @@ class RoleAttributesService(CustomerQueryable):
             role_attributes += [{"label": "%s - %s" % (sub_attr['category'],
                                                        sub_attr['label']),
                                  "name": sub_attr['attribute_name'], "is_parent": False}
-                                for sub_attr in sorted(attributes, key=lambda tup: tup['label'])
-                                if sub_attr['parent'] == parent_attr['pk']]
-        return role_attributes
+                                for sub_attr in children[parent_attr['pk']]]
+        return tuple(role_attributes)
@@ -4,6 +4,7 @@ from api.roles import views
 
 urlpatterns = [
     path('', views.RolesListCreateView.as_view(), name='role_list_create'),
+    path('changes/', views.RolesChanges.as_view(), name='role_changes'),
     path(r'^(?P<role_id>[0-9]+)/$', views.RolesDetailView.as_view(), name='role_detail'),
     path(r'^(?P<role_id>[0-9]+)/clone/$', views.UserRoleCopy.as_view(), name='role_copy'),
     path(r'^(?P<role_id>[0-9]+)/users/$', views.UsersAttachedToRoleList.as_view(), name='users_attached_to_role_list'),
@@ -1,4 +1,4 @@
-import distutils
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import status
@@ -6,23 +6,29 @@ from rest_framework.exceptions import ValidationError, PermissionDenied
 from rest_framework.generics import DestroyAPIView, CreateAPIView
 from rest_framework.response import Response
 
+from api.changes import ChangeFeedAPIView
 from api.generics import NoCacheListCreateAPIView, NoCacheRetrieveUpdateDeleteAPIView, NoCacheListAPIView
+from api.audit import attributes_log
+from api.jobs.views import JobMixin
 from api.mixins import CustomerMixin, ManageUISimpleSearchMixin, RequestArgMixin, PermissionMixin
-from api.pagination import CustomPaginationWithSinglePage
+from api.pagination import CustomPaginationWithSinglePage, KeysetPaginationWithSinglePage
 from api.roles import serializers
 from api.roles.filters import RolesFilterSet
 from api.roles.serializers import RoleAttributeListSerializer, UsersAttachedToRoleListSerializer, \
     UsersNotAttachedToRoleList
-from api.roles.services import validate_unique, RoleCopyService, RoleAttributesService
-from db.customer.models import Roles, User, UserRole, RoleAttribute
+from api.roles.jobs import RoleCopyJob, RoleUsersJob
+from api.roles.services import validate_unique, RoleCopyService, RoleAttributesService, RoleUsersService
+from api.search import user_search_index, user_search_results
+from db.customer.models import Roles, User, RoleAttribute
 from tools import IsAuthenticatedOrOptions
+from tools.security.authorization import invalidate_admin_users, invalidate_security_settings
 from tools.query import get_object_or_404_with_message
 
 
 class RolesListCreateView(NoCacheListCreateAPIView,
                           CustomerMixin, ManageUISimpleSearchMixin, RequestArgMixin):
     permission_classes = (IsAuthenticatedOrOptions,)
-    pagination_class = CustomPaginationWithSinglePage
+    pagination_class = KeysetPaginationWithSinglePage
     serializer_class = serializers.RolesListSerializer
     filter_class = RolesFilterSet
 
@@ -45,7 +51,7 @@ class RolesListCreateView(NoCacheListCreateAPIView,
     )
 
     def get_queryset(self):
-        return self.convert_search_to_simple_search(self.qs(Roles), self.search_fields, ('role_id',))
+        return self.convert_search_to_simple_search(self.qs(Roles, cached=True), self.search_fields, ('role_id',))
 
     def create(self, request, *args, **kwargs):
         name = self.get_argument(arg_name='name', arg_type=str, required=True)
@@ -62,26 +68,30 @@ class RolesListCreateView(NoCacheListCreateAPIView,
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class RolesChanges(ChangeFeedAPIView):
+    serializer_class = serializers.RolesListSerializer
+
+    def get_queryset(self):
+        return self.qs(Roles)
+
+
 class RolesDetailView(NoCacheRetrieveUpdateDeleteAPIView, CustomerMixin, RequestArgMixin):
     permission_classes = (IsAuthenticatedOrOptions,)
     serializer_class = serializers.RolesDetailSerializer
     lookup_field = 'role_id'
+    # created_by_name and updated_by_name change with the users, not with the updated_date of the role
+    last_modified_field = None
 
     def get_queryset(self):
         return self.qs(Roles).select_related('created_by', 'updated_by')
 
     def log_access(self, data_access, menu_access, has_data_access_before, has_menu_access_before, role):
-        if data_access and menu_access and data_access == menu_access and data_access != has_data_access_before and \
-                menu_access != has_menu_access_before:
-            attributes_log(self.user, self.customer_domain, role, ['data_access', 'menu_access'],
-                           bool(distutils.util.strtobool(data_access)))
-        else:
-            if data_access and data_access != has_data_access_before:
-                attributes_log(self.user, self.customer_domain, role, ['data_access'],
-                               bool(distutils.util.strtobool(data_access)))
-            if menu_access and menu_access != has_menu_access_before:
-                attributes_log(self.user, self.customer_domain, role, ['menu_access'],
-                               bool(distutils.util.strtobool(menu_access)))
+        # data_access and menu_access are the 'True' / 'False' arguments, None when not sent
+        for name, access, has_access_before in (('data_access', data_access, has_data_access_before),
+                                                ('menu_access', menu_access, has_menu_access_before)):
+            has_access = access == Roles.HAS_ACCESS_TRUE
+            if access is not None and has_access != has_access_before:
+                attributes_log(self.user, self.customer_domain, role, [name], has_access)
 
     def patch(self, request, *args, **kwargs):
         role = self.get_object()
@@ -116,13 +126,15 @@ class RolesDetailView(NoCacheRetrieveUpdateDeleteAPIView, CustomerMixin, Request
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UsersAttachedToRoleList(NoCacheListCreateAPIView, DestroyAPIView, PermissionMixin,
+class UsersAttachedToRoleList(JobMixin, NoCacheListCreateAPIView, DestroyAPIView, PermissionMixin,
                               RequestArgMixin, ManageUISimpleSearchMixin):
     permission_classes = (IsAuthenticatedOrOptions,)
     serializer_class = UsersAttachedToRoleListSerializer
 
     USER_ID_LIST_BODY_ARGUMENT = 'user_ids'
 
+    search_index = user_search_index
+    search_result_cache = user_search_results
     search_fields = ('first_name', 'last_name', 'email',)
 
     ordering_fields = (
@@ -148,16 +160,51 @@ class UsersAttachedToRoleList(NoCacheListCreateAPIView, DestroyAPIView, Permissi
                                                                      'user__email'), ('user_id',))
 
     def handle_params(self, request, queryset):
+        """
+        Returns the list of querysets of the users selected by the request body. The user_ids are split
+        so the statements made with every queryset stay under SQL_SERVER_PARAMETER_LIMIT parameters.
+        """
         if request.data.get(self.USER_ID_LIST_BODY_ARGUMENT):
             user_ids = self.get_argument(self.USER_ID_LIST_BODY_ARGUMENT, int, required=True, many=True)
-            updated_queryset = queryset.filter(user_id__in=user_ids)
+            chunk_size = settings.SQL_SERVER_PARAMETER_LIMIT // 2
+            updated_querysets = [queryset.filter(user_id__in=user_ids[start:start + chunk_size])
+                                 for start in range(0, len(user_ids), chunk_size)]
         elif request.data.get('simple_search'):
-            updated_queryset = self.convert_search_to_split_simple_search(
-                queryset.filter(status=User.STATUS_ACTIVE), self.search_fields, ('user_id',), use_body_params=True)
+            updated_querysets = [self.convert_search_to_split_simple_search(
+                queryset.filter(status=User.STATUS_ACTIVE), self.search_fields, ('user_id',), use_body_params=True)]
         else:
             raise ValidationError("Incorrect params!")
 
-        return updated_queryset
+        return updated_querysets
+
+    def get_users_job_payload(self, request, role, link):
+        payload = {'role_id': role.pk, 'link': link}
+        if request.data.get(self.USER_ID_LIST_BODY_ARGUMENT):
+            payload['user_ids'] = self.get_argument(self.USER_ID_LIST_BODY_ARGUMENT, int, required=True, many=True)
+        elif request.data.get('simple_search'):
+            payload['search_fields'] = self._prepare_body_search_fields(
+                self._search_fields_to_substring(self.search_fields, ('user_id',)), ('user_id',))
+            payload['search_terms'] = self._search_terms_to_list(request.data['simple_search'])
+        elif request.data:
+            raise ValidationError("Incorrect params!")
+
+        return payload
+
+    def change_users(self, request, role, link) -> int:
+        service = RoleUsersService(self.customer_domain)
+        updatable_users = service.get_updatable_users(role, link)
+        if not request.data:
+            users_to_change = [updatable_users.filter(status=User.STATUS_ACTIVE)]
+        else:
+            users_to_change = self.handle_params(request, updatable_users)
+
+        count = 0
+        with transaction.atomic(using=self.customer_domain):
+            for users in users_to_change:
+                count += service.change_users(self.user, role, link, users)
+            service.invalidate_caches()
+
+        return count
 
     def create(self, request, *args, **kwargs):
         role = self._get_role()
@@ -165,49 +212,43 @@ class UsersAttachedToRoleList(NoCacheListCreateAPIView, DestroyAPIView, Permissi
         if role.name in (Roles.ADMIN_NAVIGATION, Roles.ADMIN_ROLE) and not self.admin_role_check():
             raise PermissionDenied('Cannot assign admin role without admin authorization')
 
-        updatable_users = self.qs(User).exclude(roles=role)
-
         # There are options:
         # 1) empty body of request - apply to all active users
         # 2) only user_ids param in the request - apply for corresponding users (active and inactive)
         # 3) only simple_search param in the request - all active users by filter criteria
         # if user_ids and simple_search presented simple_search will be ignored
+        # With ?async=true the change is made by a roles.users job
 
-        if not request.data:
-            users_to_link = updatable_users.filter(status=User.STATUS_ACTIVE)
-            msg = {"detail": "All active users have been attached to this role"}
-        else:
-            users_to_link = self.handle_params(request, updatable_users)
-            msg = {"detail": "The role has been attached to these users"}
+        if self.run_as_job():
+            return self.enqueue_job_response(RoleUsersJob.kind, self.get_users_job_payload(request, role, link=True))
 
-        with transaction.atomic(using=self.customer_domain):
-            self.qs(UserRole).bulk_create([
-                UserRole(role=role, user=user) for user in users_to_link
-            ])
-            user_history_log(self.user, self.customer_domain, role, users_to_link, True)
+        count = self.change_users(request, role, link=True)
 
+        if not request.data:
+            msg = {"detail": "All active users have been attached to this role", "count": count}
+        else:
+            msg = {"detail": "The role has been attached to these users", "count": count}
         return Response(msg, status=status.HTTP_201_CREATED)
 
     def destroy(self, request, *args, **kwargs):
         role = self._get_role()
-        updatable_users = self.qs(User).filter(roles=role)
 
         # There are options:
         # 1) empty body of request - unlink from all active users
         # 2) only user_ids param in the request - unlink from corresponding users (active and inactive)
         # 3) only simple_search param in the request - all active users by filter criteria
         # if user_ids and simple_search presented simple_search will be ignored
+        # With ?async=true the change is made by a roles.users job
+
+        if self.run_as_job():
+            return self.enqueue_job_response(RoleUsersJob.kind, self.get_users_job_payload(request, role, link=False))
+
+        count = self.change_users(request, role, link=False)
 
         if not request.data:
-            users_to_unlink = updatable_users.filter(status=User.STATUS_ACTIVE)
-            msg = {"detail": "All active users have been unlinked from this role"}
+            msg = {"detail": "All active users have been unlinked from this role", "count": count}
         else:
-            users_to_unlink = self.handle_params(request, updatable_users)
-            msg = {"detail": "The role has been unlinked from these users"}
-
-        with transaction.atomic(using=self.customer_domain):
-            self.qs(UserRole).filter(role=role, user__in=users_to_unlink).delete()
-            user_history_log(self.user, self.customer_domain, role, users_to_unlink, False)
+            msg = {"detail": "The role has been unlinked from these users", "count": count}
         return Response({"detail": msg}, status=status.HTTP_200_OK)
 
 
@@ -220,7 +261,7 @@ class RolesAttributesView(NoCacheListCreateAPIView, DestroyAPIView, CustomerMixi
     def _get_role(self):
         role_id = self.kwargs['role_id']
         return get_object_or_404_with_message(
-            {'detail': f'Role {role_id} does not exist!'})(self.qs(Roles), role_id=role_id)
+            {'detail': f'Role {role_id} does not exist!'})(self.qs(Roles, cached=True), role_id=role_id)
 
     def get_queryset(self):
         role = self._get_role()
@@ -229,7 +270,7 @@ class RolesAttributesView(NoCacheListCreateAPIView, DestroyAPIView, CustomerMixi
                 if attribute['name'] in linked_attrs_values]
 
     def get_attributes_dict(self, role_id, only_true_values=False):
-        qs = self.qs(RoleAttribute).filter(role_id=role_id)
+        qs = self.qs(RoleAttribute, cached=True).filter(role_id=role_id)
         if only_true_values:
             qs = qs.filter(name_value=RoleAttribute.NAME_VALUE_TRUE)
         return dict(qs.values_list('name', 'name_value'))
@@ -250,6 +291,7 @@ class RolesAttributesView(NoCacheListCreateAPIView, DestroyAPIView, CustomerMixi
             self.qs(RoleAttribute).bulk_create(
                 (RoleAttribute(name=attr, name_value=RoleAttribute.NAME_VALUE_TRUE, role_id=role.pk)
                  for attr in attributes_to_add if attr not in attributes_dict))
+            invalidate_security_settings(self.customer_domain)
         return Response({"detail": "Role attributes have been added"}, status.HTTP_201_CREATED)
 
     def destroy(self, request, *args, **kwargs):
@@ -268,6 +310,7 @@ class RolesAttributesView(NoCacheListCreateAPIView, DestroyAPIView, CustomerMixi
             self.qs(RoleAttribute).bulk_create(
                 (RoleAttribute(name=attr, name_value=RoleAttribute.NAME_VALUE_FALSE, role_id=role.pk)
                  for attr in attributes_to_delete if attr not in attributes_dict))
+            invalidate_security_settings(self.customer_domain)
         return Response({"detail": "Role attributes have been removed"}, status.HTTP_200_OK)
 
 
@@ -275,6 +318,8 @@ class UsersNotAttachedToRoleList(ManageUISimpleSearchMixin, NoCacheListAPIView,
     permission_classes = (IsAuthenticatedOrOptions,)
     serializer_class = UsersNotAttachedToRoleList
 
+    search_index = user_search_index
+    search_result_cache = user_search_results
     search_fields = ('first_name', 'last_name', 'email',)
 
     ordering_fields = (
@@ -291,11 +336,11 @@ class UsersNotAttachedToRoleList(ManageUISimpleSearchMixin, NoCacheListAPIView,
     def _get_role(self):
         role_id = self.kwargs['role_id']
         return get_object_or_404_with_message(
-            {'detail': f'Role {role_id} does not exist!'})(self.qs(Roles), role_id=role_id)
+            {'detail': f'Role {role_id} does not exist!'})(self.qs(Roles, cached=True), role_id=role_id)
 
     def get_queryset(self):
         role = self._get_role()
-        qs = self.qs(User).filter(status=User.STATUS_ACTIVE).exclude(roles=role)
+        qs = self.qs(User, cached=True).filter(status=User.STATUS_ACTIVE).exclude(roles=role)
         return self.convert_search_to_split_simple_search(
             qs,
             self.search_fields,
@@ -303,7 +348,7 @@ class UsersNotAttachedToRoleList(ManageUISimpleSearchMixin, NoCacheListAPIView,
         )
 
 
-class UserRoleCopy(CreateAPIView, CustomerMixin):
+class UserRoleCopy(JobMixin, CreateAPIView, CustomerMixin):
     permission_classes = (IsAuthenticatedOrOptions,)
     serializer_class = serializers.RolesCopySerializer
 
@@ -314,6 +359,10 @@ class UserRoleCopy(CreateAPIView, CustomerMixin):
         serializer.is_valid(raise_exception=True)
 
         role = get_object_or_404_with_message("Role does not exist.")(self.qs(Roles), pk=kwargs['role_id'])
+        if self.run_as_job():
+            return self.enqueue_job_response(RoleCopyJob.kind,
+                                             {'role_id': role.pk, 'name': serializer.validated_data['name']})
+
         role_copy_service = RoleCopyService(self.customer_domain)
         copied_role = role_copy_service.copy_role(self.user, role, serializer.validated_data)
 
@@ -0,0 +1,293 @@
+"""
+Search module keeps the trigram index used by ManageUISimpleSearchMixin instead of scanning
+the searched columns with a leading wildcard LIKE.
+
+Every indexed field value is stored lowercased as the set of its 3 character substrings
+(SearchTrigram rows). A `field__contains=term` match is only possible on the objects whose field
+holds every trigram of the term, so the search first selects those candidates from the index and
+the original LIKE predicates are then evaluated on the candidates only. The results are the same as
+without the index, the index only narrows the rows that are scanned.
+
+The index of a table is used once it has been built with the rebuild_search_index command
+(SearchIndex row), which also creates the SearchIndex and SearchTrigram tables in the customer database
+(see db.schema). Single saves and deletes keep a built index current through api.signals and the bulk
+serializers call index_bulk_created(), nothing is written for the tables whose index is not built.
+Any change the index can't follow calls invalidate(), which makes the searches fall back to LIKE until
+the index is built again.
+
+The lowercased trigrams assume a case insensitive, accent sensitive collation (SQL Server default).
+
+SearchResultCache keeps the primary keys matched by the recent search terms of a list for a few
+seconds, so the requests sent while a term is typed ("smi", "smit", "smith") are answered from the
+cache or only search the rows matched by the shorter term.
+"""
+
+import hashlib
+import json
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, Optional, Sequence, Set, Tuple
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Exists, Model, Q, QuerySet
+
+from api.counts import get_count_sql
+from db.cache import MISSING, TTLCache
+from db.customer.models import SearchIndex, SearchTrigram, User
+from db.schema import create_tables, has_tables
+from tools.query import iterate_queryset_chunks
+
+TRIGRAM_LENGTH = 3
+
+
+def get_trigrams(value) -> Set[str]:
+    value = '' if value is None else str(value).lower()
+    return {value[i:i + TRIGRAM_LENGTH] for i in range(len(value) - TRIGRAM_LENGTH + 1)}
+
+
+class TrigramSearchIndex:
+
+    def __init__(self, model, field_names, batch_size=None):
+        self.model = model
+        self.field_names = tuple(field_names)
+        # Every SearchTrigram row has 4 parameters
+        self.batch_size = batch_size or settings.SQL_SERVER_PARAMETER_LIMIT // 4
+
+    @property
+    def table_name(self) -> str:
+        return self.model._meta.db_table
+
+    def trigrams(self, using) -> QuerySet:
+        return SearchTrigram.objects.using(using).filter(table_name=self.table_name)
+
+    def is_provisioned(self, using) -> bool:
+        return has_tables(using, SearchIndex, SearchTrigram)
+
+    def is_built(self, using) -> bool:
+        return (self.is_provisioned(using)
+                and SearchIndex.objects.using(using).filter(table_name=self.table_name).exists())
+
+    def invalidate(self, using) -> None:
+        if self.is_provisioned(using):
+            SearchIndex.objects.using(using).filter(table_name=self.table_name).delete()
+
+    def index_objects(self, instances: Iterable[Model], using) -> None:
+        """
+        Keeps the trigrams of the instances current, nothing is written while the index is not built.
+        """
+        if not self.is_built(using):
+            return
+
+        instances = list(instances)
+        if any(instance.pk is None for instance in instances):
+            # bulk_create doesn't set the primary keys on every database backend
+            self.invalidate(using)
+            return
+
+        with transaction.atomic(using=using):
+            self._delete([instance.pk for instance in instances], using)
+            self._insert(instances, using)
+
+    def remove_objects(self, object_ids: Iterable[int], using) -> None:
+        if not self.is_built(using):
+            return
+
+        self._delete(object_ids, using)
+
+    def _delete(self, object_ids: Iterable[int], using) -> None:
+        object_ids = list(object_ids)
+        for start in range(0, len(object_ids), settings.SQL_SERVER_PARAMETER_LIMIT):
+            self.trigrams(using).filter(
+                object_id__in=object_ids[start:start + settings.SQL_SERVER_PARAMETER_LIMIT]).delete()
+
+    def rebuild(self, using, chunk_size=None) -> int:
+        """
+        Indexes every row of the table and marks the index as built, returns the number of indexed rows.
+        The tables of the index are created in the database first (see db.schema).
+        Users edited while the rebuild runs may be indexed with their previous values, run it when the
+        tenant is idle.
+        """
+        create_tables(using, SearchIndex, SearchTrigram)
+        self.invalidate(using)
+        self.trigrams(using).delete()
+
+        count = 0
+        queryset = self.model.objects.using(using).only(*self.field_names)
+        for chunk in iterate_queryset_chunks(queryset, chunk_size or settings.SQL_SERVER_PARAMETER_LIMIT):
+            self._insert(chunk, using)
+            count += len(chunk)
+
+        SearchIndex.objects.using(using).create(table_name=self.table_name)
+        return count
+
+    def get_search_clause(self, queryset: QuerySet, substring_search_fields, search_term, like_clause: Q) -> Q:
+        """
+        Restricts like_clause to the candidates of the index when the index is built.
+        like_clause is returned unchanged when a searched field is not indexed or the term is shorter than a trigram.
+        """
+        pk_lookup = self._get_pk_lookup(queryset.model, substring_search_fields)
+        trigrams = get_trigrams(search_term)
+        if pk_lookup is None or not trigrams or not self.is_provisioned(queryset.db):
+            return like_clause
+
+        field_names = [field.split('__')[-2] for field in substring_search_fields]
+        candidates = (
+            self.trigrams(queryset.db)
+                .filter(field_name__in=field_names, trigram__in=trigrams)
+                .order_by()
+                .values('field_name', 'object_id')
+                .annotate(trigram_count=Count('trigram', distinct=True))
+                .filter(trigram_count=len(trigrams))
+                .values('object_id')
+        )
+        built = SearchIndex.objects.using(queryset.db).filter(table_name=self.table_name)
+
+        return like_clause & (Q(**{pk_lookup: candidates}) | Q(~Exists(built)))
+
+    def _insert(self, instances, using):
+        rows = chain.from_iterable(self._get_rows(instance) for instance in instances)
+        SearchTrigram.objects.using(using).bulk_create(rows, batch_size=self.batch_size)
+
+    def _get_rows(self, instance):
+        for field_name in self.field_names:
+            for trigram in get_trigrams(getattr(instance, field_name)):
+                yield SearchTrigram(table_name=self.table_name, field_name=field_name, object_id=instance.pk,
+                                    trigram=trigram)
+
+    def _get_pk_lookup(self, model, substring_search_fields) -> Optional[str]:
+        """
+        Returns the pk__in lookup from the queryset model to the indexed model, i.e. 'pk__in' or 'user__pk__in'
+        for a UserRole queryset. The searched fields must all be indexed fields of the same relation.
+        """
+        paths = {tuple(field.split('__')[:-2]) for field in substring_search_fields}
+        if len(paths) != 1 or not substring_search_fields:
+            return None
+
+        path = paths.pop()
+        try:
+            for name in path:
+                model = model._meta.get_field(name).related_model
+        except (FieldDoesNotExist, AttributeError):
+            return None
+
+        if model is not self.model:
+            return None
+
+        if any(field.split('__')[-2] not in self.field_names for field in substring_search_fields):
+            return None
+
+        return '__'.join(path + ('pk', 'in'))
+
+
+user_search_index = TrigramSearchIndex(User, ('first_name', 'last_name', 'name', 'user_name', 'email', 'status'))
+
+search_indexes: Dict[type, TrigramSearchIndex] = {
+    User: user_search_index,
+}
+
+
+def is_id_term(search_term) -> bool:
+    try:
+        int(search_term)
+    except ValueError:
+        return False
+    return True
+
+
+class SearchResultCache:
+    """
+    Caches the primary keys matched by the search terms of a list, per (customer database, view,
+    list queryset, searched fields). Results over max_rows are not kept, the term is searched again.
+
+    The rows matching a term are a subset of the rows matching any of its substrings, so a term missing
+    from the cache is searched among the rows of a cached shorter term. The integer id fallback breaks
+    this for integer terms ("123" matches user 123, "12" may not), they are only refined from equal terms.
+    """
+
+    def __init__(self, max_size=None, ttl=None, max_rows=None):
+        self.cache = TTLCache(
+            max_size=max_size or settings.SEARCH_RESULT_CACHE_MAX_SIZE,
+            ttl=ttl or settings.SEARCH_RESULT_CACHE_TTL_SECONDS,
+        )
+        # The cached keys are sent back as pk__in parameters
+        self.max_rows = min(max_rows or settings.SEARCH_RESULT_CACHE_MAX_ROWS, settings.SQL_SERVER_PARAMETER_LIMIT)
+
+    def search(self, queryset: QuerySet, substring_search_fields, id_fields, search_terms: Sequence[str],
+               apply_search: Callable[[QuerySet, Sequence[str]], QuerySet], key=None) -> QuerySet:
+        """
+        Returns the queryset restricted to the rows matching every search term.
+        apply_search(queryset, search_terms) filters the queryset by the terms without the cache.
+        """
+        count_sql = get_count_sql(queryset)
+        if count_sql is None:
+            return apply_search(queryset, search_terms)
+
+        using, sql, params = count_sql
+        scope_hash = hashlib.sha1(json.dumps(
+            [sql, params, list(substring_search_fields), list(id_fields)], default=str).encode()).hexdigest()
+        scope = (using, key, scope_hash)
+        search_terms = tuple(search_terms)
+
+        pks = self.cache.get(scope + (search_terms,), MISSING)
+        if pks is MISSING:
+            searched = queryset
+            for shorter_terms in self._get_shorter_terms(search_terms):
+                shorter_pks = self.cache.get(scope + (shorter_terms,))
+                if shorter_pks is not None and self.refines(search_terms, shorter_terms, id_fields):
+                    searched = queryset.filter(pk__in=shorter_pks)
+                    break
+
+            pks = tuple(apply_search(searched, search_terms).order_by().values_list('pk', flat=True)[:self.max_rows + 1])
+            pks = pks if len(pks) <= self.max_rows else None
+            self.cache.set(scope + (search_terms,), pks)
+
+        if pks is None:
+            return apply_search(queryset, search_terms)
+
+        return queryset.filter(pk__in=pks)
+
+    @staticmethod
+    def refines(search_terms, shorter_terms, id_fields) -> bool:
+        """
+        True when the rows matching search_terms are a subset of the rows matching shorter_terms.
+        """
+        return all(
+            any(term == shorter_term or (shorter_term in term and not (id_fields and is_id_term(term)))
+                for term in search_terms)
+            for shorter_term in shorter_terms
+        )
+
+    @staticmethod
+    def _get_shorter_terms(search_terms) -> Iterator[Tuple[str, ...]]:
+        # The terms are typed one character at a time, the last term is the one being typed
+        *previous_terms, last_term = search_terms
+        for length in range(len(last_term) - 1, 0, -1):
+            yield tuple(previous_terms) + (last_term[:length],)
+        if previous_terms:
+            yield tuple(previous_terms)
+
+    def invalidate(self, using) -> None:
+        self.cache.delete_matching(lambda key: key[0] == using)
+
+
+# Search results of the user lists, invalidated when the users or their roles change
+user_search_results = SearchResultCache()
+
+
+def invalidate_search_results(using) -> None:
+    """
+    Inside a transaction the cache is cleared once the transaction is committed.
+    """
+    transaction.on_commit(lambda: user_search_results.invalidate(using), using=using)
+
+
+def index_bulk_created(model, instances) -> None:
+    """
+    Indexes the instances returned by bulk_create, which doesn't send post_save.
+    """
+    search_index = search_indexes.get(model)
+    if search_index and instances:
+        using = instances[0]._state.db
+        search_index.index_objects(instances, using)
+        invalidate_search_results(using)
@@ -11,8 +11,10 @@ from rest_framework.utils import model_meta
 
 import tools
 from api.decorators import stored_method
+from api.search import index_bulk_created
 from api.utils import get_utc_now
 from db import get_customer_domain_from_request, get_user_info_from_request
+from db.tenants import tenant_connections
 
 
 # Validate that an instance update is not a noop
@@ -97,7 +99,7 @@ class UserMixin:
     @stored_method
     def get_user(self):
         username, domain = get_user_info_from_request(self.context['request'])
-        return models.User.objects.using(domain).get(user_name=username)
+        return models.User.objects.using(tenant_connections.ensure(domain)).get(user_name=username)
 
     def get_user_pk(self):
         return self.get_user().pk
@@ -123,6 +125,40 @@ class AutoUserMixin(UserMixin, AutoUpdateMixinBase):
         return auto_fields
 
 
+class SparseFieldsMixin:
+    """
+    Trims the fields serialized for GET requests with the fields and exclude query parameters:
+
+        /api/users/?fields=user_id,first_name,last_name,email,status
+        /api/users/1/?exclude=bio,profile_picture
+
+    Unknown field names are ignored. Use api.mixins.SparseFieldsQuerysetMixin on the view
+    to load only the columns of the remaining fields.
+    """
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return fields
+
+        query_params = getattr(request, 'query_params', request.GET)
+        only = self._parse_field_names(query_params.get(self.fields_query_param))
+        exclude = self._parse_field_names(query_params.get(self.exclude_query_param))
+
+        for field_name in list(fields):
+            if (only and field_name not in only) or field_name in exclude:
+                del fields[field_name]
+
+        return fields
+
+    @staticmethod
+    def _parse_field_names(value):
+        return {field_name.strip() for field_name in (value or '').split(',') if field_name.strip()}
+
+
 class ModelManagerSerializer(serializers.ModelSerializer):
 
     """
@@ -136,7 +172,8 @@ class ModelManagerSerializer(serializers.ModelSerializer):
         if hasattr(self.Meta, 'model_manager'):
             return self.Meta.model_manager
 
-        return self.Meta.model.objects.using(get_customer_domain_from_request(self.context['request'])).all()
+        customer_domain = get_customer_domain_from_request(self.context['request'])
+        return self.Meta.model.objects.using(tenant_connections.ensure(customer_domain)).all()
 
     def create(self, validated_data):
         serializers.raise_errors_on_nested_writes('create', self, validated_data)
@@ -244,7 +281,7 @@ class ParentObjectRetrievalMixin:
     def get_parent_object(self, key, model):
         parent_id = self.context['view'].kwargs[key]
         customer_domain = get_customer_domain_from_request(self.context['request'])
-        return model.objects.using(customer_domain).get(pk=parent_id)
+        return model.objects.using(tenant_connections.ensure(customer_domain)).get(pk=parent_id)
 
 
 SpreadsheetFile = Union[django_excel.ExcelInMemoryUploadedFile, django_excel.TemporaryUploadedExcelFile]
@@ -309,8 +346,10 @@ class SpreadsheetSerializer(serializers.ListSerializer):
         except AttributeError:
             return super().create(validated_data)
 
-        return model_klass.objects.bulk_create([model_klass(**item) for item in validated_data],
-                                               batch_size=self.bulk_create_batch_size)
+        instances = model_klass.objects.bulk_create([model_klass(**item) for item in validated_data],
+                                                    batch_size=self.bulk_create_batch_size)
+        index_bulk_created(model_klass, instances)
+        return instances
 
     def iget_records(self, spreadsheet: SpreadsheetFile, **kwargs) -> Iterator[OrderedDict]:
         """Returns an iterator for the rows of a spreadsheet.
@@ -376,8 +415,10 @@ class BulkListSerializer(serializers.ListSerializer):
         except AttributeError:
             return super().create(validated_data)
 
-        return model_class.objects.bulk_create([model_class(**item) for item in validated_data],
-                                               batch_size=self.bulk_create_batch_size)
+        instances = model_class.objects.bulk_create([model_class(**item) for item in validated_data],
+                                                    batch_size=self.bulk_create_batch_size)
+        index_bulk_created(model_class, instances)
+        return instances
 
 
 class UserManageUICreateSerializer(serializers.ModelSerializer):
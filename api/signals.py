@@ -0,0 +1,101 @@
+"""
+Signals module keeps the receivers that invalidate the in-process caches, keep the built search
+index current and record the change feeds when the models are changed one instance at a time.
+
+Bulk operations (bulk_create, QuerySet.update, QuerySet.delete) do not send these signals,
+the views that use them invalidate the caches explicitly. The query cache and the change feeds
+are the exception, the querysets of the SchemaModels take care of them (see db.query_cache).
+"""
+
+from django.contrib.auth.models import User as UserAuth
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.search import invalidate_search_results, user_search_index
+from db.auth.backends import missing_local_users, tenant_users
+from db.auth.cache import token_cache
+from db.change_feed import record_object_changes
+from db.customer.models import Message, RoleAttribute, Roles, User, UserAttribute, UserRole
+from db.database.model_base import SchemaModel
+from db.query_cache import invalidate_tables
+from tools.security.authorization import invalidate_admin_users, invalidate_security_settings
+
+
+@receiver(post_save, sender=UserAttribute)
+@receiver(post_delete, sender=UserAttribute)
+def user_attribute_changed(sender, instance, using, **kwargs):
+    invalidate_security_settings(using, instance.user_id)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def user_role_changed(sender, instance, using, **kwargs):
+    invalidate_security_settings(using, instance.user_id)
+    invalidate_admin_users(using)
+    invalidate_search_results(using)
+
+
+@receiver(post_save, sender=Roles)
+@receiver(post_delete, sender=Roles)
+def role_changed(sender, instance, using, **kwargs):
+    invalidate_admin_users(using)
+
+
+@receiver(post_save, sender=RoleAttribute)
+@receiver(post_delete, sender=RoleAttribute)
+def role_attribute_changed(sender, instance, using, **kwargs):
+    invalidate_security_settings(using)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) & set(user_search_index.field_names):
+        user_search_index.index_objects([instance], using)
+    invalidate_search_results(using)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, using, **kwargs):
+    user_search_index.remove_objects([instance.pk], using)
+    invalidate_search_results(using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def schema_model_changed(sender, using, **kwargs):
+    # Model.save() and Model.delete() do not go through the queryset of the model.
+    # Not only the cached models, the cached counts of the lists may read any table (see api.counts)
+    if issubclass(sender, SchemaModel):
+        invalidate_tables(using, sender)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Roles)
+@receiver(post_save, sender=Message)
+def tracked_model_saved(sender, instance, using, **kwargs):
+    record_object_changes(sender, using, [instance.pk], deleted=False)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Roles)
+@receiver(post_delete, sender=Message)
+def tracked_model_deleted(sender, instance, using, **kwargs):
+    record_object_changes(sender, using, [instance.pk], deleted=True)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=UserAuth)
+def user_auth_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        missing_local_users.delete(instance.get_username())
+    # A changed local password may not be the tenant passphrase anymore, the local stage is tried first again
+    if update_fields is None or 'password' in update_fields:
+        tenant_users.delete(instance.get_username())
+    # The logins only update last_login, the other changes (is_active among them) drop the cached tokens
+    if not created and (update_fields is None or set(update_fields) - {'last_login'}):
+        token_cache.invalidate_user(instance.pk)
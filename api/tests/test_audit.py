@@ -0,0 +1,44 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from api.audit import attributes_log, audit_log, is_enabled, user_history_log
+from api.tests.utils import TENANT, create_role, create_user
+from db.customer.models import RoleAuditLog, User
+from db.schema import tenant_tables
+
+
+class RoleAuditLogTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin')
+        cls.role = create_role('Reviewers')
+        for user_name in ('jdoe', 'asmith'):
+            create_user(user_name)
+
+    def setUp(self):
+        tenant_tables.clear()
+        self.addCleanup(tenant_tables.clear)
+
+    def test_users_of_a_queryset_are_copied_in_one_statement(self):
+        users = User.objects.exclude(pk=self.admin.pk)
+        self.assertTrue(is_enabled(TENANT))
+
+        with mock.patch.object(audit_log, 'add') as add, self.assertNumQueries(1):
+            user_history_log(self.admin, TENANT, self.role, users, True)
+        add.assert_not_called()
+
+        self.assertEqual(
+            sorted(RoleAuditLog.objects.values_list('kind', 'role_id', 'user_id', 'value', 'changed_by_id')),
+            sorted((RoleAuditLog.KIND_USER, self.role.pk, pk, True, self.admin.pk) for pk in users.values_list('pk', flat=True)))
+
+    def test_customer_without_the_table_is_not_logged(self):
+        tenant_tables.set((TENANT, RoleAuditLog._meta.db_table), False)
+
+        with mock.patch.object(audit_log, 'add') as add:
+            user_history_log(self.admin, TENANT, self.role, User.objects.all(), True)
+            user_history_log(self.admin, TENANT, self.role, [self.admin], False)
+            attributes_log(self.admin, TENANT, self.role, ['security.admin'], True)
+        add.assert_not_called()
+        self.assertFalse(RoleAuditLog.objects.exists())
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User as UserAuth
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import ExpiringTokenAuthentication
+from api.utils import get_utc_now
+from db.auth.cache import token_cache
+
+
+@override_settings(AUTH_TOKEN_TTL_SECONDS=3600)
+class ExpiringTokenAuthenticationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@acme.com')
+
+    def setUp(self):
+        caches['default'].clear()
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.auth_user)
+
+    def authenticate(self):
+        return ExpiringTokenAuthentication().authenticate_credentials(self.token.key)
+
+    def set_created(self, seconds_ago):
+        Token.objects.filter(key=self.token.key).update(created=get_utc_now() - timedelta(seconds=seconds_ago))
+
+    def test_token_is_cached(self):
+        user, token = self.authenticate()
+        self.assertEqual((user.pk, token.key), (self.auth_user.pk, self.token.key))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate()[0].pk, self.auth_user.pk)
+
+    def test_expired_token_is_deleted(self):
+        self.set_created(seconds_ago=7200)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'Expired token'):
+            self.authenticate()
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    def test_expired_cached_token_is_read_again(self):
+        # Another worker renews the token after this one cached it
+        self.set_created(seconds_ago=7200)
+        token_cache.get(self.token.key)
+        self.set_created(seconds_ago=0)
+
+        self.assertEqual(self.authenticate()[0].pk, self.auth_user.pk)
+        self.assertTrue(Token.objects.filter(key=self.token.key).exists())
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_deleted_token_is_invalid_once_its_entry_expires(self):
+        self.set_created(seconds_ago=7200)
+        token_cache.get(self.token.key)
+        Token.objects.filter(key=self.token.key).delete()
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'Invalid token'):
+            self.authenticate()
+
+    def test_deactivation_reaches_the_entries_of_another_worker(self):
+        self.authenticate()
+        # The change is made by another worker, its local entry is dropped but not the entry of this worker
+        entry = token_cache._cache.get(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auth_user.is_active = False
+            self.auth_user.save()
+        token_cache._cache.set(self.token.key, entry)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'User inactive or deleted'):
+            self.authenticate()
+
+    def test_logout_reaches_the_entries_of_another_worker(self):
+        self.authenticate()
+        entry = token_cache._cache.get(self.token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        token_cache._cache.set(self.token.key, entry)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'Invalid token'):
+            self.authenticate()
+
+    def test_inactive_user_is_rejected(self):
+        UserAuth.objects.filter(pk=self.auth_user.pk).update(is_active=False)
+
+        with self.assertRaisesMessage(AuthenticationFailed, 'User inactive or deleted'):
+            self.authenticate()
@@ -0,0 +1,145 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User as UserAuth
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.messages.views import MessageChanges
+from api.tests.utils import TENANT, create_user
+from api.utils import get_utc_now
+from db.change_feed import insert_entries, prune_change_feed
+from db.customer.models import ChangeFeedEntry, ChangeFeedWatermark, Message
+from db.schema import tenant_tables
+
+
+class ChangeFeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@%s' % TENANT)
+        cls.user = create_user('jdoe')
+        cls.other_user = create_user('asmith')
+
+    def setUp(self):
+        tenant_tables.clear()
+
+    def create_message(self, text, **kwargs):
+        return Message.objects.create(**dict({'message_text': text, 'recipient': self.other_user,
+                                              'created_by_id': self.user.pk}, **kwargs))
+
+    def get_changes(self, **params):
+        request = APIRequestFactory().get('/api/messages/changes/', params)
+        force_authenticate(request, user=self.auth_user)
+        return MessageChanges.as_view()(request)
+
+    def test_last_change_of_every_row_and_tombstones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            kept = self.create_message('Hello')
+            deleted = self.create_message('Hi')
+            deleted_pk = deleted.pk
+            hidden = self.create_message('Hey')
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.filter(pk=kept.pk).update(message_text='Hello again')
+            Message.objects.filter(pk=hidden.pk).update(created_by_id=self.other_user.pk)
+            deleted.delete()
+
+        response = self.get_changes()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([(change['id'], change['action']) for change in response.data['results']],
+                         [(kept.pk, 'upsert'), (hidden.pk, 'delete'), (deleted_pk, 'delete')])
+        self.assertEqual(response.data['results'][0]['data']['message_text'], 'Hello again')
+        self.assertIsNone(response.data['results'][2]['data'])
+
+    def test_cursor_serves_the_later_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message('Hello')
+        cursor = self.get_changes().data['cursor']
+
+        empty = self.get_changes(cursor=cursor)
+        self.assertEqual((empty.data['cursor'], empty.data['results']), (cursor, []))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message = self.create_message('Hi')
+        response = self.get_changes(cursor=cursor)
+        self.assertEqual([change['id'] for change in response.data['results']], [message.pk])
+        self.assertGreater(int(response.data['cursor']), int(cursor))
+
+    def test_limit_pages_the_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            messages = [self.create_message(text) for text in ('Hello', 'Hi', 'Hey')]
+
+        first = self.get_changes(limit=2)
+        self.assertTrue(first.data['has_more'])
+        last = self.get_changes(cursor=first.data['cursor'], limit=2)
+        self.assertFalse(last.data['has_more'])
+        self.assertEqual([change['id'] for change in first.data['results'] + last.data['results']],
+                         [message.pk for message in messages])
+
+    def test_changes_are_recorded_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.create_message('Hello')
+
+        self.assertFalse(ChangeFeedEntry.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(ChangeFeedEntry.objects.count(), 1)
+
+    def test_inserts_lock_the_watermark_of_the_table(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message('Hello')
+
+        watermark = ChangeFeedWatermark.objects.get(table_name=Message._meta.db_table)
+        self.assertEqual((watermark.change_id, watermark.changed_date), (0, None))
+        # Nothing is pruned yet, every date is retained
+        response = self.get_changes(updated_since=(get_utc_now() - timedelta(days=1)).isoformat())
+        self.assertEqual((response.status_code, response.data['count']), (200, 1))
+
+    @override_settings(SQL_SERVER_PARAMETER_LIMIT=8)
+    def test_every_batch_is_stamped_when_inserted(self):
+        messages = [self.create_message(text) for text in ('Hello', 'Hi', 'Hey')]
+        dates = iter([get_utc_now() - timedelta(minutes=1), get_utc_now()])
+        with mock.patch('db.change_feed.get_utc_now', lambda: next(dates)):
+            insert_entries(Message, TENANT, [message.pk for message in messages], deleted=False)
+
+        entries = ChangeFeedEntry.objects.order_by('change_id').values_list('changed_date', flat=True)
+        self.assertEqual(len(set(entries[:2])), 1)
+        self.assertLess(entries[1], entries[2])
+
+    def test_pruned_cursor_is_gone(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message('Hello')
+        old_cursor = self.get_changes(cursor=0).data['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message('Hi')
+        cursor = self.get_changes(cursor=old_cursor).data['cursor']
+
+        self.assertEqual(prune_change_feed(TENANT, retention_days=-1), 2)
+        self.assertFalse(ChangeFeedEntry.objects.exists())
+        self.assertEqual(ChangeFeedWatermark.objects.get(table_name=Message._meta.db_table).change_id, int(cursor))
+
+        self.assertEqual(self.get_changes(cursor=old_cursor).status_code, 410)
+        self.assertEqual(self.get_changes(cursor=0).status_code, 410)
+        current = self.get_changes(cursor=cursor)
+        self.assertEqual((current.status_code, current.data['results']), (200, []))
+        self.assertEqual(self.get_changes().data['cursor'], cursor)
+
+    def test_updated_since_before_the_pruned_changes_is_gone(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message('Hello')
+        prune_change_feed(TENANT, retention_days=-1)
+
+        self.assertEqual(self.get_changes(updated_since=(get_utc_now() - timedelta(days=1)).isoformat()).status_code,
+                         410)
+        self.assertEqual(self.get_changes(updated_since=(get_utc_now() + timedelta(days=1)).isoformat()).status_code,
+                         200)
+
+    def test_feed_is_off_without_its_tables(self):
+        tenant_tables.set((TENANT, ChangeFeedEntry._meta.db_table), False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_message('Hello')
+
+        self.assertEqual(self.get_changes().status_code, 404)
+        tenant_tables.clear()
+        self.assertFalse(ChangeFeedEntry.objects.exists())
@@ -0,0 +1,128 @@
+from unittest import mock
+
+from django.contrib.auth.models import User as UserAuth
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.compiled_serializers import CompiledListSerializer
+from api.roles.serializers import UsersAttachedToRoleListSerializer, UsersNotAttachedToRoleList
+from api.tests.utils import TENANT, create_role, create_user, get_customer
+from api.users.serializers import UsersListSerializer
+from api.users.views import UsersList
+from db.customer.models import User, UserAttribute, UserRole
+from tools.security.authorization import security_settings_cache
+
+
+class AuthorizedUsersList(UsersList):
+    # The controller rows of the tests are never saved
+    _customer = get_customer()
+
+
+class CompiledListSerializerParityTest(TestCase):
+    """
+    The compiled rows must be the ones DRF serializes from the instances of the same queryset.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = create_role('Reviewers')
+        cls.users = [
+            create_user('jdoe', first_name='John', last_name='Doe', customer_id=1, admin=1,
+                        cookie_consent=True, cookie_consent_date=timezone.now()),
+            create_user('asmith', status=User.STATUS_INACTIVE, profile_picture=None, primary_contact=None),
+            create_user('émilie', first_name='Émilie', status=7),
+        ]
+        for user in cls.users[:2]:
+            UserRole.objects.create(user=user, role=cls.role)
+        # A user role without a user, the fields read through the relation are skipped
+        UserRole.objects.create(role=cls.role)
+
+    def serialize(self, serializer_class, queryset, **params):
+        request = Request(APIRequestFactory().get('/api/users/', params))
+        compiled = serializer_class(queryset, many=True, context={'request': request})
+        self.assertIsInstance(compiled, CompiledListSerializer)
+        self.assertIsNotNone(compiled.get_compiled_fields(queryset))
+
+        # A list of instances is serialized by DRF
+        drf = serializer_class(list(queryset), many=True, context={'request': request})
+        return compiled.data, drf.data
+
+    def assertParity(self, serializer_class, queryset, **params):
+        compiled, drf = self.serialize(serializer_class, queryset, **params)
+        # The rows are OrderedDicts, their fields are compared in order along with the values and their types.
+        # DRF returns the URLs as Hyperlink, a str rendered as any other
+        self.assertEqual(compiled, drf)
+        self.assertEqual(self.get_types(compiled), self.get_types(drf))
+        return compiled
+
+    @staticmethod
+    def get_types(rows):
+        return [[str if isinstance(value, str) else type(value) for value in row.values()] for row in rows]
+
+    def test_users_list(self):
+        rows = self.assertParity(UsersListSerializer, User.objects.order_by('pk'))
+        self.assertEqual([row['status'] for row in rows], ['Active', 'Inactive', 7])
+
+    def test_users_list_sparse_fields(self):
+        rows = self.assertParity(UsersListSerializer, User.objects.order_by('pk'), fields='url,user_name,status')
+        self.assertEqual(set(rows[0]), {'url', 'user_name', 'status'})
+
+    def test_users_attached_to_role(self):
+        rows = self.assertParity(UsersAttachedToRoleListSerializer,
+                                 UserRole.objects.filter(role=self.role).order_by('pk'))
+        self.assertEqual([row.get('user_name') for row in rows], ['jdoe', 'asmith', None])
+        self.assertNotIn('first_name', rows[2])
+
+    def test_users_not_attached_to_role(self):
+        self.assertParity(UsersNotAttachedToRoleList, User.objects.exclude(userrole__role=self.role).order_by('pk'))
+
+    def test_empty_list(self):
+        self.assertEqual(self.assertParity(UsersListSerializer, User.objects.none()), [])
+
+
+class CompiledListViewTest(TestCase):
+    """
+    The lists serialized from their whole queryset use the compiled rows, the pages are lists of instances.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@%s' % TENANT)
+        # The inactive users are not listed
+        cls.users = [create_user('jdoe', first_name='John'), create_user('asmith', status=7),
+                     create_user('bkent', status=User.STATUS_INACTIVE)]
+        UserAttribute.objects.create(user=cls.users[0], name='security.crmadmin', value='True')
+
+    def setUp(self):
+        security_settings_cache.clear()
+
+    def get_users(self, **kwargs):
+        request = APIRequestFactory().get('/api/users/', **kwargs)
+        force_authenticate(request, user=self.auth_user)
+        with mock.patch.object(CompiledListSerializer, '_represent', autospec=True,
+                               side_effect=CompiledListSerializer._represent) as represent:
+            response = AuthorizedUsersList.as_view()(request)
+            # The CSV rows are serialized while the response is streamed
+            content = b''.join(response.streaming_content) if response.streaming else None
+        self.assertEqual(response.status_code, 200)
+        return response, content, represent.called
+
+    def test_unpaginated_list_is_compiled(self):
+        response, _, compiled = self.get_users(data={'page_size': '∞', 'ordering': 'user_id'})
+        self.assertTrue(compiled)
+        self.assertEqual([(user['user_name'], user['status']) for user in response.data['results']],
+                         [('jdoe', 'Active'), ('asmith', 7)])
+
+    def test_csv_export_is_compiled(self):
+        _, content, compiled = self.get_users(data={'ordering': 'user_id'}, HTTP_ACCEPT='text/csv')
+        self.assertTrue(compiled)
+        rows = content.decode().splitlines()
+        self.assertEqual(len(rows), 3)
+        self.assertIn('asmith', rows[2])
+
+    def test_page_is_serialized_by_drf(self):
+        response, _, compiled = self.get_users(data={'page_size': 1, 'ordering': 'user_id'})
+        self.assertFalse(compiled)
+        self.assertEqual([user['user_name'] for user in response.data['results']], ['jdoe'])
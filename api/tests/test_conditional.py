@@ -0,0 +1,80 @@
+from django.contrib.auth.models import User as UserAuth
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.messages.views import MessageList
+from api.roles.views import RolesDetailView
+from api.tests.utils import TENANT, create_role, create_user
+from api.users.views import UsersDetail
+from db.customer.models import Message
+
+
+class RolesDetailConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@%s' % TENANT)
+        cls.user = create_user('jdoe')
+        cls.role = create_role('Reviewers', created_by=cls.user, updated_by=cls.user)
+
+    def get_role(self, **headers):
+        request = APIRequestFactory().get('/api/roles/%s/' % self.role.pk, **headers)
+        force_authenticate(request, user=self.auth_user)
+        return RolesDetailView.as_view()(request, role_id=self.role.pk)
+
+    def test_renamed_creator_is_served(self):
+        response = self.get_role()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+        self.user.name = 'John Doe'
+        self.user.save()
+        response = self.get_role(HTTP_IF_MODIFIED_SINCE=response.get('Last-Modified', ''))
+        self.assertEqual((response.status_code, response.data['created_by_name']), (200, 'John Doe'))
+
+
+class UsersDetailConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@%s' % TENANT)
+        cls.user = create_user('jdoe')
+
+    def test_requester_dependent_detail_has_no_validators(self):
+        request = APIRequestFactory().get('/api/users/%s/' % self.user.pk)
+        force_authenticate(request, user=self.auth_user)
+        response = UsersDetail.as_view()(request, pk=self.user.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+
+class ListConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@%s' % TENANT)
+        cls.user = create_user('jdoe')
+        Message.objects.create(message_text='Hello', recipient=cls.user, created_by_id=cls.user.pk)
+
+    def get_messages(self, **headers):
+        request = APIRequestFactory().get('/api/messages/', **headers)
+        force_authenticate(request, user=self.auth_user)
+        with CaptureQueriesContext(connection) as queries:
+            response = MessageList.as_view()(request)
+        aggregates = [i for i, query in enumerate(queries.captured_queries) if 'MAX(' in query['sql']]
+        return response, aggregates, len(queries.captured_queries)
+
+    def test_validators_follow_an_unconditional_list(self):
+        response, aggregates, count = self.get_messages()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertEqual(aggregates, [count - 1])
+
+    def test_conditional_list_is_not_modified(self):
+        etag = self.get_messages()[0]['ETag']
+        response, aggregates, count = self.get_messages(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response['ETag']), (304, etag))
+        self.assertEqual(aggregates, [count - 1])
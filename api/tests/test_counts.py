@@ -0,0 +1,42 @@
+from django.core.cache import caches
+from django.test import TestCase
+
+from api.counts import CachedCount
+from api.tests.utils import create_user
+from db.customer.models import Message
+
+
+class CachedCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('jdoe')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.strategy = CachedCount(max_size=10, ttl=60)
+
+    def count(self):
+        return self.strategy.count(Message.objects.filter(recipient=self.user), 'MessageList')
+
+    def create_message(self):
+        return Message.objects.create(message_text='Hello', recipient=self.user)
+
+    def test_count_is_cached_until_its_table_is_written(self):
+        self.assertEqual(self.count().value, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count(), (0, True))
+
+        message = self.create_message()
+        self.assertEqual(self.count().value, 1)
+
+        Message.objects.filter(pk=message.pk).delete()
+        self.assertEqual(self.count().value, 0)
+
+    def test_write_of_another_table_keeps_the_count(self):
+        self.create_message()
+        self.count()
+
+        create_user('asmith')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count().value, 1)
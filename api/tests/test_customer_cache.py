@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase
+
+from api.tests.utils import get_customer
+from db.controller.cache import CustomerCache
+
+
+class CustomerCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = CustomerCache(max_size=10, ttl=60)
+        self.customer = self.cache._add(get_customer(domain_name='acme.com'))
+
+    def test_entries_are_shared_by_pk_and_domain(self):
+        self.assertIs(self.cache.get(self.customer.pk), self.customer)
+        self.assertIs(self.cache.get('acme.com'), self.customer)
+        self.assertEqual(self.cache.stats['hits'], 2)
+
+    def test_invalidate_drops_both_keys_without_counting(self):
+        self.cache.invalidate(domain_name='acme.com')
+        self.cache.invalidate(pk=self.customer.pk)
+
+        self.assertEqual(len(self.cache._cache), 0)
+        self.assertEqual((self.cache.stats['hits'], self.cache.stats['misses']), (0, 0))
@@ -0,0 +1,89 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase
+
+from api.tests.utils import TENANT, create_role, create_user
+from db.cache import TTLCache
+from db.customer.models import Roles, User, UserRole
+from db.invalidation import SharedVersions
+from db.query_cache import QueryResultCache
+from tools.security.authorization import AdminUsersProvider, admin_users_cache, invalidate_admin_users
+
+
+class SharedVersionsTest(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.versions = SharedVersions('test')
+        self.cache = TTLCache(max_size=10, ttl=60)
+        self.calls = 0
+
+    def get_value(self):
+        self.calls += 1
+        return self.calls
+
+    def test_entry_is_cached_until_its_scope_is_bumped(self):
+        self.assertEqual(self.versions.get_or_set(self.cache, 'key', [('acme',)], self.get_value), 1)
+        self.assertEqual(self.versions.get_or_set(self.cache, 'key', [('acme',)], self.get_value), 1)
+
+        self.versions.bump(('globex',))
+        self.assertEqual(self.versions.get_or_set(self.cache, 'key', [('acme',)], self.get_value), 1)
+
+        # Another worker bumps the version, this worker still holds the entry
+        self.versions.bump(('acme',))
+        self.assertEqual(self.versions.get_or_set(self.cache, 'key', [('acme',)], self.get_value), 2)
+
+    def test_lost_version_starts_again_elsewhere(self):
+        self.versions.get_or_set(self.cache, 'key', [('acme',)], self.get_value)
+        caches['default'].clear()
+
+        self.assertEqual(self.versions.get_or_set(self.cache, 'key', [('acme',)], self.get_value), 2)
+
+
+class AdminUsersInvalidationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role = create_role(Roles.ADMIN_ROLE)
+        cls.user = create_user('jdoe')
+
+    def setUp(self):
+        caches['default'].clear()
+        admin_users_cache.clear()
+        self.provider = AdminUsersProvider(TENANT)
+
+    def test_admin_users_of_another_worker_are_invalidated(self):
+        self.assertEqual(self.provider.get_admin_user_ids(), frozenset())
+        UserRole.objects.create(user=self.user, role=self.admin_role)
+
+        # The change is made by another worker, its local entry is dropped but not the entry of this worker
+        entry = admin_users_cache.get(TENANT)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_admin_users(TENANT)
+        admin_users_cache.set(TENANT, entry)
+
+        self.assertEqual(self.provider.get_admin_user_ids(), frozenset([self.user.pk]))
+
+
+class QueryCacheInvalidationTest(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.query_cache = QueryResultCache(max_size=10, ttl=60, max_rows=10)
+
+    def count_users(self):
+        queryset = User.objects.all()
+        return self.query_cache.get_or_fetch(queryset, 'count', queryset.count)
+
+    def test_write_of_another_worker_invalidates_the_entries(self):
+        self.assertEqual(self.count_users(), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.count_users(), 0)
+
+        # The write bumps the versions through the cache of the module, which shares them but not its entries
+        create_user('jdoe')
+        self.assertEqual(self.count_users(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            QueryResultCache().invalidate(TENANT, User._meta.db_table)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.count_users(), 1)
@@ -0,0 +1,114 @@
+import base64
+from hashlib import sha256
+from unittest import mock
+
+from Crypto.Cipher import AES
+from django.conf import settings
+from django.contrib.auth.models import User as UserAuth
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.tests.utils import TENANT, create_user
+from db.auth.backends import (
+    Frodo,
+    UnacceptablePassphrase,
+    customer_eligibility_cache,
+    decrypt_password,
+    missing_local_users,
+    tenant_users,
+)
+
+USERNAME = 'jdoe@%s' % TENANT
+PASSPHRASE = 'tenant-secret'
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginStagesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_user('jdoe', hashed_key=sha256(PASSPHRASE.encode()).digest())
+
+    def setUp(self):
+        customer_eligibility_cache.set(TENANT, True)
+        customer_eligibility_cache.set('unknown.com', False)
+        self.addCleanup(customer_eligibility_cache.clear)
+        tenant_users.clear()
+        missing_local_users.clear()
+
+    def login(self, password, username=USERNAME):
+        return Frodo().authenticate(None, username=username, password=password)
+
+    def assertStages(self, password, expected_stages, username=USERNAME):
+        stages = []
+        timed = Frodo._timed
+
+        def record(backend, stage):
+            stages.append(stage)
+            return timed(backend, stage)
+
+        with mock.patch.object(Frodo, '_timed', autospec=True, side_effect=record):
+            user = self.login(password, username)
+        self.assertEqual(tuple(stage for stage in stages if stage in ('local_password', 'tenant_user')),
+                         expected_stages)
+        return user
+
+    def test_tenant_user_skips_the_local_password(self):
+        user = self.assertStages(PASSPHRASE, ('local_password', 'tenant_user'))
+        self.assertEqual(user.username, USERNAME)
+        self.assertTrue(user.check_password(PASSPHRASE))
+        self.assertTrue(tenant_users.get(USERNAME))
+
+        self.assertEqual(self.assertStages(PASSPHRASE, ('tenant_user',)).pk, user.pk)
+
+    def test_local_user_is_checked_first(self):
+        UserAuth.objects.create_user(USERNAME, password=PASSPHRASE)
+
+        self.assertIsNotNone(self.assertStages(PASSPHRASE, ('local_password',)))
+        self.assertIsNone(tenant_users.get(USERNAME))
+
+    def test_tenant_user_is_only_known_once_its_passphrase_is_accepted(self):
+        self.assertIsNone(self.login('wrong'))
+
+        self.assertIsNone(tenant_users.get(USERNAME))
+
+    def test_changed_local_password_is_still_accepted(self):
+        user = self.login(PASSPHRASE)
+        user.set_password('local-secret')
+        user.save()
+        self.assertIsNone(tenant_users.get(USERNAME))
+
+        # Another worker still knows the username as a tenant user
+        tenant_users.set(USERNAME, True)
+        self.assertEqual(self.assertStages('local-secret', ('tenant_user', 'local_password')).pk, user.pk)
+
+    def test_rejections_run_one_password_hash(self):
+        self.login(PASSPHRASE)
+
+        for username in (USERNAME, 'nobody@%s' % TENANT, 'nobody@unknown.com'):
+            for _ in range(2):
+                with self.subTest(username=username), \
+                        mock.patch.object(UserAuth, 'set_password', autospec=True) as set_password, \
+                        mock.patch.object(UserAuth, 'check_password', autospec=True,
+                                          return_value=False) as check_password:
+                    self.assertIsNone(self.login('wrong', username))
+                    self.assertEqual(set_password.call_count + check_password.call_count, 1)
+
+
+@override_settings(AES_PASSCODE=b'0123456789abcdef', AES_IV=b'fedcba9876543210')
+class DecryptPasswordTest(SimpleTestCase):
+
+    @staticmethod
+    def encrypt(password):
+        data = password.encode()
+        data += b'\x00' * (-len(data) % AES.block_size)
+        cipher = AES.new(settings.AES_PASSCODE, AES.MODE_CBC, settings.AES_IV)
+        return base64.standard_b64encode(cipher.encrypt(data)).decode()
+
+    def test_every_password_is_decrypted_from_the_iv(self):
+        for password in ('tenant-secret', 'a tenant secret of several blocks', 'tenant-secret'):
+            with self.subTest(password=password):
+                self.assertEqual(decrypt_password(self.encrypt(password)), password)
+
+    def test_unpadded_password_is_unacceptable(self):
+        with self.assertRaises(UnacceptablePassphrase):
+            decrypt_password(base64.standard_b64encode(b'secret').decode())
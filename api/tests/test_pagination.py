@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User as UserAuth
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.messages.views import MessageList
+from api.tests.utils import TENANT, create_user
+from db.customer.models import Message
+
+
+class OrderedMessageList(MessageList):
+    ordering_fields = ('message_text', 'updated_by_id')
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.auth_user = UserAuth.objects.create(username='jdoe@%s' % TENANT)
+        cls.user = create_user('jdoe')
+        cls.messages = [
+            Message.objects.create(message_text=text, updated_by_id=updated_by_id, recipient=cls.user,
+                                   created_by_id=cls.user.pk)
+            for text, updated_by_id in (('b', 2), ('a', None), ('b', None), ('c', 1), ('a', 2))
+        ]
+
+    def get_page(self, url='/api/messages/', **params):
+        request = APIRequestFactory().get(url, params)
+        force_authenticate(request, user=self.auth_user)
+        return OrderedMessageList.as_view()(request)
+
+    def get_all_pages(self, **params):
+        response = self.get_page(paging='keyset', **params)
+        message_ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.data['previous'])
+            message_ids += [message['message_id'] for message in response.data['results']]
+            if response.data['next'] is None:
+                return message_ids
+            response = self.get_page(response.data['next'])
+
+    def test_pages_follow_the_ordering(self):
+        # NULLs are the smallest values, ties are ordered by pk
+        for ordering, expected in (('message_text', [1, 4, 0, 2, 3]),
+                                   ('-message_text', [3, 0, 2, 1, 4]),
+                                   ('updated_by_id', [1, 2, 3, 0, 4]),
+                                   ('-updated_by_id,message_text', [4, 0, 3, 1, 2])):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.get_all_pages(ordering=ordering, page_size=2),
+                                 [self.messages[index].pk for index in expected])
+
+    def test_count_is_the_total_when_asked(self):
+        response = self.get_page(paging='keyset', page_size=2)
+        self.assertEqual((response.data['count'], response.data['total_count']), (None, None))
+
+        response = self.get_page(paging='keyset', page_size=2, count_mode='exact')
+        self.assertEqual((response.data['count'], len(response.data['results'])), (5, 2))
+
+    def test_cursor_of_another_ordering_is_invalid(self):
+        cursor = self.get_page(paging='keyset', page_size=2, ordering='message_text').data['next']
+        cursor = cursor.split('cursor=')[1].split('&')[0]
+
+        self.assertEqual(self.get_page(cursor=cursor, ordering='-message_text').status_code, 404)
+        self.assertEqual(self.get_page(cursor='garbage').status_code, 404)
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from api.tests.utils import create_role, create_user, get_customer
+from db.customer.models import RoleAttribute, UserAttribute, UserRole
+from tools import IsAuthenticatedAndAuthorized
+from tools.security.authorization import UserSecurityAttributesProvider, security_settings_cache
+
+
+class IsAuthenticatedAndAuthorizedTest(TestCase):
+    customer = get_customer()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('jdoe')
+        cls.role = create_role('Marketing')
+        UserRole.objects.create(user=cls.user, role=cls.role)
+
+    def setUp(self):
+        security_settings_cache.clear()
+
+    def has_permission(self, *user_security_attributes):
+        request = APIRequestFactory().get('/api/users/')
+        request.user = SimpleNamespace(is_authenticated=True)
+        view = SimpleNamespace(customer=self.customer, user=self.user,
+                               user_security_attributes=user_security_attributes)
+        return bool(IsAuthenticatedAndAuthorized().has_permission(request, view))
+
+    def test_user_and_role_attributes_are_merged(self):
+        UserAttribute.objects.create(user=self.user, name='security.crmadmin', value='True')
+        UserAttribute.objects.create(user=self.user, name='security.disabled', value='False')
+        RoleAttribute.objects.create(role_id=self.role.pk, name='security.marketingadmin', name_value=True)
+        RoleAttribute.objects.create(role_id=self.role.pk, name='navigation.users', name_value=True)
+
+        self.assertEqual(UserSecurityAttributesProvider(self.customer).get_security_settings(self.user),
+                         {'security.crmadmin', 'security.marketingadmin'})
+
+    def test_granted_by_a_role_attribute(self):
+        RoleAttribute.objects.create(role_id=self.role.pk, name='security.marketingadmin', name_value=True)
+
+        self.assertTrue(self.has_permission('security.marketingadmin', 'security.crmadmin'))
+
+    def test_granted_by_a_user_attribute(self):
+        UserAttribute.objects.create(user=self.user, name='security.crmadmin', value='True')
+
+        self.assertTrue(self.has_permission('security.marketingadmin', 'security.crmadmin'))
+
+    def test_denied_without_the_attributes(self):
+        RoleAttribute.objects.create(role_id=self.role.pk, name='security.marketingadmin', name_value=False)
+
+        self.assertFalse(self.has_permission('security.marketingadmin'))
+
+    def test_denied_when_anonymous(self):
+        request = APIRequestFactory().get('/api/users/')
+        request.user = AnonymousUser()
+        view = SimpleNamespace(customer=self.customer, user=self.user, user_security_attributes=('security.x',))
+
+        self.assertFalse(IsAuthenticatedAndAuthorized().has_permission(request, view))
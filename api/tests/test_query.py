@@ -0,0 +1,40 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.mixins import LongListModelMixin
+from api.tests.utils import create_user
+from db.customer.models import User
+from tools.query import iterate_queryset_chunks
+
+
+class IterateQuerysetChunksTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(name) for name in ('cdoe', 'adoe', 'edoe', 'bdoe', 'ddoe')]
+
+    def test_model_rows_are_walked_by_key(self):
+        chunks = list(iterate_queryset_chunks(User.objects.order_by('user_name'), 2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([user.pk for chunk in chunks for user in chunk], sorted(user.pk for user in self.users))
+
+    def test_values_rows_are_walked_by_pk(self):
+        chunks = iterate_queryset_chunks(User.objects.values('user_name', User._meta.pk.attname), 2, key='-pk')
+        self.assertEqual([row['user_name'] for chunk in chunks for row in chunk],
+                         [user.user_name for user in reversed(self.users)])
+
+    def test_ordered_slices_keep_their_ordering(self):
+        slices = LongListModelMixin().get_queryset_slices(
+            User.objects.prefetch_related('userrole_set').order_by('-user_name'), 2)
+        self.assertEqual([user.user_name for user in slices], ['edoe', 'ddoe', 'cdoe', 'bdoe', 'adoe'])
+
+    def test_default_ordering_is_walked_by_pk(self):
+        queryset = User.objects.exclude(user_name='').only('user_name').prefetch_related('userrole_set')
+        with CaptureQueriesContext(connection) as queries:
+            users = list(LongListModelMixin().get_queryset_slices(queryset, 2))
+
+        self.assertEqual([user.pk for user in users], sorted(user.pk for user in self.users))
+        user_selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT "Users"')]
+        self.assertEqual(len(user_selects), 3)
+        self.assertTrue(all('"Users"."UserID" > ' in sql for sql in user_selects[1:]))
@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase
+
+from api.renderers import CSVRenderer
+
+
+class CSVRendererTest(SimpleTestCase):
+
+    def render(self, data):
+        return CSVRenderer().render(data).splitlines()
+
+    def test_rows_of_a_page_share_the_header(self):
+        self.assertEqual(self.render({'count': 2, 'results': [{'id': 1}, {'id': 2, 'name': 'Admin'}]}),
+                         ['id,name', '1,', '2,Admin'])
+
+    def test_detail_object_is_one_row(self):
+        self.assertEqual(self.render({'id': 1, 'name': 'Admin'}), ['id,name', '1,Admin'])
+
+    def test_values_that_are_not_mappings_are_one_cell(self):
+        self.assertEqual(self.render(['Invalid page.', 'Invalid cursor']),
+                         ['value', 'Invalid page.', 'Invalid cursor'])
+        self.assertEqual(self.render('Not found'), ['value', 'Not found'])
+        self.assertEqual(self.render(3), ['value', '3'])
+        self.assertEqual(self.render(None), [])
@@ -0,0 +1,17 @@
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.roles.serializers import UsersNotAttachedToRoleList
+from db.customer.models import User
+
+
+class UsersNotAttachedToRoleListTest(SimpleTestCase):
+
+    def test_missing_is_temp_admin_is_skipped(self):
+        request = Request(APIRequestFactory().get('/api/roles/1/users/unlinked/'))
+        user = User(pk=3, user_name='jdoe', status=User.STATUS_ACTIVE)
+
+        data = UsersNotAttachedToRoleList(user, context={'request': request}).data
+        self.assertEqual((data['user_name'], data['status']), ('jdoe', 'Active'))
+        self.assertNotIn('is_temp_admin', data)
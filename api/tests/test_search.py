@@ -0,0 +1,37 @@
+from django.db.models import Q
+from django.test import TestCase
+
+from api.search import user_search_index
+from api.tests.utils import TENANT, create_user
+from db.customer.models import SearchTrigram, User
+from db.schema import tenant_tables
+
+
+class TrigramSearchIndexTest(TestCase):
+
+    def setUp(self):
+        tenant_tables.clear()
+
+    def test_saves_are_not_indexed_before_the_index_is_built(self):
+        create_user('jdoe', first_name='John')
+
+        self.assertFalse(user_search_index.is_built(TENANT))
+        self.assertFalse(SearchTrigram.objects.exists())
+
+    def test_saves_keep_the_built_index_current(self):
+        user = create_user('jdoe', first_name='John')
+        self.assertEqual(user_search_index.rebuild(TENANT), 1)
+
+        user.first_name = 'Johnny'
+        user.save()
+        self.assertTrue(user_search_index.trigrams(TENANT).filter(object_id=user.pk, trigram='nny').exists())
+
+        user.delete()
+        self.assertFalse(user_search_index.trigrams(TENANT).filter(object_id=user.pk).exists())
+
+    def test_searches_without_the_tables_fall_back_to_like(self):
+        tenant_tables.set((TENANT, SearchTrigram._meta.db_table), False)
+        like_clause = Q(first_name__icontains='ohn')
+
+        self.assertEqual(user_search_index.get_search_clause(User.objects.all(), ('first_name__icontains',), 'ohn',
+                                                             like_clause), like_clause)
@@ -0,0 +1,115 @@
+import threading
+from copy import deepcopy
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import SimpleTestCase, override_settings
+
+from api.tests.utils import get_customer
+from db.tenants import TenantConnectionRegistry
+
+
+class TenantConnectionRegistryTest(SimpleTestCase):
+
+    def setUp(self):
+        self.registry = TenantConnectionRegistry(max_aliases=2, idle_seconds=600)
+        patcher = mock.patch.object(self.registry, '_build_database_settings',
+                                    side_effect=lambda alias: deepcopy(connections.databases[DEFAULT_DB_ALIAS]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.drop_aliases, 'acme', 'globex', 'initech')
+
+    @staticmethod
+    def drop_aliases(*aliases):
+        for alias in aliases:
+            connections.databases.pop(alias, None)
+            try:
+                delattr(connections._connections, alias)
+            except AttributeError:
+                pass
+
+    def in_thread(self, function):
+        thread = threading.Thread(target=function)
+        thread.start()
+        thread.join()
+
+    def test_evicted_connection_is_closed_at_the_end_of_the_request(self):
+        connection = connections[self.registry.ensure('acme')]
+
+        with mock.patch.object(connection, 'close') as close:
+            self.registry.evict('acme')
+            self.assertNotIn('acme', self.registry)
+            self.assertIn('acme', connections.databases)
+            close.assert_not_called()
+
+            self.registry.close_evicted()
+            close.assert_called_once_with()
+        self.assertNotIn('acme', connections.databases)
+
+    def test_settings_are_kept_while_another_thread_holds_the_alias(self):
+        other_thread_done = threading.Event()
+        other_thread_ready = threading.Event()
+
+        def hold():
+            connections[self.registry.ensure('acme')]
+            other_thread_ready.set()
+            other_thread_done.wait(5)
+            self.registry.close_evicted()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        other_thread_ready.wait(5)
+
+        self.registry.ensure('acme')
+        self.registry.evict('acme')
+        self.registry.close_evicted()
+        self.assertIn('acme', connections.databases)
+
+        other_thread_done.set()
+        thread.join()
+        self.assertNotIn('acme', connections.databases)
+
+    def test_registered_alias_keeps_its_connection(self):
+        connection = connections[self.registry.ensure('acme')]
+
+        with mock.patch.object(connection, 'close') as close:
+            self.registry.close_evicted()
+        close.assert_not_called()
+        self.assertIs(connections['acme'], connection)
+
+    def test_alias_of_no_live_thread_is_dropped_at_once(self):
+        self.in_thread(lambda: connections[self.registry.ensure('acme')])
+        self.assertIn('acme', connections.databases)
+
+        self.registry.evict('acme')
+        self.assertNotIn('acme', connections.databases)
+
+    def test_least_recently_used_alias_is_evicted(self):
+        for alias in ('acme', 'globex', 'initech'):
+            self.registry.ensure(alias)
+
+        self.assertEqual([alias in self.registry for alias in ('acme', 'globex', 'initech')], [False, True, True])
+        self.registry.close_evicted()
+        self.assertNotIn('acme', connections.databases)
+        self.assertIn('globex', connections.databases)
+
+
+class TenantDatabaseSettingsTest(SimpleTestCase):
+
+    def build(self):
+        customer = get_customer(domain_name='acme.com', sql_connect_string='Server=tcp:sql01,1433;Database=acme')
+        with mock.patch('db.controller.cache.customer_cache.get', return_value=customer):
+            return TenantConnectionRegistry()._build_database_settings('acme.com')
+
+    @override_settings(TENANT_DATABASE={'ENGINE': 'mssql', 'OPTIONS': {'driver': 'ODBC Driver 17 for SQL Server'}})
+    def test_customer_settings_come_from_the_connect_string(self):
+        database = self.build()
+        self.assertEqual((database['ENGINE'], database['HOST'], database['PORT'], database['NAME']),
+                         ('mssql', 'sql01', '1433', 'acme'))
+
+    def test_missing_tenant_engine_fails(self):
+        for tenant_database in (None, {'OPTIONS': {}}):
+            with self.subTest(tenant_database=tenant_database), override_settings(TENANT_DATABASE=tenant_database):
+                with self.assertRaises(ImproperlyConfigured):
+                    self.build()
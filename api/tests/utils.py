@@ -0,0 +1,25 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from db.controller.models import Customer
+from db.customer.models import Roles, User
+
+# ensure() passes the aliases of settings.DATABASES through, the customer database of the tests is the test database
+TENANT = DEFAULT_DB_ALIAS
+
+
+def get_customer(**kwargs) -> Customer:
+    # Customer is not managed, the controller rows of the tests are never saved
+    return Customer(**dict({'customer_id': 1, 'domain_name': TENANT, 'process_active': 1}, **kwargs))
+
+
+def create_user(user_name: str, **kwargs) -> User:
+    return User.objects.create(**dict({'user_name': user_name, 'email': '%s@acme.com' % user_name}, **kwargs))
+
+
+def create_role(name: str, **kwargs) -> Roles:
+    now = timezone.now()
+    return Roles.objects.create(**dict({
+        'name': name, 'description': '', 'created_date': now, 'updated_date': now, 'data_access': True,
+        'menu_access': True, 'dashboard_access': True, 'report_access': True, 'cases': True,
+    }, **kwargs))
@@ -7,4 +7,5 @@ urlpatterns = [
     path('users/', include(('api.users.urls', 'api.users'), namespace='users')),
     path('messages/', include(('api.messages.urls', 'api.messages'), namespace='messages')),
     path('roles/', include(('api.roles.urls', 'api.roles'), namespace='roles')),
+    path('jobs/', include(('api.jobs.urls', 'api.jobs'), namespace='jobs')),
 ]
@@ -4,16 +4,26 @@ from rest_framework.validators import UniqueValidator
 
 from django.contrib.auth.models import User as UserAuth
 
+from api.compiled_serializers import CompiledListSerializer
+from api.serializers import SparseFieldsMixin
 from db import get_customer_domain_from_request
 from db.customer.models import User, Roles, UserRole
 
 
-class BaseUsersSerializer(serializers.ModelSerializer):
+STATUS_DISPLAY = dict(User.STATUS_CHOICES)
+
+
+class BaseUsersSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['status'] = instance.get_status_display()
+        if 'status' in representation:
+            representation['status'] = instance.get_status_display()
         return representation
 
+    def get_compiled_converters(self):
+        # to_representation() of the rows serialized by CompiledListSerializer
+        return {'status': lambda status: STATUS_DISPLAY.get(status, status)}
+
     class Meta:
         model = User
 
@@ -96,6 +106,7 @@ class UsersListSerializer(BaseUsersSerializer):
             'user_name': {'required': True, 'allow_blank': False},
         }
         model = User
+        list_serializer_class = CompiledListSerializer
 
 
 class UsersDetailSerializer(BaseUsersSerializer):
@@ -4,5 +4,6 @@ from api.users import views
 
 urlpatterns = [
     path('', views.UsersList.as_view(), name='list'),
+    path('changes/', views.UsersChanges.as_view(), name='changes'),
     path('<int:pk>/', views.UsersDetail.as_view(), name='detail'),
 ]
@@ -2,9 +2,11 @@ from rest_framework import exceptions, views
 
 from django.contrib.auth.models import User as UserAuth
 
+from api.changes import ChangeFeedAPIView
 from api.generics import NoCacheListCreateAPIView, NoCacheRetrieveUpdateAPIView
-from api.mixins import RequestArgMixin, ManageUISimpleSearchMixin, PermissionMixin
-from api.pagination import CustomPaginationWithSinglePage
+from api.mixins import RequestArgMixin, ManageUISimpleSearchMixin, PermissionMixin, SparseFieldsQuerysetMixin
+from api.pagination import KeysetPaginationWithSinglePage
+from api.search import user_search_index, user_search_results
 from api.users.exceptions import ForbiddenRole
 from api.users.filters import UsersFilterSet
 from api.users.serializers import UsersListSerializer, UsersDetailSerializer
@@ -17,10 +19,11 @@ class AlterUserView(views.APIView, PermissionMixin):
     permission_classes = (CanAlterUsers,)
 
 
-class UsersList(ManageUISimpleSearchMixin, NoCacheListCreateAPIView, PermissionMixin, RequestArgMixin):
+class UsersList(SparseFieldsQuerysetMixin, ManageUISimpleSearchMixin, NoCacheListCreateAPIView, PermissionMixin,
+                RequestArgMixin):
     permission_classes = (IsAuthenticatedAndAuthorized,)
     serializer_class = UsersListSerializer
-    pagination_class = CustomPaginationWithSinglePage
+    pagination_class = KeysetPaginationWithSinglePage
     filter_class = UsersFilterSet
     cors_methods = ['POST', 'GET', 'OPTIONS']
 
@@ -36,6 +39,8 @@ class UsersList(ManageUISimpleSearchMixin, NoCacheListCreateAPIView, PermissionM
         'status',
     )
 
+    search_index = user_search_index
+    search_result_cache = user_search_results
     search_fields = (
         'first_name',
         'last_name',
@@ -81,8 +86,18 @@ class UsersList(ManageUISimpleSearchMixin, NoCacheListCreateAPIView, PermissionM
         return filtered_queryset
 
 
-class UsersDetail(NoCacheRetrieveUpdateAPIView, AlterUserView):
+class UsersDetail(SparseFieldsQuerysetMixin, NoCacheRetrieveUpdateAPIView, AlterUserView):
     serializer_class = UsersDetailSerializer
+    # admin_check depends on the requester, not on the user alone
+    last_modified_field = None
 
     def get_queryset(self):
         return self.qs(User)
+
+
+class UsersChanges(ChangeFeedAPIView):
+    permission_classes = (IsAuthenticatedAndAuthorized,)
+    serializer_class = UsersListSerializer
+
+    def get_queryset(self):
+        return self.qs(User).exclude(status=0)
@@ -1,8 +1,8 @@
-import threading
-
 from django.conf import settings
 
-request_cfg = threading.local()
+from db.context import RequestConfig
+
+request_cfg = RequestConfig()
 
 
 def get_user_info_from_user(user):
@@ -9,6 +9,8 @@ from rest_framework.authtoken.serializers import AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.response import Response
 
+from db.auth.cache import token_cache
+
 
 class UnsafeSessionAuthentication(SessionAuthentication):
     def enforce_csrf(self, request):
@@ -33,6 +35,7 @@ class ObtainAuthTokenCSRF(ObtainAuthToken):
         if not created:
             token.created = datetime.utcnow()
             token.save()
+            token_cache.invalidate(token.key)
 
         payload = {
             'token': token.key,
@@ -1,6 +1,10 @@
 import base64
 import binascii
 import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
 from hashlib import sha256
 from Crypto.Cipher import AES
 
@@ -10,8 +14,11 @@ from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.hashers import make_password
 from django.db import transaction
 
+from db.cache import TTLCache
+from db.controller.cache import customer_cache
 from db.controller.models import Customer
 from db.customer.models import User
+from db.tenants import tenant_connections
 
 
 def parse_user_name_and_domain_from_email_address(username: str) -> (str, str):
@@ -35,6 +42,9 @@ def create_hash(phrase: str) -> bytes:
     return sha256(phrase.encode()).digest()
 
 
+CONTROL_CHARACTERS = re.compile('[\x00-\x16]')
+
+
 def decrypt_password(password):
     # TODO: Use sfdb.auth.utils.AESCrypt
     #       Don't use static iv...
@@ -44,7 +54,65 @@ def decrypt_password(password):
     except (binascii.Error, ValueError):
         raise UnacceptablePassphrase
 
-    return re.sub('[\x00-\x16]', '', password)  # This is not good.
+    return CONTROL_CHARACTERS.sub('', password)  # This is not good.
+
+
+# domain name -> whether the users of the customer may log in, unknown domains included
+customer_eligibility_cache = TTLCache(
+    max_size=settings.CUSTOMER_ELIGIBILITY_CACHE_MAX_SIZE,
+    ttl=settings.CUSTOMER_ELIGIBILITY_CACHE_TTL_SECONDS,
+)
+
+
+# username -> True, the usernames without a local user, their logins skip the local password check
+missing_local_users = TTLCache(
+    max_size=settings.LOGIN_USER_CACHE_MAX_SIZE,
+    ttl=settings.LOGIN_USER_CACHE_TTL_SECONDS,
+)
+
+# username -> True, the users logged in with their tenant passphrase, which is also their local password
+tenant_users = TTLCache(
+    max_size=settings.LOGIN_USER_CACHE_MAX_SIZE,
+    ttl=settings.LOGIN_USER_CACHE_TTL_SECONDS,
+)
+
+
+class StageMetrics:
+    """
+    Count and duration of the login stages, per backend class name and stage.
+    """
+
+    def __init__(self):
+        self._stages = defaultdict(lambda: [0, 0.0])
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, backend_name: str, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            with self._lock:
+                entry = self._stages[(backend_name, stage)]
+                entry[0] += 1
+                entry[1] += seconds
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            stages = {key: tuple(entry) for key, entry in self._stages.items()}
+        return {
+            '%s.%s' % key: {
+                'count': count,
+                'seconds': seconds,
+                'average_ms': 1000 * seconds / count if count else 0.0,
+            }
+            for key, (count, seconds) in sorted(stages.items())
+        }
+
+
+login_metrics = StageMetrics()
 
 
 class UnacceptablePassphrase(Exception):
@@ -72,43 +140,93 @@ class SalesFusionBackend(ModelBackend):
     # user_name = internal user record unique username
 
     def authenticate(self, request, username=None, password=None, **kwargs):
-        already_authenticated_user = self._user_is_already_authenticated(request, username, password, **kwargs)
+        """
+        The stages run in the order known to be cheapest for the username:
+            tenant user or no local user - the tenant passphrase first, then the local password
+            otherwise                    - the local password first, then the tenant passphrase
+        A username is only known as a tenant user once its local password has been set to the accepted passphrase
+        by _update_or_create_local_user, a login with a local password changed since then is accepted by the local
+        stage. A rejected login always runs the local stage, i.e. one password hash, so its time does not tell
+        whether the username exists.
+        """
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if username is None or password is None:
+            return
+
+        tenant_first = tenant_users.get(username) or missing_local_users.get(username)
+        if not tenant_first:
+            local_user = self._user_is_already_authenticated(request, username, password)
+            if local_user is not None:
+                return local_user
 
-        if already_authenticated_user:
-            return already_authenticated_user
-        else:
+        try:
+            return self._authenticate_new_user(username, password)
+        except (UserNeedsEmailAddress, UsernameNeedsAtSymbol, NoSuchCustomer, NoSuchUser, UnacceptablePassphrase):
+            pass
+
+        if tenant_first:
+            return self._user_is_already_authenticated(request, username, password)
+
+    def _user_is_already_authenticated(self, request, username, password):
+        """
+        ModelBackend.authenticate, the dummy hash of an unknown username included. The usernames without a local
+        user are remembered, their next logins try the tenant passphrase first.
+        """
+        model = get_user_model()
+        with self._timed('local_password'):
             try:
-                return self._authenticate_new_user(username, password)
-            except (UserNeedsEmailAddress, UsernameNeedsAtSymbol, NoSuchCustomer, NoSuchUser, UnacceptablePassphrase):
-                return
+                user = model._default_manager.get_by_natural_key(username)
+            except model.DoesNotExist:
+                missing_local_users.set(username, True)
+                # The hash of an existing user is run, so the time of the rejection is the same
+                model().set_password(password)
+                return None
 
-    def _user_is_already_authenticated(self, request, username, password, **kwargs):
-        return super(SalesFusionBackend, self).authenticate(request, username, password, **kwargs)
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
 
     def _authenticate_new_user(self, username: str, password: str):
         user_name, domain = parse_user_name_and_domain_from_email_address(username)
-        self._get_customer(domain)
-        passphrase = self._prepare_passphrase(password)
-        customer_user = self._get_customer_user(user_name, domain)
-        shibboleth = self._get_authority(customer_user)
+        with self._timed('customer'):
+            self.get_customer(domain)
+        with self._timed('passphrase'):
+            passphrase = self.prepare_passphrase(password)
+        with self._timed('tenant_user'):
+            customer_user = self._get_customer_user(user_name, domain)
+        shibboleth = self.get_authority(customer_user)
 
         if passphrase != shibboleth:
             raise UnacceptablePassphrase
 
-        return self._update_or_create_local_user(username, customer_user, password)
+        with self._timed('local_user'):
+            user = self._update_or_create_local_user(username, customer_user, password)
+        missing_local_users.delete(username)
+        # The local password is the passphrase now, api.signals forgets the user when its password changes
+        tenant_users.set(username, True)
+        return user
+
+    def _timed(self, stage: str):
+        return login_metrics.time(type(self).__name__, stage)
 
-    def _get_customer(self, domain):
+    def get_customer(self, domain):
+        if not customer_eligibility_cache.get_or_set(domain, lambda: self._is_customer_eligible(domain)):
+            raise NoSuchCustomer
+
+    @staticmethod
+    def _is_customer_eligible(domain) -> bool:
+        # The controller Customer model has no login column, only process_active is checked
         try:
-            return Customer.objects.using('controller').filter(domain_name=domain, process_active=1, login=1)
+            return customer_cache.get_by_domain(domain).process_active == 1
         except (Customer.MultipleObjectsReturned, Customer.DoesNotExist):
-            raise NoSuchCustomer
+            return False
 
-    def _prepare_passphrase(self, original_password: str) -> bytes:
+    def prepare_passphrase(self, original_password: str) -> bytes:
         raise NotImplementedError
 
     def _get_customer_user(self, user_name: str, domain: str) -> User:
         try:
-            return User.objects.using(domain).only(
+            return User.objects.using(tenant_connections.ensure(domain)).only(
                 'hashed_key',
                 'user_name',
                 'first_name',
@@ -118,7 +236,7 @@ class SalesFusionBackend(ModelBackend):
         except (User.MultipleObjectsReturned, User.DoesNotExist):
             raise NoSuchUser
 
-    def _get_authority(self, source):
+    def get_authority(self, source):
         return source.hashed_key
 
     def _update_or_create_local_user(self, username: str, customer_user: User, password: str):
@@ -127,16 +245,32 @@ class SalesFusionBackend(ModelBackend):
         if customer_user.email is None:
             raise UserNeedsEmailAddress
 
-        with transaction.atomic():
-            user, _ = model.objects.update_or_create(
-                defaults={
-                    'email': model.objects.normalize_email(customer_user.email),
-                    'password': make_password(password),
-                    'first_name': customer_user.first_name or '',
-                    'last_name': customer_user.last_name or '',
-                },
-                username=username,
-            )
+        profile = {
+            'email': model.objects.normalize_email(customer_user.email),
+            'first_name': customer_user.first_name or '',
+            'last_name': customer_user.last_name or '',
+        }
+
+        user = model.objects.filter(username=username).first()
+        if user is None:
+            with transaction.atomic():
+                user, _ = model.objects.update_or_create(
+                    defaults=dict(profile, password=make_password(password)),
+                    username=username,
+                )
+            return user
+
+        # The local user is only written when it differs, hashing the password again costs as much as checking it
+        update_fields = [field for field, value in profile.items() if getattr(user, field) != value]
+        for field in update_fields:
+            setattr(user, field, profile[field])
+
+        if not user.check_password(password):
+            user.set_password(password)
+            update_fields.append('password')
+
+        if update_fields:
+            user.save(update_fields=update_fields)
 
         return user
 
@@ -151,18 +285,18 @@ class SalesFusionBackend(ModelBackend):
 
 class Frodo(SalesFusionBackend):
 
-    def _prepare_passphrase(self, original_password: str) -> bytes:
+    def prepare_passphrase(self, original_password: str) -> bytes:
         return create_hash(original_password)
 
 
 class Gandalf(SalesFusionBackend):
 
-    def _prepare_passphrase(self, original_password: str) -> bytes:
+    def prepare_passphrase(self, original_password: str) -> bytes:
         decrypted_password = decrypt_password(original_password)
         return create_hash(decrypted_password)
 
 
 class Saruman(SalesFusionBackend):
 
-    def _prepare_passphrase(self, original_password: str) -> bytes:
+    def prepare_passphrase(self, original_password: str) -> bytes:
         return decode_phrase(decrypt_password(original_password))
@@ -0,0 +1,68 @@
+import copy
+from typing import Tuple
+
+from django.conf import settings
+from django.db import router, transaction
+from rest_framework.authtoken.models import Token
+
+from db.cache import TTLCache
+from db.invalidation import SharedVersions
+
+token_versions = SharedVersions('token')
+
+
+class TokenCache:
+    """
+    Process wide cache of the authentication tokens: token key -> (user, token creation date).
+
+    The entries are versioned per token in the store shared by the workers (see db.invalidation), a user has one
+    token. Deleting a token or changing its user drops the entry of every worker once the change is committed,
+    so a logout or a deactivation takes effect at once. Missing tokens are not cached.
+
+    The expiry of the tokens is checked by the callers with the cached creation date, a token that looks expired
+    is read again before it is deleted, as another worker may have renewed it.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._cache = TTLCache(
+            max_size=max_size or settings.TOKEN_CACHE_MAX_SIZE,
+            ttl=ttl or settings.TOKEN_CACHE_TTL_SECONDS,
+        )
+
+    def get(self, key) -> Tuple:
+        """
+        Raises Token.DoesNotExist in the same way as Token.objects.get()
+        The user is copied, so the requests never share an instance.
+        """
+        user, created = token_versions.get_or_set(self._cache, key, [(key,)], lambda: self._get_entry(key))
+        return copy.copy(user), created
+
+    @staticmethod
+    def _get_entry(key) -> Tuple:
+        token = Token.objects.select_related('user').get(key=key)
+        return token.user, token.created
+
+    def invalidate(self, key) -> None:
+        self.invalidate_many([key])
+
+    def invalidate_user(self, user_id) -> None:
+        self.invalidate_many(list(Token.objects.filter(user_id=user_id).values_list('key', flat=True)))
+
+    def invalidate_many(self, keys) -> None:
+        """
+        Drops the entries of this worker at once, the entries of the other workers once the transaction is committed.
+        """
+        self._cache.delete_many(keys)
+        if keys:
+            transaction.on_commit(lambda: token_versions.bump(*[(key,) for key in keys]),
+                                  using=router.db_for_write(Token))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    @property
+    def stats(self) -> dict:
+        return self._cache.stats
+
+
+token_cache = TokenCache()
@@ -0,0 +1,134 @@
+"""
+Credentials module verifies the tenant passphrases of the SalesFusion backends outside of the login flow,
+one pair at a time or in batches for the SSO sync jobs and the tenant migrations. No local user is written.
+
+A batch checks the eligibility of each customer once and reads the users of a customer with one query per
+SQL_SERVER_PARAMETER_LIMIT user names. The verifications of every backend are timed in credential_metrics.
+
+Example of usage:
+    verifier = CredentialVerifier(Gandalf())
+    verifier.verify_many([('jdoe@acme', encrypted_password), ('asmith@acme', encrypted_password)])
+    [True, False]
+"""
+
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from django.conf import settings
+
+from db.auth.backends import (
+    NoSuchCustomer,
+    SalesFusionBackend,
+    UnacceptablePassphrase,
+    UsernameNeedsAtSymbol,
+    parse_user_name_and_domain_from_email_address,
+)
+from db.customer.models import User
+from db.tenants import tenant_connections
+
+
+class VerificationMetrics:
+
+    def __init__(self):
+        self.count = 0
+        self.accepted = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, count: int, accepted: int, seconds: float) -> None:
+        with self._lock:
+            self.count += count
+            self.accepted += accepted
+            self.seconds += seconds
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'count': self.count,
+            'accepted': self.accepted,
+            'rejected': self.count - self.accepted,
+            'seconds': self.seconds,
+            'average_ms': 1000 * self.seconds / self.count if self.count else 0.0,
+        }
+
+
+# backend class name -> VerificationMetrics
+credential_metrics = defaultdict(VerificationMetrics)
+_metrics_lock = threading.Lock()
+
+
+def get_verification_metrics(backend_name: str) -> VerificationMetrics:
+    with _metrics_lock:
+        return credential_metrics[backend_name]
+
+
+class CredentialVerifier:
+    """
+    Uses the passphrase preparation and the authority of the backend, i.e. the same rules as its logins.
+    """
+
+    def __init__(self, backend: SalesFusionBackend):
+        self.backend = backend
+        self.metrics = get_verification_metrics(type(backend).__name__)
+
+    def verify(self, username: str, password: str) -> bool:
+        return self.verify_many([(username, password)])[0]
+
+    def verify_many(self, credentials: Iterable[Tuple[str, str]]) -> List[bool]:
+        """
+        Returns whether every (username, password) pair is valid, in the order of the pairs.
+        """
+        started = time.perf_counter()
+        credentials = list(credentials)
+        results = [False] * len(credentials)
+
+        attempts = defaultdict(list)
+        for index, (username, password) in enumerate(credentials):
+            try:
+                user_name, domain = parse_user_name_and_domain_from_email_address(username)
+            except UsernameNeedsAtSymbol:
+                continue
+            attempts[domain].append((index, user_name, password))
+
+        for domain, domain_attempts in attempts.items():
+            try:
+                self.backend.get_customer(domain)
+            except NoSuchCustomer:
+                continue
+
+            authorities = self._get_authorities(domain, {user_name for _, user_name, _ in domain_attempts})
+            for index, user_name, password in domain_attempts:
+                authority = authorities.get(user_name.lower())
+                if authority is None:
+                    continue
+                try:
+                    results[index] = self.backend.prepare_passphrase(password) == authority
+                except UnacceptablePassphrase:
+                    pass
+
+        self.metrics.add(len(credentials), sum(results), time.perf_counter() - started)
+        return results
+
+    def _get_authorities(self, domain: str, user_names: set) -> Dict[str, bytes]:
+        """
+        Returns the authorities by lowercased user name, the case insensitive collation of the customer databases
+        matches the user names as _get_customer_user() does. The names matching several users are left out, as
+        _get_customer_user() rejects them.
+        """
+        users = User.objects.using(tenant_connections.ensure(domain)).only('user_name', 'hashed_key')
+        user_names = sorted({user_name.lower() for user_name in user_names})
+        authorities = {}
+        duplicates = set()
+
+        for offset in range(0, len(user_names), settings.SQL_SERVER_PARAMETER_LIMIT):
+            for user in users.filter(user_name__in=user_names[offset:offset + settings.SQL_SERVER_PARAMETER_LIMIT]):
+                key = user.user_name.lower()
+                if key in authorities:
+                    duplicates.add(key)
+                authorities[key] = self.backend.get_authority(user)
+
+        for key in duplicates:
+            del authorities[key]
+        return authorities
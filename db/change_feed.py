@@ -0,0 +1,96 @@
+"""
+Change feed module records the changes of the models with track_changes as ChangeFeedEntry rows,
+the change feeds of the API serve them by cursor (see api.changes).
+
+    Model.save(), Model.delete()        - post_save / post_delete receivers, see api.signals
+    QuerySet.update(), _raw_delete()    - the pks are read before the statement, in its transaction
+    QuerySet.bulk_create()              - the pks of the created rows
+
+QuerySet.delete() sends post_delete for every deleted row of a model with receivers, so it records nothing itself.
+
+The entries are inserted once the transaction of the change has committed (transaction.on_commit), in a transaction
+of their own that first locks the ChangeFeedWatermark row of the table. The inserts of a table run one at a time, so
+its change_ids are committed in increasing order and a reader never sees a later change_id before an earlier one.
+
+The entries are not durable with the change: when a worker stops between the commit of the change and the insert
+of its entries, the change is missing from the feed until the row changes again. Callers that must not miss any
+change download the full list again from time to time, as they do after a 410 Gone.
+
+The ChangeFeed and ChangeFeedWatermark tables are created in a customer database by the enable_change_feed command
+(see db.schema), nothing is recorded and the change feeds answer 404 for the customers whose database doesn't have them.
+"""
+
+from datetime import timedelta
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, QuerySet
+
+from api.utils import get_utc_now
+from db.customer.models import ChangeFeedEntry, ChangeFeedWatermark
+from db.schema import has_tables
+
+
+def is_enabled(using: str) -> bool:
+    return has_tables(using, ChangeFeedEntry, ChangeFeedWatermark)
+
+
+def record_queryset_changes(queryset: QuerySet, deleted: bool) -> None:
+    if is_enabled(queryset.db):
+        record_object_changes(queryset.model, queryset.db, queryset.order_by().values_list('pk', flat=True), deleted)
+
+
+def record_object_changes(model, using: str, pks: Iterable[int], deleted: bool) -> None:
+    if not is_enabled(using):
+        return
+
+    pks = list(pks)
+    if pks:
+        transaction.on_commit(lambda: insert_entries(model, using, pks, deleted), using=using)
+
+
+def insert_entries(model, using: str, pks: List[int], deleted: bool) -> None:
+    table_name = model._meta.db_table
+    action = ChangeFeedEntry.ACTION_DELETE if deleted else ChangeFeedEntry.ACTION_UPSERT
+    # Every entry has 4 parameters
+    batch_size = settings.SQL_SERVER_PARAMETER_LIMIT // 4
+
+    with transaction.atomic(using=using):
+        # The lock is held until the commit, the next insert of the table allocates its change_ids after these
+        ChangeFeedWatermark.objects.using(using).select_for_update().get_or_create(
+            table_name=table_name, defaults={'change_id': 0})
+
+        entries = ChangeFeedEntry.objects.using(using)
+        for offset in range(0, len(pks), batch_size):
+            # The date of a batch is the date its change_ids are allocated at
+            changed_date = get_utc_now()
+            entries.bulk_create([
+                ChangeFeedEntry(table_name=table_name, object_id=pk, action=action, changed_date=changed_date)
+                for pk in pks[offset:offset + batch_size]
+            ])
+
+
+def prune_change_feed(using: str, retention_days: int) -> int:
+    """
+    Deletes the entries older than retention_days and moves the watermark of their tables up to the last deleted
+    change_id, the callers whose cursor is below the watermark must download the lists again.
+    """
+    if not is_enabled(using):
+        return 0
+
+    entries = ChangeFeedEntry.objects.using(using)
+    expired = entries.filter(changed_date__lt=get_utc_now() - timedelta(days=retention_days)).order_by()
+
+    count = 0
+    for table_name, change_id in expired.values_list('table_name').annotate(last=Max('change_id')):
+        # The entries of the table are deleted up to the last expired one, the watermark leaves no gap
+        pruned = entries.filter(table_name=table_name, change_id__lte=change_id)
+        with transaction.atomic(using=using):
+            ChangeFeedWatermark.objects.using(using).update_or_create(table_name=table_name, defaults={
+                'change_id': change_id,
+                'changed_date': pruned.aggregate(last=Max('changed_date'))['last'],
+            })
+            count += pruned._raw_delete(using)
+
+    return count
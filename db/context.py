@@ -0,0 +1,50 @@
+"""
+Context module keeps the per request configuration used for tenant routing.
+
+The values are stored in a ContextVar instead of a threading.local, so concurrent requests
+served by the same thread (ASGI, async views) never see each other's customer domain.
+"""
+
+from contextvars import ContextVar
+from types import MappingProxyType
+
+_EMPTY = MappingProxyType({})
+
+
+class RequestConfig:
+    """
+    Attribute style access to the request configuration:
+
+        request_cfg.customer_domain_name = 'acme.com'
+        hasattr(request_cfg, 'customer_domain_name')  # True
+        request_cfg.clear()
+        hasattr(request_cfg, 'customer_domain_name')  # False
+
+    Every assignment stores a new read-only mapping, so a context copied by asyncio or
+    asgiref never shares mutable state with the context it was copied from.
+    """
+
+    def __init__(self, name='request_cfg'):
+        object.__setattr__(self, '_values', ContextVar(name, default=_EMPTY))
+
+    def __getattr__(self, name):
+        try:
+            return self._values.get()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        values = dict(self._values.get())
+        values[name] = value
+        self._values.set(MappingProxyType(values))
+
+    def __delattr__(self, name):
+        values = dict(self._values.get())
+        try:
+            del values[name]
+        except KeyError:
+            raise AttributeError(name)
+        self._values.set(MappingProxyType(values))
+
+    def clear(self):
+        self._values.set(_EMPTY)
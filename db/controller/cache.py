@@ -0,0 +1,69 @@
+from django.conf import settings
+
+from db.cache import TTLCache
+from db.controller.models import Customer
+
+CONTROLLER_DB_ALIAS = 'controller'
+
+
+class CustomerCache:
+    """
+    Process wide cache of the controller Customer rows.
+
+    Every customer is stored under both its pk and its domain name, so the lookups made with
+    HTTP_X_CUSTOMER_ID and with the user's domain share the same entry. Missing customers are not cached.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._cache = TTLCache(
+            max_size=max_size or settings.CUSTOMER_CACHE_MAX_SIZE,
+            ttl=ttl or settings.CUSTOMER_CACHE_TTL_SECONDS,
+        )
+
+    def get(self, pk_or_domain) -> Customer:
+        """
+        Raises Customer.DoesNotExist in the same way as Customer.objects.get()
+        """
+        if str(pk_or_domain).isdigit():
+            return self.get_by_pk(int(pk_or_domain))
+
+        return self.get_by_domain(pk_or_domain)
+
+    def get_by_pk(self, pk) -> Customer:
+        customer = self._cache.get(('pk', pk))
+        if customer is None:
+            customer = self._add(Customer.objects.using(CONTROLLER_DB_ALIAS).get(pk=pk))
+
+        return customer
+
+    def get_by_domain(self, domain_name) -> Customer:
+        customer = self._cache.get(('domain_name', domain_name))
+        if customer is None:
+            customer = self._add(Customer.objects.using(CONTROLLER_DB_ALIAS).get(domain_name=domain_name))
+
+        return customer
+
+    def invalidate(self, customer: Customer = None, pk=None, domain_name=None) -> None:
+        if customer is not None:
+            pk, domain_name = customer.pk, customer.domain_name
+
+        # Drop the entries of both keys even when only one of them is known, the lookups are not counted in stats
+        for key in (('pk', pk), ('domain_name', domain_name)):
+            cached = self._cache.peek(key)
+            if cached is not None:
+                self._cache.delete_many((('pk', cached.pk), ('domain_name', cached.domain_name)))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    @property
+    def stats(self) -> dict:
+        return self._cache.stats
+
+    def _add(self, customer):
+        self._cache.set(('pk', customer.pk), customer)
+        self._cache.set(('domain_name', customer.domain_name), customer)
+        return customer
+
+
+customer_cache = CustomerCache()
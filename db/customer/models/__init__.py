@@ -5,6 +5,9 @@ from db.database.model_base import SchemaModel
 
 from db.customer.models.users import *
 from db.customer.models.message import *
+from db.customer.models.search import *
+from db.customer.models.audit import *
+from db.customer.models.changes import *
 
 
 class UserRole(SchemaModel):
@@ -18,6 +21,8 @@ class UserRole(SchemaModel):
 
 
 class Roles(SchemaModel):
+    track_changes = True
+
     ADMIN_NAVIGATION = 'Admin Navigation'
     ADMIN_ROLE = 'Admin Role'
 
@@ -0,0 +1,33 @@
+from django.db import models
+
+from api.utils import get_utc_now
+from db.database.model_base import SchemaModel
+
+
+class RoleAuditLog(SchemaModel):
+    """
+    One row per attribute granted or revoked and per user linked or unlinked, written by api.audit.
+    """
+    KIND_ATTRIBUTE = 'attribute'
+    KIND_USER = 'user'
+
+    KIND_CHOICES = (
+        (KIND_ATTRIBUTE, "Attribute"),
+        (KIND_USER, "User"),
+    )
+
+    role_audit_log_id = models.BigAutoField(db_column='RoleAuditLogID', primary_key=True)
+    kind = models.CharField(db_column='Kind', max_length=20, choices=KIND_CHOICES)
+    role_id = models.IntegerField(db_column='RoleID')
+    attribute_name = models.CharField(db_column='AttributeName', max_length=50, blank=True)
+    user_id = models.IntegerField(db_column='UserID', blank=True, null=True)
+    value = models.BooleanField(db_column='Value')
+    changed_by_id = models.IntegerField(db_column='ChangedByID', blank=True, null=True)
+    changed_date = models.DateTimeField(db_column='ChangedDate', default=get_utc_now)
+
+    class Meta(SchemaModel.Meta):
+        managed = True
+        db_table = 'RoleAuditLog'
+        indexes = [
+            models.Index(fields=['role_id', 'changed_date'], name='role_audit_log_role_idx'),
+        ]
@@ -0,0 +1,4 @@
+from .changes import (
+    ChangeFeedEntry,
+    ChangeFeedWatermark,
+)
@@ -0,0 +1,47 @@
+from django.db import models
+
+from api.utils import get_utc_now
+from db.database.model_base import SchemaModel
+
+
+class ChangeFeedEntry(SchemaModel):
+    """
+    One row per change of a row of the models with track_changes, written by db.change_feed.
+    change_id is the cursor of the change feeds, a delete leaves a tombstone entry.
+    """
+    ACTION_UPSERT = 'upsert'
+    ACTION_DELETE = 'delete'
+
+    ACTION_CHOICES = (
+        (ACTION_UPSERT, "Created or updated"),
+        (ACTION_DELETE, "Deleted"),
+    )
+
+    change_id = models.BigAutoField(db_column='ChangeID', primary_key=True)
+    table_name = models.CharField(db_column='TableName', max_length=50)
+    object_id = models.IntegerField(db_column='ObjectID')
+    action = models.CharField(db_column='Action', max_length=10, choices=ACTION_CHOICES)
+    changed_date = models.DateTimeField(db_column='ChangedDate', default=get_utc_now)
+
+    class Meta(SchemaModel.Meta):
+        managed = True
+        db_table = 'ChangeFeed'
+        indexes = [
+            models.Index(fields=['table_name', 'change_id'], name='change_feed_table_idx'),
+            models.Index(fields=['changed_date'], name='change_feed_date_idx'),
+        ]
+
+
+class ChangeFeedWatermark(SchemaModel):
+    """
+    One row per table with entries: every entry up to change_id is pruned, the last one was made at changed_date,
+    None while nothing is pruned. A cursor lower than change_id missed changes, see api.changes.
+    The inserts of the entries of the table lock the row, see db.change_feed.
+    """
+    table_name = models.CharField(db_column='TableName', max_length=50, primary_key=True)
+    change_id = models.BigIntegerField(db_column='ChangeID')
+    changed_date = models.DateTimeField(db_column='ChangedDate', blank=True, null=True)
+
+    class Meta(SchemaModel.Meta):
+        managed = True
+        db_table = 'ChangeFeedWatermark'
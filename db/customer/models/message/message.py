@@ -7,6 +7,8 @@ from db.database.model_base import SchemaModel
 
 
 class Message(SchemaModel):
+    track_changes = True
+
     message_id = models.AutoField(db_column='MessageID', primary_key=True)
     message_text = models.CharField(db_column='MessageText', max_length=1000, blank=True)
     recipient = models.ForeignKey('User', db_column='Recipient', on_delete=models.PROTECT, related_name='recipient_messages')
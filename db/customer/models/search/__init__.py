@@ -0,0 +1,4 @@
+from .trigrams import (
+    SearchIndex,
+    SearchTrigram,
+)
@@ -0,0 +1,33 @@
+from django.db import models
+
+from api.utils import get_utc_now
+from db.database.model_base import SchemaModel
+
+
+class SearchTrigram(SchemaModel):
+    search_trigram_id = models.BigAutoField(db_column='SearchTrigramID', primary_key=True)
+    table_name = models.CharField(db_column='TableName', max_length=50)
+    field_name = models.CharField(db_column='FieldName', max_length=50)
+    object_id = models.IntegerField(db_column='ObjectID')
+    trigram = models.CharField(db_column='Trigram', max_length=3)
+
+    class Meta(SchemaModel.Meta):
+        managed = True
+        db_table = 'SearchTrigram'
+        indexes = [
+            models.Index(fields=['table_name', 'trigram', 'field_name', 'object_id'], name='search_trigram_lookup_idx'),
+            models.Index(fields=['table_name', 'object_id'], name='search_trigram_object_idx'),
+        ]
+
+
+class SearchIndex(SchemaModel):
+    """
+    One row per indexed table, written once the index of the table has been fully built.
+    The searches only use the trigrams of a table while its row exists.
+    """
+    table_name = models.CharField(db_column='TableName', max_length=50, primary_key=True)
+    built_date = models.DateTimeField(db_column='BuiltDate', default=get_utc_now)
+
+    class Meta(SchemaModel.Meta):
+        managed = True
+        db_table = 'SearchIndex'
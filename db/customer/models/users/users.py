@@ -4,6 +4,8 @@ from db.database.model_base import SchemaModel
 
 
 class User(SchemaModel):
+    track_changes = True
+
     STATUS_INACTIVE = 0
     STATUS_ACTIVE = 1
 
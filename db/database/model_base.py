@@ -2,8 +2,14 @@ from typing import List
 
 from django.db import models
 
+from db.query_cache import TenantManager
+
 
 class SchemaModel(models.Model):
+    objects = TenantManager()
+
+    # The changes of the rows are recorded for the change feeds, see db.change_feed
+    track_changes = False
 
     @classmethod
     def _get_model_field_names(cls) -> List[str]:
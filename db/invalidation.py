@@ -0,0 +1,79 @@
+"""
+Invalidation module keeps the version counters that the worker processes share to invalidate their caches.
+
+The caches of db.cache live in one worker process. A cache whose entries must not outlive a change made by another
+worker stores every entry with the version of its scope (a customer, a table...) read before the value was computed,
+and an entry whose version is not the current one is a miss. A change bumps the version of its scope, which makes
+the entries of every worker stale at once.
+
+The versions are kept in the Django cache CACHES[INVALIDATION_CACHE]. It must be shared by the worker processes
+(Memcached, Redis), with the local memory backend the versions only invalidate the entries of their own process.
+A lost version is started again at a random value, so it can't match the version of an entry cached before.
+
+Example of usage:
+    versions = SharedVersions('admin_users')
+    admin_user_ids = versions.get_or_set(cache, customer_domain, [(customer_domain,)], get_admin_user_ids)
+    ...
+    versions.bump((customer_domain,))
+"""
+
+import random
+from typing import Any, Callable, Hashable, Iterable, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from db.cache import MISSING, TTLCache
+
+
+class SharedVersions:
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+
+    @property
+    def cache(self):
+        return caches[settings.INVALIDATION_CACHE]
+
+    def get(self, scope: Sequence[Hashable]) -> int:
+        return self.get_many([scope])[0]
+
+    def get_many(self, scopes: Iterable[Sequence[Hashable]]) -> Tuple[int, ...]:
+        keys = [self._get_key(scope) for scope in scopes]
+        versions = self.cache.get_many(keys)
+
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            for key in missing:
+                self.cache.add(key, random.getrandbits(48), timeout=None)
+            versions.update(self.cache.get_many(missing))
+
+        # A version lost again meanwhile reads as -1, an entry is never cached with it
+        return tuple(versions.get(key, -1) for key in keys)
+
+    def get_or_set(self, cache: TTLCache, key: Hashable, scopes: Sequence[Sequence[Hashable]],
+                   get_value: Callable[[], Any]) -> Any:
+        """
+        Returns the value cached for the key if none of its scopes was bumped since, computes and caches it otherwise.
+        The versions are read before the value is computed, so a change made meanwhile makes the new entry stale.
+        """
+        versions = self.get_many(scopes)
+        entry = cache.get(key, MISSING)
+        if entry is not MISSING and entry[0] == versions:
+            return entry[1]
+
+        value = get_value()
+        if -1 not in versions:
+            cache.set(key, (versions, value))
+        return value
+
+    def bump(self, *scopes: Sequence[Hashable]) -> None:
+        for scope in scopes:
+            key = self._get_key(scope)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.add(key, random.getrandbits(48), timeout=None)
+
+    def _get_key(self, scope: Sequence[Hashable]) -> str:
+        return ':'.join([self.prefix] + [str(part) for part in scope])
@@ -0,0 +1,52 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from api.utils import get_utc_now
+from db.database.model_base import SchemaModel
+
+
+class Job(SchemaModel):
+    """
+    Background job of a customer, stored in settings.JOB_DATABASE and run by the run_jobs command.
+    state is the resume point saved by the handler after every chunk.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    job_id = models.BigAutoField(db_column='JobID', primary_key=True)
+    kind = models.CharField(db_column='Kind', max_length=100)
+    customer_domain = models.CharField(db_column='CustomerDomain', max_length=50)
+    created_by_id = models.IntegerField(db_column='CreatedByID', blank=True, null=True)
+    status = models.CharField(db_column='Status', max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    payload = models.JSONField(db_column='Payload', default=dict, encoder=DjangoJSONEncoder)
+    state = models.JSONField(db_column='State', default=dict, encoder=DjangoJSONEncoder)
+    progress = models.IntegerField(db_column='Progress', default=0)
+    total = models.IntegerField(db_column='Total', blank=True, null=True)
+    result = models.JSONField(db_column='Result', blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(db_column='Error', blank=True)
+    attempts = models.IntegerField(db_column='Attempts', default=0)
+    worker = models.CharField(db_column='Worker', max_length=100, blank=True)
+    created_date = models.DateTimeField(db_column='CreatedDate', default=get_utc_now)
+    started_date = models.DateTimeField(db_column='StartedDate', blank=True, null=True)
+    heartbeat_date = models.DateTimeField(db_column='HeartbeatDate', blank=True, null=True)
+    finished_date = models.DateTimeField(db_column='FinishedDate', blank=True, null=True)
+
+    class Meta(SchemaModel.Meta):
+        managed = True
+        db_table = 'Jobs'
+        indexes = [
+            models.Index(fields=['status', 'customer_domain'], name='jobs_status_customer_idx'),
+        ]
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
@@ -0,0 +1,29 @@
+import asyncio
+
+from django.utils.decorators import sync_and_async_middleware
+
+from db import request_cfg
+
+
+@sync_and_async_middleware
+def request_cfg_middleware(get_response):
+    """
+    Makes sure the tenant of the previous request served in the same context is never reused.
+    The configuration is cleared before the view is called and once the response is ready.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            request_cfg.clear()
+            try:
+                return await get_response(request)
+            finally:
+                request_cfg.clear()
+    else:
+        def middleware(request):
+            request_cfg.clear()
+            try:
+                return get_response(request)
+            finally:
+                request_cfg.clear()
+
+    return middleware
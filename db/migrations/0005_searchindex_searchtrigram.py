@@ -0,0 +1,49 @@
+from django.db import migrations, models
+import api.utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0004_alter_message_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndex',
+            fields=[
+                ('table_name', models.CharField(db_column='TableName', max_length=50, primary_key=True, serialize=False)),
+                ('built_date', models.DateTimeField(db_column='BuiltDate', default=api.utils.get_utc_now)),
+            ],
+            options={
+                'db_table': 'SearchIndex',
+                'ordering': ['pk'],
+                'abstract': False,
+                'managed': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('search_trigram_id', models.BigAutoField(db_column='SearchTrigramID', primary_key=True, serialize=False)),
+                ('table_name', models.CharField(db_column='TableName', max_length=50)),
+                ('field_name', models.CharField(db_column='FieldName', max_length=50)),
+                ('object_id', models.IntegerField(db_column='ObjectID')),
+                ('trigram', models.CharField(db_column='Trigram', max_length=3)),
+            ],
+            options={
+                'db_table': 'SearchTrigram',
+                'ordering': ['pk'],
+                'abstract': False,
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['table_name', 'trigram', 'field_name', 'object_id'], name='search_trigram_lookup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['table_name', 'object_id'], name='search_trigram_object_idx'),
+        ),
+    ]
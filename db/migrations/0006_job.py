@@ -0,0 +1,45 @@
+import api.utils
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0005_searchindex_searchtrigram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('job_id', models.BigAutoField(db_column='JobID', primary_key=True, serialize=False)),
+                ('kind', models.CharField(db_column='Kind', max_length=100)),
+                ('customer_domain', models.CharField(db_column='CustomerDomain', max_length=50)),
+                ('created_by_id', models.IntegerField(blank=True, db_column='CreatedByID', null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], db_column='Status', default='queued', max_length=20)),
+                ('payload', models.JSONField(db_column='Payload', default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('state', models.JSONField(db_column='State', default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('progress', models.IntegerField(db_column='Progress', default=0)),
+                ('total', models.IntegerField(blank=True, db_column='Total', null=True)),
+                ('result', models.JSONField(blank=True, db_column='Result', encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True, db_column='Error')),
+                ('attempts', models.IntegerField(db_column='Attempts', default=0)),
+                ('worker', models.CharField(blank=True, db_column='Worker', max_length=100)),
+                ('created_date', models.DateTimeField(db_column='CreatedDate', default=api.utils.get_utc_now)),
+                ('started_date', models.DateTimeField(blank=True, db_column='StartedDate', null=True)),
+                ('heartbeat_date', models.DateTimeField(blank=True, db_column='HeartbeatDate', null=True)),
+                ('finished_date', models.DateTimeField(blank=True, db_column='FinishedDate', null=True)),
+            ],
+            options={
+                'db_table': 'Jobs',
+                'ordering': ['pk'],
+                'abstract': False,
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'customer_domain'], name='jobs_status_customer_idx'),
+        ),
+    ]
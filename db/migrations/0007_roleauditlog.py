@@ -0,0 +1,35 @@
+import api.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0006_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoleAuditLog',
+            fields=[
+                ('role_audit_log_id', models.BigAutoField(db_column='RoleAuditLogID', primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('attribute', 'Attribute'), ('user', 'User')], db_column='Kind', max_length=20)),
+                ('role_id', models.IntegerField(db_column='RoleID')),
+                ('attribute_name', models.CharField(blank=True, db_column='AttributeName', max_length=50)),
+                ('user_id', models.IntegerField(blank=True, db_column='UserID', null=True)),
+                ('value', models.BooleanField(db_column='Value')),
+                ('changed_by_id', models.IntegerField(blank=True, db_column='ChangedByID', null=True)),
+                ('changed_date', models.DateTimeField(db_column='ChangedDate', default=api.utils.get_utc_now)),
+            ],
+            options={
+                'db_table': 'RoleAuditLog',
+                'ordering': ['pk'],
+                'abstract': False,
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='roleauditlog',
+            index=models.Index(fields=['role_id', 'changed_date'], name='role_audit_log_role_idx'),
+        ),
+    ]
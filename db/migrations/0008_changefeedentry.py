@@ -0,0 +1,36 @@
+import api.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0007_roleauditlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedEntry',
+            fields=[
+                ('change_id', models.BigAutoField(db_column='ChangeID', primary_key=True, serialize=False)),
+                ('table_name', models.CharField(db_column='TableName', max_length=50)),
+                ('object_id', models.IntegerField(db_column='ObjectID')),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], db_column='Action', max_length=10)),
+                ('changed_date', models.DateTimeField(db_column='ChangedDate', default=api.utils.get_utc_now)),
+            ],
+            options={
+                'db_table': 'ChangeFeed',
+                'ordering': ['pk'],
+                'abstract': False,
+                'managed': True,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changefeedentry',
+            index=models.Index(fields=['table_name', 'change_id'], name='change_feed_table_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changefeedentry',
+            index=models.Index(fields=['changed_date'], name='change_feed_date_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0008_changefeedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeedWatermark',
+            fields=[
+                ('table_name', models.CharField(db_column='TableName', max_length=50, primary_key=True, serialize=False)),
+                ('change_id', models.BigIntegerField(db_column='ChangeID')),
+                ('changed_date', models.DateTimeField(blank=True, db_column='ChangedDate', null=True)),
+            ],
+            options={
+                'db_table': 'ChangeFeedWatermark',
+                'ordering': ['pk'],
+                'abstract': False,
+                'managed': True,
+            },
+        ),
+    ]
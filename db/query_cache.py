@@ -0,0 +1,213 @@
+"""
+Query cache module keeps the results of the customer queries that are read over and over.
+
+The cache is opt-in: Queryable.qs(model, cached=True) returns a queryset whose rows and count are
+cached per (database alias, SQL and params). Every entry is keyed with the version of each table its
+SQL reads, a write bumps the version of its table so the entries that read it are not found anymore
+and age out of the LRU.
+
+The versions are bumped by
+    - QuerySet.update(), delete(), bulk_create(), bulk_update() and _raw_delete() of any SchemaModel
+    - post_save / post_delete of any SchemaModel, see api.signals
+    - invalidate_tables() after raw SQL, see tools.query.insert_from_select
+
+A version is bumped again once the transaction commits, so a read made before the commit can not keep
+the old rows. Reads inside a transaction neither use nor fill the cache.
+
+The versions are shared by the worker processes (see db.invalidation), a write made by one worker invalidates the
+entries of all of them. Each cached read costs one round trip to the shared cache for the versions of its tables.
+"""
+
+import hashlib
+import json
+import pickle
+import threading
+from typing import Callable, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models import Manager, QuerySet
+
+from db.cache import MISSING, TTLCache
+from db.invalidation import SharedVersions
+
+
+class QueryResultCache:
+    """
+    The entries are pickled, so the instances handed to a request are never shared with another one.
+    Results of more than max_rows rows are not cached.
+    """
+
+    def __init__(self, max_size=None, ttl=None, max_rows=None):
+        self.cache = TTLCache(
+            max_size=max_size or settings.QUERY_CACHE_MAX_SIZE,
+            ttl=ttl or settings.QUERY_CACHE_TTL_SECONDS,
+        )
+        self.max_rows = max_rows or settings.QUERY_CACHE_MAX_ROWS
+        self.invalidations = 0
+        self.versions = SharedVersions('query')
+        self._table_names = None
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, queryset: QuerySet, kind: str, fetch: Callable):
+        key = self.get_key(queryset, kind)
+        if key is None:
+            return fetch()
+
+        value = self.cache.get(key, MISSING)
+        if value is not MISSING:
+            return pickle.loads(value)
+
+        # The key holds the table versions read before the query, a write made meanwhile makes it stale at once
+        value = fetch()
+        if not isinstance(value, list) or len(value) <= self.max_rows:
+            self.cache.set(key, pickle.dumps(value))
+        return value
+
+    def get_key(self, queryset: QuerySet, kind: str) -> Optional[Tuple]:
+        using = queryset.db
+        try:
+            sql, params = queryset.query.get_compiler(using=using).as_sql()
+        except EmptyResultSet:
+            return None
+
+        versions = self.get_versions(using, sql)
+        if versions is None:
+            return None
+
+        query_hash = hashlib.sha1(json.dumps([kind, sql, params], default=str).encode()).hexdigest()
+        return using, query_hash, versions
+
+    def get_versions(self, using: str, sql: str) -> Optional[Tuple[int, ...]]:
+        """
+        Versions of the tables read by the SQL, None when one of them can not be read from the shared cache.
+        """
+        versions = self.versions.get_many([(using, table) for table in self.get_tables(using, sql)])
+        return None if -1 in versions else versions
+
+    def get_tables(self, using: str, sql: str) -> Tuple[str, ...]:
+        """
+        Tables of the models read by the SQL, subqueries included.
+        """
+        if self._table_names is None:
+            self._table_names = sorted({model._meta.db_table for model in apps.get_models()})
+
+        quote_name = connections[using].ops.quote_name
+        return tuple(table for table in self._table_names if quote_name(table) in sql)
+
+    def invalidate(self, using: str, *tables: str) -> None:
+        self._bump(using, tables)
+        transaction.on_commit(lambda: self._bump(using, tables), using=using)
+
+    def _bump(self, using, tables):
+        self.versions.bump(*((using, table) for table in tables))
+        with self._lock:
+            self.invalidations += 1
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.cache.stats, invalidations=self.invalidations)
+
+
+query_cache = QueryResultCache()
+
+
+def invalidate_tables(using: str, *models) -> None:
+    query_cache.invalidate(using, *(model._meta.db_table for model in models))
+
+
+class TenantQuerySet(QuerySet):
+    """
+    QuerySet of the SchemaModels, the writes invalidate the query cache and cached() opts the reads in.
+    The writes of the models with track_changes are also recorded in the change feed, see db.change_feed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._use_query_cache = False
+
+    def cached(self, use_query_cache=True):
+        clone = self._chain()
+        clone._use_query_cache = use_query_cache
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._use_query_cache = self._use_query_cache
+        return clone
+
+    def _is_cacheable(self):
+        return (self._use_query_cache and not self._prefetch_related_lookups and not self.query.select_for_update
+                and not connections[self.db].in_atomic_block)
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._is_cacheable():
+            self._result_cache = query_cache.get_or_fetch(self, 'rows:%s' % self._iterable_class.__name__,
+                                                          lambda: list(self._iterable_class(self)))
+        super()._fetch_all()
+
+    def count(self):
+        if self._result_cache is not None or not self._is_cacheable():
+            return super().count()
+        return query_cache.get_or_fetch(self.order_by(), 'count', lambda: super(TenantQuerySet, self).count())
+
+    def _invalidate(self, *models):
+        invalidate_tables(self.db, self.model, *models)
+
+    def _tracks_changes(self, using=None):
+        from db.change_feed import is_enabled
+        return self.model.track_changes and is_enabled(using or self.db)
+
+    def _record_changes(self, deleted):
+        # The rows are read before the statement, in its transaction, an update may change the rows it filters on
+        from db.change_feed import record_queryset_changes
+        record_queryset_changes(self, deleted)
+
+    def update(self, **kwargs):
+        if self._tracks_changes():
+            with transaction.atomic(using=self.db, savepoint=False):
+                self._record_changes(deleted=False)
+                rows = super().update(**kwargs)
+        else:
+            rows = super().update(**kwargs)
+        self._invalidate()
+        return rows
+
+    def _update(self, values):
+        rows = super()._update(values)
+        self._invalidate()
+        return rows
+
+    def delete(self):
+        deleted = super().delete()
+        # The cascades of the collector may delete or update the related rows
+        self._invalidate(*(related.related_model for related in self.model._meta.related_objects))
+        return deleted
+
+    def _raw_delete(self, using):
+        if self._tracks_changes(using):
+            with transaction.atomic(using=using, savepoint=False):
+                self.using(using)._record_changes(deleted=True)
+                rows = super()._raw_delete(using)
+        else:
+            rows = super()._raw_delete(using)
+        invalidate_tables(using, self.model)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if self.model.track_changes:
+            from db.change_feed import record_object_changes
+            # The pks are only set on the backends that return the rows of a bulk insert
+            record_object_changes(self.model, self.db, [obj.pk for obj in objs if obj.pk is not None], deleted=False)
+        return objs
+
+    def _insert(self, *args, **kwargs):
+        result = super()._insert(*args, **kwargs)
+        invalidate_tables(kwargs.get('using') or self.db, self.model)
+        return result
+
+
+TenantManager = Manager.from_queryset(TenantQuerySet)
@@ -0,0 +1,54 @@
+"""
+Schema module tells which of the tables kept by the API itself exist in a customer database.
+
+The customer databases are not migrated (see db.MasterRouter.allow_migrate), the tables of the features that keep
+their rows next to the customer data are created in a customer database by the command that enables the feature,
+with create_tables():
+
+    rebuild_search_index    - SearchIndex, SearchTrigram
+    enable_change_feed      - ChangeFeed, ChangeFeedWatermark
+    enable_audit_log        - RoleAuditLog
+
+A feature stays off for a customer whose database doesn't have its tables, its writes are skipped.
+The presence of the tables is cached per worker process for TENANT_TABLES_CACHE_TTL_SECONDS, so the other
+workers turn the feature on at most that many seconds after the command has created the tables.
+"""
+
+from django.conf import settings
+from django.db import connections
+
+from db.cache import TTLCache
+
+# (connection alias, table name) -> the table exists
+tenant_tables = TTLCache(
+    max_size=settings.TENANT_TABLES_CACHE_MAX_SIZE,
+    ttl=settings.TENANT_TABLES_CACHE_TTL_SECONDS,
+)
+
+
+def has_tables(using: str, *models) -> bool:
+    for model in models:
+        key = (using, model._meta.db_table)
+        exists = tenant_tables.get(key)
+        if exists is None:
+            exists = model._meta.db_table in connections[using].introspection.table_names()
+            tenant_tables.set(key, exists)
+        if not exists:
+            return False
+
+    return True
+
+
+def create_tables(using: str, *models) -> None:
+    """
+    Creates the tables of the models that don't exist yet in the database, with their indexes.
+    """
+    connection = connections[using]
+    existing = set(connection.introspection.table_names())
+    missing = [model for model in models if model._meta.db_table not in existing]
+    if missing:
+        with connection.schema_editor() as editor:
+            for model in missing:
+                editor.create_model(model)
+
+    tenant_tables.delete_many((using, model._meta.db_table) for model in models)
@@ -0,0 +1,211 @@
+"""
+Tenants module keeps the registry of customer database connections.
+
+Customer databases are not listed in settings.DATABASES. The connection alias of a customer
+is built on first use from the controller Customer row (domain_name, sql_connect_string),
+kept while it is in use and evicted once it is idle or the registry grows over its bound.
+
+Django keeps one connection per thread and alias, and a thread can only close its own. An evicted alias
+is therefore only marked: every thread closes its connections of the evicted aliases at the end of its
+request (request_finished), and the database settings of the alias are dropped once no thread holds
+a connection of it anymore. A thread that serves no other request keeps its connection until it exits.
+"""
+
+import threading
+import time
+import weakref
+from collections import OrderedDict, defaultdict
+from copy import deepcopy
+from typing import Dict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+# Keys of the ADO.NET style connection string mapped to the Django database settings
+CONNECT_STRING_KEYS = {
+    'server': 'HOST',
+    'data source': 'HOST',
+    'address': 'HOST',
+    'addr': 'HOST',
+    'port': 'PORT',
+    'database': 'NAME',
+    'initial catalog': 'NAME',
+    'user id': 'USER',
+    'uid': 'USER',
+    'user': 'USER',
+    'password': 'PASSWORD',
+    'pwd': 'PASSWORD',
+}
+
+
+def parse_connect_string(connect_string: str) -> Dict[str, str]:
+    """
+    Converts Customer.sql_connect_string into the Django database settings.
+
+    Example:
+        parse_connect_string('Server=tcp:sql01,1433;Database=acme;User Id=api;Password=secret')
+        {'HOST': 'sql01', 'PORT': '1433', 'NAME': 'acme', 'USER': 'api', 'PASSWORD': 'secret'}
+    """
+    database = {}
+    for pair in (connect_string or '').split(';'):
+        if '=' not in pair:
+            continue
+
+        key, value = pair.split('=', 1)
+        setting = CONNECT_STRING_KEYS.get(key.strip().lower())
+        if setting:
+            database[setting] = value.strip()
+
+    host = database.get('HOST', '')
+    if host.lower().startswith('tcp:'):
+        host = host[4:]
+    if ',' in host:
+        host, database['PORT'] = host.split(',', 1)
+    if host:
+        database['HOST'] = host
+
+    return database
+
+
+class TenantConnectionRegistry:
+    """
+    LRU registry of the customer connection aliases.
+
+    The alias is the value that views pass to .using() and transaction.atomic(using=...),
+    i.e. the customer domain name (or the customer pk for HTTP_X_CUSTOMER_ID requests).
+    Aliases defined in settings.DATABASES are never registered nor evicted.
+    """
+
+    def __init__(self, max_aliases=None, idle_seconds=None):
+        self.max_aliases = max_aliases or settings.TENANT_CONNECTION_MAX_ALIASES
+        self.idle_seconds = idle_seconds or settings.TENANT_CONNECTION_IDLE_SECONDS
+        self._last_used = OrderedDict()
+        # alias -> the threads that used the alias since their last close_evicted() of it
+        self._holders = defaultdict(weakref.WeakSet)
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+    def __contains__(self, alias):
+        return alias in self._last_used
+
+    def __len__(self):
+        return len(self._last_used)
+
+    def ensure(self, alias: str) -> str:
+        """
+        Makes sure the connection alias exists and marks it as recently used.
+        Returns the alias so the call can be inlined: model.objects.using(tenant_connections.ensure(domain))
+        """
+        if not alias or alias in settings.DATABASES:
+            return alias
+
+        with self._lock:
+            if alias in self._last_used:
+                self._last_used.move_to_end(alias)
+                self._last_used[alias] = time.monotonic()
+                self._hold(alias)
+                return alias
+
+        # The controller query is made outside of the lock, so a slow controller
+        # does not block the requests of the tenants that are already registered
+        database = self._build_database_settings(alias)
+
+        with self._lock:
+            if alias not in self._last_used:
+                connections.databases[alias] = database
+            self._last_used[alias] = time.monotonic()
+            self._last_used.move_to_end(alias)
+            self._hold(alias)
+            self._evict_stale()
+
+        return alias
+
+    def evict(self, alias: str) -> None:
+        """
+        Unregisters the alias, its connections are closed by close_evicted() in the threads that hold them.
+        """
+        with self._lock:
+            if self._last_used.pop(alias, None) is not None and not self._is_held(alias):
+                self._holders.pop(alias, None)
+                connections.databases.pop(alias, None)
+
+    def evict_all(self) -> None:
+        with self._lock:
+            for alias in list(self._last_used):
+                self.evict(alias)
+
+    def close_evicted(self, **kwargs) -> None:
+        """
+        Closes the connections of the current thread to the evicted aliases, request_finished receiver.
+        """
+        held = getattr(self._local, 'aliases', None)
+        if not held:
+            return
+
+        with self._lock:
+            evicted = [alias for alias in held if alias not in self._last_used]
+
+        for alias in evicted:
+            try:
+                connection = connections[alias]
+            except ConnectionDoesNotExist:
+                connection = None
+            if connection is not None:
+                if connection.in_atomic_block:
+                    continue
+                connection.close()
+                del connections[alias]
+
+            held.discard(alias)
+            with self._lock:
+                self._holders[alias].discard(threading.current_thread())
+                if not self._is_held(alias):
+                    del self._holders[alias]
+                    if alias not in self._last_used:
+                        connections.databases.pop(alias, None)
+
+    def _hold(self, alias):
+        held = getattr(self._local, 'aliases', None)
+        if held is None:
+            held = self._local.aliases = set()
+        if alias not in held:
+            held.add(alias)
+            self._holders[alias].add(threading.current_thread())
+
+    def _is_held(self, alias) -> bool:
+        # The connections of a thread are gone with it
+        return any(thread.is_alive() for thread in self._holders.get(alias, ()))
+
+    def _evict_stale(self):
+        idle_since = time.monotonic() - self.idle_seconds
+        # The most recently used alias is the one being ensured right now, never evict it
+        for alias, last_used in list(self._last_used.items())[:-1]:
+            if len(self._last_used) <= self.max_aliases and last_used > idle_since:
+                break
+            self.evict(alias)
+
+    def _build_database_settings(self, alias):
+        from db.controller.cache import customer_cache
+        from db.controller.models import Customer
+
+        try:
+            customer = customer_cache.get(alias)
+        except (Customer.DoesNotExist, Customer.MultipleObjectsReturned):
+            raise ConnectionDoesNotExist("The connection '%s' doesn't exist." % alias)
+
+        # The 'default' database may be of another engine, the customer databases never fall back to it
+        tenant_database = getattr(settings, 'TENANT_DATABASE', None)
+        if not tenant_database or not tenant_database.get('ENGINE'):
+            raise ImproperlyConfigured('TENANT_DATABASE must set the ENGINE of the customer databases.')
+
+        database = deepcopy(connections.databases[DEFAULT_DB_ALIAS])
+        database.update(deepcopy(tenant_database))
+        database.update(parse_connect_string(customer.sql_connect_string))
+        return database
+
+
+tenant_connections = TenantConnectionRegistry()
+request_finished.connect(tenant_connections.close_evicted)
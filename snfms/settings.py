@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'db.middleware.request_cfg_middleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -100,11 +101,84 @@ DATABASES = {
 CONTROLLER_MODEL_NAMES = {'Customer', }
 
 
+# Customer databases are registered on first use from Customer.sql_connect_string (see db.tenants).
+# TENANT_DATABASE overrides the 'default' database settings for every customer connection, the deployment
+# must set it with the ENGINE of the customer databases, e.g. {'ENGINE': 'mssql'}.
+TENANT_CONNECTION_MAX_ALIASES = 500
+TENANT_CONNECTION_IDLE_SECONDS = 600
+
+# Caches
+#
+# The *_CACHE_* settings size the in-process caches of db.cache.TTLCache, every worker process keeps its own
+# entries. A change made by one worker invalidates the entries of the others in one of two ways:
+#
+#   shared versions - the entries are stored with versions kept in CACHES[INVALIDATION_CACHE] and a change bumps
+#                     them, so every worker misses at once (see db.invalidation). The query cache, the cached counts,
+#                     the admin users and the tokens. INVALIDATION_CACHE must name a cache shared by the workers
+#                     (Memcached, Redis) in production, the local memory backend only invalidates the entries of its
+#                     own process.
+#   time to live    - a change drops the entries of the worker that made it, the other workers keep theirs until
+#                     they expire, so their TTL bounds the staleness. Every other cache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+INVALIDATION_CACHE = 'default'
+
+# Results of the customer queries read through Queryable.qs(model, cached=True) (see db.query_cache)
+QUERY_CACHE_MAX_SIZE = 2000
+QUERY_CACHE_TTL_SECONDS = 300
+QUERY_CACHE_MAX_ROWS = 5000
+
+# Count strategies of the paginated lists (see api.counts)
+COUNT_CACHE_MAX_SIZE = 10000
+COUNT_CACHE_TTL_SECONDS = 60
+ESTIMATED_COUNT_EXACT_THRESHOLD = 10000
+
+# Security attributes and admin users of the customers (see tools.security.authorization)
+SECURITY_SETTINGS_CACHE_MAX_SIZE = 50000
+SECURITY_SETTINGS_CACHE_TTL_SECONDS = 60
+ADMIN_USERS_CACHE_MAX_SIZE = 5000
+ADMIN_USERS_CACHE_TTL_SECONDS = 60
+
+# Controller Customer rows (see db.controller.cache)
+CUSTOMER_CACHE_MAX_SIZE = 10000
+CUSTOMER_CACHE_TTL_SECONDS = 300
+
+# Authentication tokens (see db.auth.cache)
+TOKEN_CACHE_MAX_SIZE = 10000
+TOKEN_CACHE_TTL_SECONDS = 60
+
+# Login eligibility of the customer domains (see db.auth.backends)
+CUSTOMER_ELIGIBILITY_CACHE_MAX_SIZE = 10000
+CUSTOMER_ELIGIBILITY_CACHE_TTL_SECONDS = 60
+
+# Usernames with no local user and tenant users, they order the login stages (see db.auth.backends)
+LOGIN_USER_CACHE_MAX_SIZE = 50000
+LOGIN_USER_CACHE_TTL_SECONDS = 600
+
+# Navigation permission tree of the role attributes (see api.roles.services)
+NAVIGATION_TREE_CACHE_MAX_SIZE = 1000
+NAVIGATION_TREE_CACHE_TTL_SECONDS = 600
+
+# Recent simple_search results of the user lists (see api.search.SearchResultCache)
+SEARCH_RESULT_CACHE_MAX_SIZE = 1000
+SEARCH_RESULT_CACHE_TTL_SECONDS = 30
+SEARCH_RESULT_CACHE_MAX_ROWS = 1000
+
+# Presence of the search and change feed tables in the customer databases (see db.schema)
+TENANT_TABLES_CACHE_MAX_SIZE = 5000
+TENANT_TABLES_CACHE_TTL_SECONDS = 60
+
+
 DATABASE_ROUTERS = [
     'db.MasterRouter',
     'db.ControllerRouter',
 ]
 
+TEST_RUNNER = 'snfms.test_runner.CustomerSchemaTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -171,7 +245,12 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FileUploadParser',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CustomPageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.CSVRenderer',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPageNumberPagination',
     'PAGINATE_BY': 100,
     'PAGINATE_BY_PARAM': 'page_size',
     'MAX_PAGINATE_BY': 1000,
@@ -180,3 +259,27 @@ REST_FRAMEWORK = {
 }
 
 SQL_SERVER_PARAMETER_LIMIT = 2000
+
+# Size in characters of the chunks written by the streaming CSV export (see api.responses)
+CSV_STREAMING_CHUNK_SIZE = 65536
+
+# Change feeds of the resources (see api.changes)
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 1000
+CHANGE_FEED_RETENTION_DAYS = 30
+
+# Background jobs of the ?async=true requests (see api.jobs.views.JobMixin), run by `manage.py run_jobs` workers
+JOB_DATABASE = 'default'
+JOB_MAX_RUNNING_PER_CUSTOMER = 1
+JOB_CHUNK_SIZE = 1000
+JOB_STALE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 3
+JOB_CLAIM_CANDIDATES = 20
+JOB_POLL_SECONDS = 2
+
+# Audit records of the role changes, queued after commit and bulk inserted in the background (see api.audit)
+AUDIT_LOG_MAX_BATCHES = 100
+AUDIT_LOG_BATCH_SIZE = 1000
+AUDIT_LOG_FLUSH_SECONDS = 1
+AUDIT_LOG_PUT_TIMEOUT_SECONDS = 0.5
+AUDIT_LOG_FALLBACK_PATH = BASE_DIR / 'audit_log_fallback.jsonl'
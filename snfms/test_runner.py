@@ -0,0 +1,25 @@
+from django.apps import apps
+from django.db import connections, router
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class CustomerSchemaTestRunner(DiscoverRunner):
+    """
+    The tables of the db app are created from the models. The customer schema is owned by the customer databases
+    and the migrations of db only follow the tables of the default database, they are behind the models.
+    """
+
+    def setup_databases(self, **kwargs):
+        with override_settings(MIGRATION_MODULES={'db': None}):
+            old_config = super().setup_databases(**kwargs)
+
+        # The models of db live in subpackages, migrate can not synchronize an app without a models module
+        models = [model for model in apps.get_app_config('db').get_models() if model._meta.managed]
+        for alias in kwargs.get('aliases') or ():
+            with connections[alias].schema_editor() as editor:
+                for model in models:
+                    if router.allow_migrate_model(alias, model):
+                        editor.create_model(model)
+
+        return old_config
@@ -3,10 +3,15 @@ Query module contains helpful utility functions
 for constructing and running queries using Django ORM.
 """
 
-from typing import Union, Callable
+from typing import Any, Union, Callable, Dict, Iterator, List
 
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F, Model, QuerySet
 from django.shortcuts import _get_queryset
 
+from db.query_cache import invalidate_tables
+
 from tools.errors import API404Error
 
 
@@ -39,3 +44,74 @@ def get_object_or_404_with_message(message: Union[str, dict]) -> Callable:
             raise API404Error(message)
 
     return get_object_or_404
+
+
+def iterate_queryset_chunks(queryset: QuerySet, chunk_size: int, key: str = 'pk') -> Iterator[List]:
+    """
+    Walks the queryset in chunks of chunk_size rows ordered by the unique key field.
+
+    Every chunk is selected with a WHERE clause on the key value of the last row of the previous
+    chunk instead of OFFSET, so no up-front count is needed, every chunk costs the same and rows
+    inserted during the walk don't shift the chunks. prefetch_related lookups are made per chunk,
+    so their IN clauses never have more than chunk_size parameters.
+
+    The key must be unique and not nullable, prefix it with '-' to walk in descending order.
+    The ordering of the queryset is discarded, the rows come in the order of the key.
+    Works with model and values() querysets, the values() must select the key.
+
+    Example of usage:
+    for users in iterate_queryset_chunks(User.objects.prefetch_related('roles'), 2000):
+        ...
+    """
+    field = key.lstrip('-')
+    lookup = '%s__%s' % (field, 'lt' if key.startswith('-') else 'gt')
+    queryset = queryset.order_by(key)
+    # values() rows are keyed by the column names, not by the pk alias
+    row_field = queryset.model._meta.pk.attname if field == 'pk' else field
+
+    last_value = None
+    while True:
+        chunk_queryset = queryset if last_value is None else queryset.filter(**{lookup: last_value})
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+
+        yield chunk
+
+        if len(chunk) < chunk_size:
+            return
+
+        last_row = chunk[-1]
+        last_value = last_row[row_field] if isinstance(last_row, dict) else getattr(last_row, field)
+
+
+def insert_from_select(model: Model, queryset: QuerySet, values: Dict[str, Any]) -> int:
+    """
+    Copies the rows selected by the queryset into the model table with a single INSERT ... SELECT statement,
+    the rows are never loaded into Python. values maps the model fields to insert to the field names (of the
+    queryset model) or expressions selected for them. Returns the number of inserted rows. No signals are sent,
+    the query cache of the model is invalidated.
+
+    Example of usage:
+    insert_from_select(UserRole, users, {'user': 'pk', 'role': Value(role.pk, IntegerField())})
+    """
+    # Every value is selected as an annotation, so the columns are selected in the order of values
+    selected = {'insert_%d' % i: F(value) if isinstance(value, str) else value for i, value in enumerate(values.values())}
+    queryset = queryset.order_by().values(**selected)
+    connection = connections[queryset.db]
+    quote_name = connection.ops.quote_name
+
+    try:
+        select_sql, params = queryset.query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        return 0
+
+    columns = ', '.join(quote_name(model._meta.get_field(field).column) for field in values)
+    sql = 'INSERT INTO %s (%s) %s' % (quote_name(model._meta.db_table), columns, select_sql)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.rowcount
+
+    invalidate_tables(queryset.db, model)
+    return rows
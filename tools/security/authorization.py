@@ -1,7 +1,72 @@
-from db.customer.models import UserAttribute, UserRole, RoleAttribute, User, Roles
+from typing import FrozenSet, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+
+from db.cache import TTLCache
+from db.invalidation import SharedVersions
+from db.customer.models import UserAttribute, RoleAttribute, User, Roles, UserRole
 from db.controller.models import Customer
 from api.queryables import CustomerQueryable
-from typing import Set
+
+SECURITY_ATTRIBUTE_PREFIX = 'security.'
+
+# (customer domain, user pk) -> frozenset of the security attribute names
+security_settings_cache = TTLCache(
+    max_size=settings.SECURITY_SETTINGS_CACHE_MAX_SIZE,
+    ttl=settings.SECURITY_SETTINGS_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_security_settings(customer_domain: str, user_id: Optional[int] = None) -> None:
+    """
+    Drops the cached security settings of the user or of the whole customer when user_id is not passed.
+    Inside a transaction the cache is cleared once the transaction is committed.
+    """
+    def invalidate():
+        if user_id is None:
+            security_settings_cache.delete_matching(lambda key: key[0] == customer_domain)
+        else:
+            security_settings_cache.delete((customer_domain, user_id))
+
+    transaction.on_commit(invalidate, using=customer_domain)
+
+
+# customer domain -> (versions, frozenset of the pks of the users having the admin role)
+admin_users_cache = TTLCache(
+    max_size=settings.ADMIN_USERS_CACHE_MAX_SIZE,
+    ttl=settings.ADMIN_USERS_CACHE_TTL_SECONDS,
+)
+admin_users_versions = SharedVersions('admin_users')
+
+
+def invalidate_admin_users(customer_domain: str) -> None:
+    """
+    Drops the cached admin users of the customer in every worker process (see db.invalidation).
+    Inside a transaction the cache is cleared once the transaction is committed.
+    """
+    def invalidate():
+        admin_users_versions.bump((customer_domain,))
+        admin_users_cache.delete(customer_domain)
+
+    transaction.on_commit(invalidate, using=customer_domain)
+
+
+class AdminUsersProvider(CustomerQueryable):
+
+    def get_admin_user_ids(self) -> FrozenSet[int]:
+        return admin_users_versions.get_or_set(
+            admin_users_cache, self.customer_domain, [(self.customer_domain,)], self._get_admin_user_ids)
+
+    def is_admin(self, user: User) -> bool:
+        return user is not None and user.pk in self.get_admin_user_ids()
+
+    def _get_admin_user_ids(self) -> FrozenSet[int]:
+        return frozenset(self.qs(UserRole).filter(
+            role__name__in=(Roles.ADMIN_ROLE,),
+            role__data_access=True,
+            user_id__isnull=False,
+        ).values_list('user_id', flat=True).distinct())
 
 
 class UserSecurityAttributesProvider(CustomerQueryable):
@@ -11,25 +76,29 @@ class UserSecurityAttributesProvider(CustomerQueryable):
         self.customer = customer
 
     def get_security_settings(self, user: User) -> Set[str]:
+        return set(security_settings_cache.get_or_set(
+            (self.customer_domain, user.pk),
+            lambda: self._get_security_settings(user),
+        ))
+
+    def _get_security_settings(self, user: User) -> FrozenSet[str]:
+        # The collation of the customer databases is case insensitive, so startswith matches
+        # the same rows as istartswith while still being able to use the index on the name column
         user_security = self.qs(UserAttribute).filter(
             user_id=user.pk,
-            name__istartswith='security.',
+            name__startswith=SECURITY_ATTRIBUTE_PREFIX,
             value='True',
         ).values_list('name', flat=True)
 
-        user_roles = self.qs(UserRole).filter(
-            user_id=user.pk,
-        ).values_list('role_id', flat=True)
-
-        valid_role_ids = self.qs(Roles).filter(
-            role_id__in=user_roles,
-        ).values_list('role_id', flat=True)
+        user_roles = self.qs(Roles).filter(
+            userrole__user_id=user.pk,
+        ).values('role_id')
 
         role_security = self.qs(RoleAttribute).filter(
-            role_id__in=valid_role_ids,
-            name__istartswith='security.',
+            role_id__in=user_roles,
+            name__startswith=SECURITY_ATTRIBUTE_PREFIX,
             name_value='True',
         ).values_list('name', flat=True)
 
-        attributes = set(user_security).union(set(role_security))
-        return attributes
+        # SchemaModel.Meta.ordering would put an ORDER BY in each branch, the compound statement does not allow it
+        return frozenset(user_security.order_by().union(role_security.order_by()))